@@ -0,0 +1,202 @@
+import os
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from ttl_cache import TTLCache
+from devanagari import normalize as normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Answer cache configuration
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', '5000'))
+ANSWER_CACHE_TTL = float(os.environ.get('ANSWER_CACHE_TTL', str(7 * 24 * 3600)))  # 7 days
+ANSWER_CACHE_PERSIST = os.environ.get('ANSWER_CACHE_PERSIST', 'true').lower() == 'true'
+# Optional semantic tier: name of a local sentence-transformers model
+ANSWER_CACHE_EMBEDDING_MODEL = os.environ.get('ANSWER_CACHE_EMBEDDING_MODEL')
+ANSWER_CACHE_SIMILARITY = float(os.environ.get('ANSWER_CACHE_SIMILARITY', '0.92'))
+
+
+def cache_key(question: str, prompt_version: str) -> str:
+    """Stable key for a normalized question under a given system prompt"""
+    normalized = normalize_question(question)
+    return hashlib.sha256(f"{prompt_version}:{normalized}".encode('utf-8')).hexdigest()
+
+
+class _SemanticIndex:
+    """
+    Brute-force cosine-similarity index over cached question embeddings
+
+    The model is loaded by `load()`, which blocks for seconds and runs in a
+    warm-up thread; until then searches miss and nothing is indexed.
+    """
+
+    def __init__(self, model_name: str, threshold: float, maxsize: int):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._np = None
+        self._model = None
+        self._keys = []
+        self._vectors = None
+
+    def load(self):
+        # Optional dependency - only imported when the semantic tier is enabled
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+
+        self._np = np
+        self._model = SentenceTransformer(self.model_name)
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def _embed(self, text: str):
+        return self._model.encode([text], normalize_embeddings=True)[0]
+
+    async def search(self, text: str):
+        """Return the key of the most similar cached question above threshold"""
+        if not self.ready or not self._keys:
+            return None, None
+        vector = await asyncio.to_thread(self._embed, text)
+        scores = self._vectors @ vector
+        best = int(scores.argmax())
+        if scores[best] >= self.threshold:
+            return self._keys[best], vector
+        return None, vector
+
+    async def add(self, key: str, text: str, vector=None):
+        if not self.ready or key in self._keys:
+            return
+        if vector is None:
+            vector = await asyncio.to_thread(self._embed, text)
+        if self._vectors is None:
+            self._vectors = vector[None, :]
+        else:
+            self._vectors = self._np.vstack([self._vectors, vector])
+        self._keys.append(key)
+        # Drop the oldest vectors once the index is full
+        if len(self._keys) > self.maxsize:
+            overflow = len(self._keys) - self.maxsize
+            self._keys = self._keys[overflow:]
+            self._vectors = self._vectors[overflow:]
+
+
+class AnswerCache:
+    """
+    Two-tier cache for first-turn chat answers
+
+    Lookups go to an in-process TTL/LRU map keyed on the normalized question,
+    then to the optional semantic index, then to the Mongo collection. Only
+    questions without conversation history are cached, since follow-ups
+    depend on context.
+    """
+
+    def __init__(self, collection=None, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.collection = collection if ANSWER_CACHE_PERSIST else None
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.semantic = None
+        if ANSWER_CACHE_EMBEDDING_MODEL:
+            self.semantic = _SemanticIndex(ANSWER_CACHE_EMBEDDING_MODEL, ANSWER_CACHE_SIMILARITY, maxsize)
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def attach(self, collection):
+        """Attach the Mongo collection backing the persistent tier"""
+        self.collection = collection if ANSWER_CACHE_PERSIST else None
+
+    def load_semantic(self):
+        """Load the embedding model; blocking, so run it in a thread"""
+        if self.semantic is None or self.semantic.ready:
+            return
+        try:
+            self.semantic.load()
+        except ImportError:
+            logger.warning("sentence-transformers not installed - semantic answer cache disabled")
+            self.semantic = None
+        except Exception as e:
+            # The tier is optional; do not hold up readiness over it
+            logger.warning(f"Embedding model failed to load - semantic answer cache disabled: {e}")
+            self.semantic = None
+
+    async def get(self, question: str, prompt_version: str):
+        """Return a cached answer dict or None"""
+        key = cache_key(question, prompt_version)
+
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.exact_hits += 1
+            return cached
+
+        if self.semantic is not None:
+            similar_key, _ = await self.semantic.search(normalize_question(question))
+            cached = self.memory.get(similar_key) if similar_key else None
+            if cached is not None:
+                self.semantic_hits += 1
+                return cached
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one(
+                    {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                    {"_id": 0, "response": 1, "usage": 1}
+                )
+            except Exception as e:
+                logger.warning(f"Answer cache lookup failed: {e}")
+                doc = None
+            if doc:
+                self.persistent_hits += 1
+                self.memory.set(key, doc)
+                return doc
+
+        self.misses += 1
+        return None
+
+    async def set(self, question: str, prompt_version: str, response: str, usage: dict = None):
+        """Store a successful answer in every tier"""
+        key = cache_key(question, prompt_version)
+        entry = {"response": response, "usage": usage}
+        self.memory.set(key, entry)
+        self.stores += 1
+
+        if self.semantic is not None:
+            await self.semantic.add(key, normalize_question(question))
+
+        if self.collection is not None:
+            now = datetime.now(timezone.utc)
+            try:
+                await self.collection.update_one(
+                    {"key": key},
+                    {"$set": {
+                        "key": key,
+                        "question": question,
+                        "response": response,
+                        "usage": usage,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl)
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"Answer cache write failed: {e}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        hits = self.exact_hits + self.semantic_hits + self.persistent_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "semantic_enabled": self.semantic is not None,
+            "semantic_ready": self.semantic is not None and self.semantic.ready,
+            "memory": self.memory.stats()
+        }
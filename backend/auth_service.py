@@ -1,26 +1,39 @@
 from fastapi import HTTPException, status
 from pydantic import BaseModel, validator
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import bcrypt
 import uuid
 import re
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ttl_cache import TTLCache
+from database import get_db
+from metrics import bcrypt_duration, jwt_duration
 
-# MongoDB connection
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-DB_NAME = os.environ.get('DB_NAME', 'hindi_grammar_db')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+logger = logging.getLogger(__name__)
 
-# JWT Configuration
-SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
-if not SECRET_KEY:
-    raise ValueError("JWT_SECRET_KEY environment variable is required for security")
+# JWT Configuration - the secret is read on use, so importing needs no secret
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# Password hashing configuration
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', str(os.cpu_count() or 2)))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get('PASSWORD_QUEUE_LIMIT', '64'))
+
+# Profile lookup configuration
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', '300'))
+# Embed non-sensitive profile fields in the token so /auth/me needs no DB I/O.
+# Profile edits only show up in such tokens after the next login.
+AUTH_PROFILE_IN_TOKEN = os.environ.get('AUTH_PROFILE_IN_TOKEN', 'false').lower() == 'true'
+
 # Pydantic Models
 class UserRegister(BaseModel):
     name: str
@@ -52,7 +65,12 @@ class User(BaseModel):
     mobile: str
     school: str
     class_name: str
-    created_at: str
+    created_at: datetime
+    
+    @validator('created_at')
+    def assume_utc(cls, v):
+        # Legacy documents stored naive ISO strings in UTC
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -60,45 +78,192 @@ class TokenResponse(BaseModel):
     user: User
 
 # Helper Functions
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int = None) -> str:
     """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    with bcrypt_duration.time("hash"):
+        salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with bcrypt_duration.time("verify"):
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash was made with a different cost factor"""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+class PasswordPool:
+    """
+    Bounded thread pool for bcrypt work
+
+    bcrypt releases the GIL while hashing, so running it on worker threads
+    keeps the event loop free. Work beyond the pool size waits in a queue of
+    at most `queue_limit` jobs; anything past that is rejected with 429 so a
+    login storm degrades into fast retries instead of a frozen API.
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_SIZE, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        """Run func(*args) on the pool, or raise 429 if the queue is full"""
+        with self._lock:
+            if self.pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="सर्वर व्यस्त है, कृपया कुछ क्षण बाद पुनः प्रयास करें",
+                    headers={"Retry-After": "1"}
+                )
+            self.pending += 1
+        succeeded = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, func, *args)
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        """Queue-depth metrics for monitoring"""
+        with self._lock:
+            pending = self.pending
+        return {
+            "workers": self.workers,
+            "in_flight": min(pending, self.workers),
+            "queued": max(pending - self.workers, 0),
+            "queue_limit": self.queue_limit,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordPool()
+
+async def hash_password_async(password: str) -> str:
+    """Hash password on the bcrypt pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password on the bcrypt pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+def secret_key() -> str:
+    """The JWT signing secret; refuses to sign or verify tokens without one"""
+    key = os.environ.get('JWT_SECRET_KEY')
+    if not key:
+        raise ValueError("JWT_SECRET_KEY environment variable is required for security")
+    return key
 
 def create_access_token(data: dict):
     """Create JWT access token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with jwt_duration.time("encode"):
+        encoded_jwt = jwt.encode(to_encode, secret_key(), algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str):
     """Decode JWT access token"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with jwt_duration.time("decode"):
+            payload = jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired"
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate token"
         )
 
+def token_claims(user: User) -> dict:
+    """Build the JWT claims for a user"""
+    claims = {"sub": user.id, "mobile": user.mobile}
+    if AUTH_PROFILE_IN_TOKEN:
+        claims["profile"] = {
+            "name": user.name,
+            "school": user.school,
+            "class_name": user.class_name,
+            "created_at": user.created_at.isoformat()
+        }
+    return claims
+
+class ProfileLookupStats:
+    """Counts and cumulative latency of /auth/me lookups by source"""
+
+    def __init__(self):
+        self.counts = {"claims": 0, "cache": 0, "db": 0}
+        self.seconds = {"claims": 0.0, "cache": 0.0, "db": 0.0}
+
+    def record(self, source: str, started: float):
+        self.counts[source] += 1
+        self.seconds[source] += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            source: {
+                "count": count,
+                "avg_ms": round(self.seconds[source] * 1000 / count, 3) if count else 0.0
+            }
+            for source, count in self.counts.items()
+        }
+
+# Recently seen user profiles, keyed by user id
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+profile_lookup_stats = ProfileLookupStats()
+
+def invalidate_user_profile(user_id: str):
+    """Drop a cached profile - call after any change to the user document"""
+    profile_cache.pop(user_id)
+
+# Set once the unique index on users.mobile is known to exist. Until then
+# (or if the index bootstrap failed) registration checks for the number first.
+mobile_index_ready = False
+
+def set_mobile_index_ready(ready: bool):
+    global mobile_index_ready
+    mobile_index_ready = ready
+
+def profile_stats() -> dict:
+    """Profile cache hit ratio and lookup latency for monitoring"""
+    return {
+        "profile_in_token": AUTH_PROFILE_IN_TOKEN,
+        "cache": profile_cache.stats(),
+        "lookups": profile_lookup_stats.stats()
+    }
+
 # Auth Service Functions
 async def register_user(user_data: UserRegister) -> TokenResponse:
     """Register a new user"""
-    # Check if user already exists (optimized query - only check if exists)
-    existing_user = await db.users.find_one({"mobile": user_data.mobile}, {"_id": 1})
-    if existing_user:
+    # Without the unique index a duplicate insert would succeed; best-effort check
+    if not mobile_index_ready and await get_db().users.find_one({"mobile": user_data.mobile}, {"_id": 1}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="यह मोबाइल नंबर पहले से पंजीकृत है"
@@ -112,15 +277,18 @@ async def register_user(user_data: UserRegister) -> TokenResponse:
         "mobile": user_data.mobile,
         "school": user_data.school,
         "class_name": user_data.class_name,
-        "password": hash_password(user_data.password),
-        "created_at": datetime.utcnow().isoformat()
+        "password": await hash_password_async(user_data.password),
+        "created_at": datetime.now(timezone.utc)
     }
     
-    # Insert user
-    await db.users.insert_one(user_doc)
-    
-    # Create token
-    access_token = create_access_token({"sub": user_id, "mobile": user_data.mobile})
+    # Insert user - the unique index on mobile rejects duplicates atomically
+    try:
+        await get_db().users.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="यह मोबाइल नंबर पहले से पंजीकृत है"
+        )
     
     # Return user data without password
     user = User(
@@ -132,6 +300,9 @@ async def register_user(user_data: UserRegister) -> TokenResponse:
         created_at=user_doc["created_at"]
     )
     
+    # Create token
+    access_token = create_access_token(token_claims(user))
+    
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
@@ -141,7 +312,7 @@ async def register_user(user_data: UserRegister) -> TokenResponse:
 async def login_user(login_data: UserLogin) -> TokenResponse:
     """Login user"""
     # Find user by mobile (optimized query - only fetch needed fields)
-    user_doc = await db.users.find_one(
+    user_doc = await get_db().users.find_one(
         {"mobile": login_data.mobile},
         {"id": 1, "name": 1, "mobile": 1, "school": 1, "class_name": 1, "password": 1, "created_at": 1}
     )
@@ -153,14 +324,22 @@ async def login_user(login_data: UserLogin) -> TokenResponse:
         )
     
     # Verify password
-    if not verify_password(login_data.password, user_doc["password"]):
+    if not await verify_password_async(login_data.password, user_doc["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="मोबाइल नंबर या पासवर्ड गलत है"
         )
     
-    # Create token
-    access_token = create_access_token({"sub": user_doc["id"], "mobile": user_doc["mobile"]})
+    # Transparently upgrade hashes made with an old cost factor
+    if needs_rehash(user_doc["password"]):
+        try:
+            new_hash = await hash_password_async(login_data.password)
+            await get_db().users.update_one({"id": user_doc["id"]}, {"$set": {"password": new_hash}})
+        except HTTPException:
+            # Pool is saturated - keep the old hash and retry on a later login
+            pass
+        except Exception as e:
+            logger.warning(f"Password rehash failed for user {user_doc['id']}: {e}")
     
     # Return user data
     user = User(
@@ -172,6 +351,9 @@ async def login_user(login_data: UserLogin) -> TokenResponse:
         created_at=user_doc["created_at"]
     )
     
+    # Create token
+    access_token = create_access_token(token_claims(user))
+    
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
@@ -180,6 +362,7 @@ async def login_user(login_data: UserLogin) -> TokenResponse:
 
 async def get_current_user(token: str) -> User:
     """Get current user from token"""
+    started = time.perf_counter()
     payload = decode_access_token(token)
     user_id = payload.get("sub")
     
@@ -189,8 +372,20 @@ async def get_current_user(token: str) -> User:
             detail="Invalid token"
         )
     
+    # Fast path: profile fields signed into the token
+    profile = payload.get("profile")
+    if AUTH_PROFILE_IN_TOKEN and profile:
+        user = User(id=user_id, mobile=payload.get("mobile"), **profile)
+        profile_lookup_stats.record("claims", started)
+        return user
+    
+    user = profile_cache.get(user_id)
+    if user is not None:
+        profile_lookup_stats.record("cache", started)
+        return user
+    
     # Optimized query - only fetch needed fields
-    user_doc = await db.users.find_one(
+    user_doc = await get_db().users.find_one(
         {"id": user_id},
         {"id": 1, "name": 1, "mobile": 1, "school": 1, "class_name": 1, "created_at": 1}
     )
@@ -201,7 +396,7 @@ async def get_current_user(token: str) -> User:
             detail="User not found"
         )
     
-    return User(
+    user = User(
         id=user_doc["id"],
         name=user_doc["name"],
         mobile=user_doc["mobile"],
@@ -209,3 +404,6 @@ async def get_current_user(token: str) -> User:
         class_name=user_doc["class_name"],
         created_at=user_doc["created_at"]
     )
+    profile_cache.set(user_id, user)
+    profile_lookup_stats.record("db", started)
+    return user
@@ -0,0 +1,141 @@
+"""
+Batched chat answers for teacher worksheets
+
+A worksheet of questions is answered in one request. Repeated questions
+are answered once, cached answers are returned straight away, and the rest
+go to the model with at most CHAT_BATCH_CONCURRENCY of them in flight per
+batch, so one worksheet cannot take every upstream slot. Results are
+yielded as each question finishes; a question that fails gets an error
+result instead of failing the whole batch.
+"""
+import os
+import time
+import asyncio
+import logging
+from devanagari import normalize
+from metrics import chat_batch_questions
+
+logger = logging.getLogger(__name__)
+
+# Batch configuration
+CHAT_BATCH_MAX_QUESTIONS = int(os.environ.get('CHAT_BATCH_MAX_QUESTIONS', '50'))
+CHAT_BATCH_CONCURRENCY = int(os.environ.get('CHAT_BATCH_CONCURRENCY', '4'))
+
+BATCH_ERROR_MESSAGE = "क्षमा करें, इस प्रश्न का उत्तर नहीं मिल सका। कृपया इसे अलग से पूछें।"
+
+
+def error_result(exc: Exception) -> dict:
+    """Result of a question whose lookup or answer raised"""
+    status_code = getattr(exc, "status_code", 500)
+    result = {
+        "success": False,
+        "response": BATCH_ERROR_MESSAGE,
+        "error": getattr(exc, "detail", None) or str(exc) or type(exc).__name__,
+        "status": status_code
+    }
+    retry_after = (getattr(exc, "headers", None) or {}).get("Retry-After")
+    if retry_after:
+        result["retry_after"] = int(retry_after)
+    return result
+
+
+def _outcome(result: dict) -> str:
+    if not result["success"]:
+        return "error"
+    if result.get("degraded"):
+        return "degraded"
+    return "cached" if result.get("cached") else "answered"
+
+
+class BatchStats:
+    """Questions answered through batches, by outcome"""
+
+    def __init__(self):
+        self.batches = 0
+        self.questions = 0
+        self.duplicates = 0
+        self.outcomes = {"cached": 0, "answered": 0, "degraded": 0, "error": 0}
+
+    def record(self, outcome: str, count: int):
+        self.outcomes[outcome] += count
+        chat_batch_questions.inc(outcome, amount=count)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "questions": self.questions,
+            "duplicates": self.duplicates,
+            **self.outcomes
+        }
+
+
+batch_stats = BatchStats()
+
+
+async def run_batch(questions: list, lookup, answer, concurrency: int = CHAT_BATCH_CONCURRENCY):
+    """
+    Answer `questions`, yielding one result per question as it finishes
+
+    `lookup(question)` returns a cached result or None, and `answer(question)`
+    produces one from the model; results are dicts with the ChatResponse
+    fields. Every result carries the question's `index` in the request, and
+    a final `done` event summarizes the batch.
+    """
+    started = time.perf_counter()
+    batch_stats.batches += 1
+    batch_stats.questions += len(questions)
+
+    # Questions that normalize the same are answered once
+    groups = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize(question), []).append(index)
+    duplicates = len(questions) - len(groups)
+    batch_stats.duplicates += duplicates
+    if duplicates:
+        chat_batch_questions.inc("duplicate", amount=duplicates)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def resolve(indexes: list):
+        question = questions[indexes[0]]
+        try:
+            result = await lookup(question)
+            if result is None:
+                async with slots:
+                    result = await answer(question)
+        except Exception as e:
+            if getattr(e, "status_code", 500) >= 500:
+                logger.exception("Batch question failed")
+            result = error_result(e)
+        return indexes, result
+
+    summary = {"cached": 0, "answered": 0, "degraded": 0, "error": 0}
+    tasks = [asyncio.ensure_future(resolve(indexes)) for indexes in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, result = await next_done
+            outcome = _outcome(result)
+            summary[outcome] += len(indexes)
+            batch_stats.record(outcome, len(indexes))
+            for index in indexes:
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "question": questions[index],
+                    "cached": False,
+                    "degraded": False,
+                    "error": None,
+                    **result
+                }
+    finally:
+        # The client went away; shared upstream calls keep running for others
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "type": "done",
+        "questions": len(questions),
+        "unique": len(groups),
+        **summary,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
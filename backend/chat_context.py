@@ -0,0 +1,254 @@
+"""
+Token-budgeted conversation history
+
+Keeps the most recent turns verbatim and folds older turns into a rolling
+summary so prompt size stays bounded however long a chat session runs.
+"""
+import os
+import hashlib
+import logging
+from fastapi import HTTPException, status
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Context configuration
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+CHAT_RECENT_MESSAGES = int(os.environ.get('CHAT_RECENT_MESSAGES', '6'))
+CHAT_MAX_MESSAGE_TOKENS = int(os.environ.get('CHAT_MAX_MESSAGE_TOKENS', '1000'))
+CHAT_MAX_HISTORY_MESSAGES = int(os.environ.get('CHAT_MAX_HISTORY_MESSAGES', '200'))
+# Byte limits, checked before anything is tokenized; a full answer is ~10KB
+CHAT_MAX_HISTORY_MESSAGE_BYTES = int(os.environ.get('CHAT_MAX_HISTORY_MESSAGE_BYTES', '16384'))
+CHAT_MAX_HISTORY_BYTES = int(os.environ.get('CHAT_MAX_HISTORY_BYTES', '131072'))
+CHAT_SUMMARY_CACHE_SIZE = int(os.environ.get('CHAT_SUMMARY_CACHE_SIZE', '2000'))
+CHAT_SUMMARY_CACHE_TTL = float(os.environ.get('CHAT_SUMMARY_CACHE_TTL', '3600'))
+
+# Per-message overhead the chat format adds on top of the content tokens
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Tokenizer, loaded on first use since reading its BPE ranks is slow"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            # Optional dependency - exact counts when available
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally, falling back to a conservative estimate"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly one token per four UTF-8 bytes; overestimates Devanagari slightly
+    return max(1, (len(text.encode('utf-8')) + 3) // 4)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Leading part of `text` that fits in `max_tokens`, marked as cut"""
+    marker = " …"
+    limit = max(max_tokens - count_tokens(marker), 1)
+    encoding = _get_encoding()
+    if encoding is not None:
+        # A cut inside a multi-byte character decodes to U+FFFD
+        text = encoding.decode(encoding.encode(text)[:limit]).rstrip("\ufffd")
+    else:
+        text = text.encode('utf-8')[:limit * 4].decode('utf-8', errors='ignore')
+    while text and count_tokens(text) > limit:
+        text = text[:-1]
+    return text + marker
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(count_tokens(m["content"]) + _MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def check_request_size(user_message: str, conversation_history: list):
+    """Reject oversized payloads before any upstream work is done"""
+    if len(conversation_history) > CHAT_MAX_HISTORY_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Conversation history exceeds {CHAT_MAX_HISTORY_MESSAGES} messages"
+        )
+    # Sizes in bytes first: tokenizing a huge payload would block the event loop
+    total = 0
+    for message in conversation_history:
+        size = len(message["content"].encode('utf-8'))
+        if size > CHAT_MAX_HISTORY_MESSAGE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"A history message exceeds {CHAT_MAX_HISTORY_MESSAGE_BYTES} bytes"
+            )
+        total += size
+    if total > CHAT_MAX_HISTORY_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Conversation history exceeds {CHAT_MAX_HISTORY_BYTES} bytes"
+        )
+    # The question gets the same byte cap before it is tokenized
+    too_long = len(user_message.encode('utf-8')) > CHAT_MAX_HISTORY_MESSAGE_BYTES
+    if too_long or count_tokens(user_message) > CHAT_MAX_MESSAGE_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="प्रश्न बहुत लंबा है, कृपया छोटा प्रश्न पूछें"
+        )
+
+
+class ContextStats:
+    """Aggregate prompt-token savings across requests"""
+
+    def __init__(self):
+        self.requests = 0
+        self.trimmed_requests = 0
+        self.original_tokens = 0
+        self.sent_tokens = 0
+        self.summaries_generated = 0
+        self.summary_fallbacks = 0
+        self.summary_cache_hits = 0
+
+    def stats(self) -> dict:
+        saved = self.original_tokens - self.sent_tokens
+        return {
+            "requests": self.requests,
+            "trimmed_requests": self.trimmed_requests,
+            "history_tokens_in": self.original_tokens,
+            "history_tokens_sent": self.sent_tokens,
+            "history_tokens_saved": saved,
+            "summaries_generated": self.summaries_generated,
+            "summary_fallbacks": self.summary_fallbacks,
+            "summary_cache_hits": self.summary_cache_hits,
+            "summary_cache": _summary_cache.stats()
+        }
+
+
+context_stats = ContextStats()
+
+# Rolling summaries keyed by the chained hash of the messages they cover
+_summary_cache = TTLCache(maxsize=CHAT_SUMMARY_CACHE_SIZE, ttl=CHAT_SUMMARY_CACHE_TTL)
+
+
+def _chained_hashes(messages: list) -> list:
+    """hashes[i] identifies the prefix messages[:i + 1]"""
+    hashes = []
+    digest = b""
+    for message in messages:
+        digest = hashlib.sha256(digest + f"{message['role']}:{message['content']}".encode('utf-8')).digest()
+        hashes.append(digest.hex())
+    return hashes
+
+
+def extractive_summary(messages: list, max_tokens: int) -> str:
+    """Cheap local fallback: the student's most recent earlier questions"""
+    prefix = "छात्र ने पहले ये प्रश्न पूछे: "
+    questions = [m["content"].strip().splitlines()[0] for m in messages if m["role"] == "user" and m["content"].strip()]
+    kept, used = [], count_tokens(prefix)
+    for question in reversed(questions):
+        question = question[:200]
+        tokens = count_tokens(question) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                # Always keep a truncated form of the latest question
+                kept.append(question[:max(max_tokens - used, 1)])
+            break
+        kept.append(question)
+        used += tokens
+    return prefix + " | ".join(reversed(kept))
+
+
+async def _rolling_summary(folded: list, summarize, max_tokens: int) -> str:
+    """Summary of `folded`, extending the longest cached prefix summary"""
+    hashes = _chained_hashes(folded)
+    full_key = hashes[-1]
+    cached = _summary_cache.get(full_key)
+    if cached is not None:
+        context_stats.summary_cache_hits += 1
+        return cached
+
+    # Reuse the summary of the longest already-summarized prefix
+    previous, start = None, 0
+    for i in range(len(hashes) - 2, -1, -1):
+        previous = _summary_cache.get(hashes[i])
+        if previous is not None:
+            start = i + 1
+            break
+
+    summary = None
+    if summarize is not None:
+        try:
+            summary = await summarize(previous, folded[start:], max_tokens)
+        except Exception as e:
+            logger.warning(f"History summarization failed, using extractive summary: {e}")
+    context_stats.summaries_generated += 1
+    if not summary:
+        # Not cached: the next request should get a model summary once it is back
+        context_stats.summary_fallbacks += 1
+        return extractive_summary(folded, max_tokens)
+
+    _summary_cache.set(full_key, summary)
+    return summary
+
+
+async def prepare_history(conversation_history: list, summarize=None, budget: int = None):
+    """
+    Fit conversation history into the token budget
+
+    Returns `(messages, report)`. History within budget is passed through
+    untouched. Otherwise up to CHAT_RECENT_MESSAGES of the newest messages
+    are kept verbatim while they fit, and everything older is replaced by a
+    single system message holding a rolling summary. The newest message is
+    always kept; when it alone is over the recent-turns budget it is
+    truncated to fit.
+    `summarize(previous_summary, messages, max_tokens)` is an optional
+    coroutine producing the summary text.
+    """
+    budget = CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    history = conversation_history or []
+    original_tokens = count_message_tokens(history)
+    report = {"history_tokens_in": original_tokens, "history_tokens_sent": original_tokens,
+              "history_tokens_saved": 0, "summarized_messages": 0}
+    context_stats.requests += 1
+    context_stats.original_tokens += original_tokens
+
+    if original_tokens <= budget:
+        context_stats.sent_tokens += original_tokens
+        return history, report
+
+    # Reserve part of the budget for the summary, fill the rest newest-first
+    summary_budget = budget // 4
+    recent_budget = budget - summary_budget
+    kept, used = [], 0
+    for message in reversed(history):
+        tokens = count_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
+        if len(kept) >= CHAT_RECENT_MESSAGES or (kept and used + tokens > recent_budget):
+            break
+        if tokens > recent_budget:
+            message = {**message, "content": truncate_tokens(message["content"], recent_budget - _MESSAGE_OVERHEAD_TOKENS)}
+            tokens = count_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    folded = history[:len(history) - len(kept)]
+
+    messages = kept
+    if folded:
+        summary = await _rolling_summary(folded, summarize, summary_budget)
+        messages = [{"role": "system", "content": f"पिछली बातचीत का सारांश: {summary}"}] + kept
+
+    sent_tokens = count_message_tokens(messages)
+    report.update({
+        "history_tokens_sent": sent_tokens,
+        "history_tokens_saved": original_tokens - sent_tokens,
+        "summarized_messages": len(folded)
+    })
+    context_stats.trimmed_requests += 1
+    context_stats.sent_tokens += sent_tokens
+    return messages, report
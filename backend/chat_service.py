@@ -1,19 +1,81 @@
 import os
-from openai import OpenAI
+import asyncio
+import hashlib
+import time
+import threading
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
+from chat_context import prepare_history, count_tokens
+from grammar_retriever import GrammarRetriever, CHAT_RETRIEVAL, retrieval_stats
+from devanagari import normalize as normalize_text
+from metrics import llm_duration, llm_first_token, llm_in_flight, knowledge_tokens_saved, record_usage
+from resilience import resilience, is_retryable, CircuitOpenError, UpstreamUnavailable, OPEN
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Initialize OpenAI client with proper error handling
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
+# LLM client configuration
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # e.g. a local fake server for load tests
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', '20'))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '50'))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv('OPENAI_QUEUE_TIMEOUT', '10'))
+
+# Shared async OpenAI client with a pooled HTTP transport, one per worker
+client = None
+_client_lock = threading.Lock()
+
+if not os.getenv('OPENAI_API_KEY'):
     print("Warning: OPENAI_API_KEY not found in environment variables")
-    client = None
-else:
-    client = OpenAI(api_key=api_key)
+
+def get_client():
+    """
+    This process's OpenAI client, created on first use
+
+    The openai package is the slowest import in the backend, so it is only
+    loaded here: by the background warm-up after the app has started, or by
+    the first chat request if that comes sooner. Preforked workers each
+    create their own connection pool after the fork.
+    """
+    global client
+    if client is not None:
+        return client
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return None
+    # The warm-up builds the client in a thread, maybe while a request needs it
+    with _client_lock:
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            new_client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=OPENAI_BASE_URL,
+                timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                # Retries are done by the resilience layer, which also sees them
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE
+                    )
+                )
+            )
+            # The chat resources are imported on first access, which takes
+            # about as long as the client itself; do it here, not on the loop
+            new_client.chat.completions
+            client = new_client
+    return client
+
+# Caps the number of completions in flight so a burst of chats cannot
+# exhaust the connection pool or the upstream rate limit
+_llm_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
 
 # Knowledge base containing all Hindi grammar chapters
 HINDI_GRAMMAR_KNOWLEDGE = """
@@ -99,55 +161,332 @@ You are a Hindi grammar expert tutor. You have comprehensive knowledge of the fo
 Always respond in Hindi (Devanagari script) and provide clear, educational explanations with examples.
 """
 
-def get_chat_response(user_message: str, conversation_history: list = None) -> dict:
+# Identifies the prompt/model pair so cached answers are invalidated when either changes
+PROMPT_VERSION = hashlib.sha256(f"{OPENAI_MODEL}:{CHAT_RETRIEVAL}:{HINDI_GRAMMAR_KNOWLEDGE}".encode('utf-8')).hexdigest()[:12]
+
+_grammar_retriever = None
+
+def get_grammar_retriever() -> GrammarRetriever:
+    """Chapter index of the knowledge base, built once on first use"""
+    global _grammar_retriever
+    if _grammar_retriever is None:
+        _grammar_retriever = GrammarRetriever(HINDI_GRAMMAR_KNOWLEDGE, count_tokens)
+    return _grammar_retriever
+
+async def close_client():
+    """Close the shared OpenAI HTTP connection pool"""
+    global client
+    if client is not None:
+        await client.close()
+    client = None
+
+# User-facing fallback messages
+UNAVAILABLE_MESSAGE = "क्षमा करें, चैट सेवा उपलब्ध नहीं है। कृपया बाद में पुनः प्रयास करें।"
+BUSY_MESSAGE = "क्षमा करें, अभी बहुत सारे प्रश्न आ रहे हैं। कृपया थोड़ी देर बाद पुनः प्रयास करें।"
+ERROR_MESSAGE = "क्षमा करें, मुझे आपके प्रश्न का उत्तर देने में समस्या हो रही है। कृपया पुनः प्रयास करें।"
+DEGRADED_INTRO = "क्षमा करें, AI सहायक अभी उपलब्ध नहीं है। तब तक आपके प्रश्न से जुड़ी मुख्य जानकारी:"
+
+def fallback_reply(user_message: str, conversation_history: list = None) -> str:
+    """Rule-based answer from the knowledge base for when the model is unreachable"""
+    chapters = get_grammar_retriever().route(user_message, conversation_history)
+    if not chapters:
+        return UNAVAILABLE_MESSAGE
+    return "\n\n".join([DEGRADED_INTRO] + [chapter.text for chapter in chapters])
+
+def degraded_result(user_message: str, conversation_history: list, error: Exception) -> dict:
+    """Result returned instead of a model answer while the upstream is failing"""
+    return {
+        "success": True,
+        "degraded": True,
+        "error": str(error),
+        "response": fallback_reply(user_message, conversation_history),
+        "usage": None
+    }
+
+def select_knowledge(user_message: str, conversation_history: list = None):
+    """System prompt with only the chapters relevant to the question, and its savings report"""
+    grammar_retriever = get_grammar_retriever()
+    if not CHAT_RETRIEVAL:
+        tokens = grammar_retriever.full_tokens
+        report = {"chapters": [], "system_tokens": tokens, "system_tokens_saved": 0}
+        prompt = HINDI_GRAMMAR_KNOWLEDGE
+    else:
+        prompt, report = grammar_retriever.system_prompt(user_message, conversation_history)
+    retrieval_stats.record(report, grammar_retriever.full_tokens)
+    knowledge_tokens_saved.inc(amount=report["system_tokens_saved"])
+    return prompt, report
+
+def build_messages(user_message: str, conversation_history: list = None, knowledge: str = HINDI_GRAMMAR_KNOWLEDGE) -> list:
+    """Build the messages array sent to the model"""
+    messages = [
+        {"role": "system", "content": knowledge}
+    ]
+    
+    # Add conversation history
+    messages.extend(conversation_history or [])
+    
+    # Add current user message
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+def coalesce_key(user_message: str, conversation_history: list = None) -> str:
+    """Identifies requests that would send the model the same prompt"""
+    parts = [PROMPT_VERSION]
+    parts.extend(f"{m['role']}:{normalize_text(m['content'])}" for m in conversation_history or [])
+    parts.append(normalize_text(user_message))
+    return hashlib.sha256("\x1e".join(parts).encode('utf-8')).hexdigest()
+
+async def _acquire_slot() -> bool:
+    """Wait for a free upstream slot instead of piling onto the pool"""
+    try:
+        await asyncio.wait_for(_llm_semaphore.acquire(), timeout=OPENAI_QUEUE_TIMEOUT)
+        llm_in_flight.inc()
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def _release_slot():
+    llm_in_flight.dec()
+    _llm_semaphore.release()
+
+async def _hedge_slot():
+    """A free upstream slot for a hedge, or None; never waits"""
+    if _llm_semaphore.locked():
+        return None
+    await _llm_semaphore.acquire()
+    llm_in_flight.inc()
+    return _release_slot
+
+SUMMARY_PROMPT = (
+    "Summarize this Hindi grammar tutoring conversation in Hindi in a few short "
+    "sentences. Keep the topics discussed and any facts the student stated about "
+    "themselves. If a previous summary is given, extend it."
+)
+
+async def summarize_history(previous_summary: Optional[str], messages: list, max_tokens: int) -> Optional[str]:
+    """Fold older conversation turns into a short rolling summary; None when the model is unavailable"""
+    # An extractive summary is good enough while the upstream is failing
+    client = get_client()
+    if client is None or resilience.breaker(OPENAI_MODEL).current_state() == OPEN or not await _acquire_slot():
+        return None
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    if previous_summary:
+        transcript = f"Previous summary: {previous_summary}\n\n{transcript}"
+
+    async def attempt(timeout):
+        return await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript}
+            ],
+            temperature=0,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+
+    started, outcome = time.perf_counter(), "error"
+    try:
+        response = await resilience.caller(OPENAI_MODEL, "summary").call(attempt, OPENAI_TIMEOUT, retries=0)
+        outcome = "success"
+    finally:
+        _release_slot()
+        llm_duration.observe(time.perf_counter() - started, OPENAI_MODEL, "summary", outcome)
+    record_usage(OPENAI_MODEL, response.usage and response.usage.model_dump())
+    return response.choices[0].message.content
+
+async def get_chat_response(user_message: str, conversation_history: list = None, timeout: float = None) -> dict:
     """
     Get AI response for Hindi grammar questions
+
+    `timeout` overrides OPENAI_TIMEOUT for each attempt of this request.
+    Results with `degraded` set carry a fallback answer because the model
+    could not be reached.
     """
     try:
+        client = get_client()
         if client is None:
             return {
                 "success": False,
                 "error": "OpenAI client not initialized - API key missing",
-                "response": "क्षमा करें, चैट सेवा उपलब्ध नहीं है। कृपया बाद में पुनः प्रयास करें।"
+                "response": UNAVAILABLE_MESSAGE
             }
         
-        if conversation_history is None:
-            conversation_history = []
-        
-        # Build messages array
-        messages = [
-            {"role": "system", "content": HINDI_GRAMMAR_KNOWLEDGE}
-        ]
+        history, context_report = await prepare_history(conversation_history, summarize=summarize_history)
+        knowledge, context_report["knowledge"] = select_knowledge(user_message, conversation_history)
+        messages = build_messages(user_message, history, knowledge)
         
-        # Add conversation history
-        messages.extend(conversation_history)
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        # Fail fast instead of queueing for a slot on a dead upstream
+        if resilience.breaker(OPENAI_MODEL).current_state() == OPEN:
+            return degraded_result(user_message, conversation_history, CircuitOpenError("Circuit breaker is open"))
         
+        if not await _acquire_slot():
+            return {
+                "success": False,
+                "error": "Chat service is busy - too many requests in flight",
+                "response": BUSY_MESSAGE
+            }
+
+        async def attempt(attempt_timeout):
+            return await client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000,
+                timeout=attempt_timeout
+            )
+
         # Get response from OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
+        started, outcome = time.perf_counter(), "error"
+        try:
+            response = await resilience.caller(OPENAI_MODEL, "complete").call(
+                attempt, timeout if timeout is not None else OPENAI_TIMEOUT, hedge=True, hedge_slot=_hedge_slot)
+            outcome = "success"
+        except (CircuitOpenError, UpstreamUnavailable) as e:
+            return degraded_result(user_message, conversation_history, e)
+        finally:
+            _release_slot()
+            llm_duration.observe(time.perf_counter() - started, OPENAI_MODEL, "complete", outcome)
         
         assistant_message = response.choices[0].message.content
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+        record_usage(OPENAI_MODEL, usage)
         
         return {
             "success": True,
             "response": assistant_message,
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
+            "usage": usage,
+            "context": context_report
         }
     
     except Exception as e:
         return {
             "success": False,
             "error": str(e),
-            "response": "क्षमा करें, मुझे आपके प्रश्न का उत्तर देने में समस्या हो रही है। कृपया पुनः प्रयास करें।"
+            "response": ERROR_MESSAGE
+        }
+
+async def stream_chat_response(user_message: str, conversation_history: list = None, timeout: float = None):
+    """
+    Stream AI response for Hindi grammar questions
+
+    Yields `{"type": "delta", "content": ...}` events as the model generates
+    text, followed by a single `{"type": "done", "usage": ..., "context": ...}`
+    event, or a `{"type": "error", ...}` event if the completion fails. While
+    the upstream is unavailable a single `{"type": "degraded", ...}` event
+    carries a fallback answer instead.
+    """
+    client = get_client()
+    if client is None:
+        yield {
+            "type": "error",
+            "error": "OpenAI client not initialized - API key missing",
+            "response": UNAVAILABLE_MESSAGE
+        }
+        return
+    
+    async def open_stream(attempt_timeout):
+        """Open a completion stream and read up to its first text chunk"""
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1000,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=attempt_timeout
+        )
+        chunks = stream.__aiter__()
+        buffered = []
+        try:
+            # Retries and hedges are only possible before text reaches the student
+            async for chunk in chunks:
+                buffered.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, chunks, buffered
+    
+    async def close_stream(opened):
+        await opened[0].close()
+    
+    started, outcome = time.perf_counter(), "error"
+    has_slot, stream = False, None
+    try:
+        history, context_report = await prepare_history(conversation_history, summarize=summarize_history)
+        knowledge, context_report["knowledge"] = select_knowledge(user_message, conversation_history)
+        messages = build_messages(user_message, history, knowledge)
+        
+        if resilience.breaker(OPENAI_MODEL).current_state() == OPEN:
+            yield {"type": "degraded", **degraded_result(user_message, conversation_history, CircuitOpenError("Circuit breaker is open"))}
+            return
+        
+        has_slot = await _acquire_slot()
+        if not has_slot:
+            yield {
+                "type": "error",
+                "error": "Chat service is busy - too many requests in flight",
+                "response": BUSY_MESSAGE
+            }
+            return
+        
+        started = time.perf_counter()
+        try:
+            stream, chunks, buffered = await resilience.caller(OPENAI_MODEL, "stream").call(
+                open_stream, timeout if timeout is not None else OPENAI_TIMEOUT, hedge=True, discard=close_stream,
+                hedge_slot=_hedge_slot)
+        except (CircuitOpenError, UpstreamUnavailable) as e:
+            yield {"type": "degraded", **degraded_result(user_message, conversation_history, e)}
+            return
+        
+        async def remaining():
+            for chunk in buffered:
+                yield chunk
+            async for chunk in chunks:
+                yield chunk
+        
+        usage = None
+        async for chunk in remaining():
+            # The final chunk carries usage and no choices
+            if chunk.usage is not None:
+                usage = {
+                    "prompt_tokens": chunk.usage.prompt_tokens,
+                    "completion_tokens": chunk.usage.completion_tokens,
+                    "total_tokens": chunk.usage.total_tokens
+                }
+            if chunk.choices and chunk.choices[0].delta.content:
+                if outcome != "streaming":
+                    outcome = "streaming"
+                    llm_first_token.observe(time.perf_counter() - started, OPENAI_MODEL)
+                yield {"type": "delta", "content": chunk.choices[0].delta.content}
+        
+        outcome = "success"
+        record_usage(OPENAI_MODEL, usage)
+        yield {"type": "done", "usage": usage, "context": context_report}
+    
+    except Exception as e:
+        # A stream that breaks after its first token counts against the breaker too
+        if outcome == "streaming" and is_retryable(e):
+            resilience.breaker(OPENAI_MODEL).failure()
+        outcome = "error"
+        yield {
+            "type": "error",
+            "error": str(e),
+            "response": ERROR_MESSAGE
         }
+    finally:
+        # Also runs when the client disconnects: stop the upstream generation
+        if stream is not None:
+            await stream.close()
+        if has_slot:
+            _release_slot()
+            if outcome == "streaming":
+                # The client went away mid-stream
+                outcome = "cancelled"
+            llm_duration.observe(time.perf_counter() - started, OPENAI_MODEL, "stream", outcome)
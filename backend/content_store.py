@@ -0,0 +1,213 @@
+"""
+Versioned, content-hashed snapshots of the lesson content for offline clients
+
+Every lesson, flashcard category and practice set is an item with its own
+hash; the snapshot version is the hash of all of them. Clients keep the
+version they last synced and ask for a delta holding only changed items.
+
+Build the pre-compressed snapshot and record the version before deploying:
+
+    python content_store.py build
+    python content_store.py build --dry-run     # print the version only
+
+`versions.json` keeps the item hashes of every published version so deltas
+can be computed from any of them, and is committed alongside the content.
+Compressed bodies are written to content/dist and loaded on startup; when
+they are missing the snapshot is compressed in memory instead.
+"""
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from ttl_cache import TTLCache
+
+try:
+    # Optional dependency - brotli bodies are only offered when available
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_DIR = Path(__file__).parent / 'content'
+DIST_DIR = CONTENT_DIR / 'dist'
+VERSIONS_FILE = CONTENT_DIR / 'versions.json'
+
+# Content files and the field identifying each item in them
+COLLECTIONS = {
+    "lessons": "id",
+    "flashcards": "category",
+    "practice_sets": "id",
+}
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def compress(body: bytes) -> dict:
+    """Encoded variants of a response body keyed by content-coding"""
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def negotiate(variants: dict, accept_encoding: str):
+    """Pick the smallest variant the client accepts, returns (encoding, body)"""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    for encoding in ("br", "gzip"):
+        if encoding in variants and (encoding in accepted or '*' in accepted):
+            return encoding, variants[encoding]
+    return "identity", variants["identity"]
+
+
+class ContentSnapshot:
+    """All content items at one version"""
+
+    def __init__(self, content_dir: Path = CONTENT_DIR):
+        self.items = {}
+        self.item_hashes = {}
+        for collection, id_field in COLLECTIONS.items():
+            for item in json.loads((content_dir / f'{collection}.json').read_text(encoding='utf-8')):
+                key = f"{collection}/{item[id_field]}"
+                self.items[key] = item
+                self.item_hashes[key] = _digest(_canonical(item))
+        self.version = _digest(_canonical(self.item_hashes))
+
+    def document(self, keys=None) -> dict:
+        """Items grouped by collection, in content file order"""
+        grouped = {collection: [] for collection in COLLECTIONS}
+        for key, item in self.items.items():
+            if keys is None or key in keys:
+                grouped[key.split('/', 1)[0]].append(item)
+        return grouped
+
+    def body(self) -> bytes:
+        return _canonical({"version": self.version, "items": self.document()})
+
+
+def load_versions(path: Path = VERSIONS_FILE) -> list:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+class ContentStore:
+    """Serves the current snapshot and deltas from published versions"""
+
+    def __init__(self, snapshot: ContentSnapshot, versions: list, dist_dir: Path = DIST_DIR):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.history = {entry["version"]: entry["items"] for entry in versions}
+        self.variants = self._load_variants(dist_dir)
+        self._deltas = TTLCache(maxsize=256, ttl=24 * 3600)
+
+    def _load_variants(self, dist_dir: Path) -> dict:
+        base = dist_dir / f'{self.version}.json'
+        if not base.exists():
+            logger.info(f"No pre-built content snapshot for {self.version}, compressing in memory")
+            return compress(self.snapshot.body())
+        variants = {"identity": base.read_bytes()}
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            path = base.with_name(base.name + suffix)
+            if path.exists():
+                variants[encoding] = path.read_bytes()
+        return variants
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def manifest(self) -> dict:
+        return {
+            "version": self.version,
+            "items": self.snapshot.item_hashes,
+            "sizes": {encoding: len(body) for encoding, body in self.variants.items()},
+            "brotli": "br" in self.variants
+        }
+
+    def delta(self, since: str):
+        """
+        Encoded variants of the changes since a published version
+
+        Returns `(etag, variants)`. Unknown versions get the full snapshot
+        with `full: true`, so a client can always recover by replacing
+        everything it holds.
+        """
+        cached = self._deltas.get(since)
+        if cached is not None:
+            return cached
+
+        previous = self.history.get(since)
+        if since == self.version:
+            document = {"from": since, "to": self.version, "full": False, "changed": self.snapshot.document(set()), "removed": []}
+        elif previous is None:
+            document = {"from": since, "to": self.version, "full": True, "changed": self.snapshot.document(), "removed": []}
+        else:
+            current = self.snapshot.item_hashes
+            changed = {key for key, item_hash in current.items() if previous.get(key) != item_hash}
+            removed = sorted(key for key in previous if key not in current)
+            document = {"from": since, "to": self.version, "full": False,
+                        "changed": self.snapshot.document(changed), "removed": removed}
+
+        result = (f'"{since}..{self.version}"', compress(_canonical(document)))
+        self._deltas.set(since, result)
+        return result
+
+
+_store = None
+
+
+def load_content_store() -> ContentStore:
+    """Hash the bundled content and load its pre-built snapshot"""
+    global _store
+    _store = ContentStore(ContentSnapshot(), load_versions())
+    return _store
+
+
+def get_content_store() -> ContentStore:
+    return _store if _store is not None else load_content_store()
+
+
+def build(dry_run: bool = False) -> dict:
+    """Write the compressed snapshot and record the version in versions.json"""
+    snapshot = ContentSnapshot()
+    versions = load_versions()
+    report = {"version": snapshot.version, "items": len(snapshot.items),
+              "new_version": all(entry["version"] != snapshot.version for entry in versions)}
+    if dry_run:
+        return report
+
+    DIST_DIR.mkdir(exist_ok=True)
+    base = DIST_DIR / f'{snapshot.version}.json'
+    suffixes = {"identity": "", "gzip": ".gz", "br": ".br"}
+    sizes = {}
+    for encoding, body in compress(snapshot.body()).items():
+        base.with_name(base.name + suffixes[encoding]).write_bytes(body)
+        sizes[encoding] = len(body)
+    report["sizes"] = sizes
+
+    if report["new_version"]:
+        versions.append({
+            "version": snapshot.version,
+            "published_at": datetime.now(timezone.utc).isoformat(),
+            "items": snapshot.item_hashes
+        })
+        VERSIONS_FILE.write_text(json.dumps(versions, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print(__doc__)
+        sys.exit(1)
+    print(json.dumps(build(dry_run="--dry-run" in sys.argv), indent=2))
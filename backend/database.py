@@ -0,0 +1,145 @@
+"""
+Shared MongoDB access layer
+
+One AsyncIOMotorClient per process, opened and closed through the FastAPI
+lifespan. Every module gets its database handle from `get_db()` so each
+worker runs a single, tunable connection pool.
+"""
+import os
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+from pymongo import monitoring
+from metrics import command_timer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def _int_env(name: str, default: str = None):
+    value = os.environ.get(name, default)
+    return int(value) if value not in (None, '') else None
+
+
+def client_options() -> dict:
+    """Connection pool and consistency settings from the environment"""
+    options = {
+        "maxPoolSize": _int_env('MONGO_MAX_POOL_SIZE', '100'),
+        "minPoolSize": _int_env('MONGO_MIN_POOL_SIZE', '0'),
+        "maxIdleTimeMS": _int_env('MONGO_MAX_IDLE_TIME_MS'),
+        "connectTimeoutMS": _int_env('MONGO_CONNECT_TIMEOUT_MS', '10000'),
+        "serverSelectionTimeoutMS": _int_env('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000'),
+        "socketTimeoutMS": _int_env('MONGO_SOCKET_TIMEOUT_MS'),
+        "waitQueueTimeoutMS": _int_env('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        "readPreference": os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+        # Return BSON dates as timezone-aware UTC datetimes
+        "tz_aware": True,
+    }
+    write_concern = os.environ.get('MONGO_WRITE_CONCERN')
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    return {key: value for key, value in options.items() if value is not None}
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks connection pool utilization from pymongo pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def _add(self, field: str, delta: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+    # Remaining pool events carry nothing we report on
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        max_pool_size = client_options()["maxPoolSize"]
+        with self._lock:
+            return {
+                "max_pool_size": max_pool_size,
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "utilization": round(self.checked_out / max_pool_size, 4) if max_pool_size else 0.0
+            }
+
+
+pool_metrics = PoolMetrics()
+
+_client = None
+_db = None
+
+
+def connect():
+    """Open the shared client if it is not open yet"""
+    global _client, _db
+    if _client is None:
+        # Motor is only needed once a worker starts, not to import the app
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        _client = AsyncIOMotorClient(
+            os.environ.get('MONGO_URL', 'mongodb://localhost:27017'),
+            event_listeners=[pool_metrics, command_timer],
+            **client_options()
+        )
+        _db = _client[os.environ.get('DB_NAME', 'hindi_grammar_db')]
+    return _db
+
+
+def close():
+    """Close the shared client and its connection pool"""
+    global _client, _db
+    if _client is not None:
+        _client.close()
+    _client = None
+    _db = None
+
+
+def get_db():
+    """Return the shared database handle, connecting on first use"""
+    return _db if _db is not None else connect()
@@ -0,0 +1,126 @@
+"""
+Devanagari text normalization shared by the answer cache and search index
+"""
+import re
+import unicodedata
+
+# Long/short vowel signs and independent vowels are merged, nukta is
+# dropped and chandrabindu becomes anusvara, so spelling variants fold
+# to the same form
+_FOLD = str.maketrans({
+    '\u0940': '\u093f',  # ी -> ि
+    '\u0942': '\u0941',  # ू -> ु
+    '\u0948': '\u0947',  # ै -> े
+    '\u094c': '\u094b',  # ौ -> ो
+    '\u0908': '\u0907',  # ई -> इ
+    '\u090a': '\u0909',  # ऊ -> उ
+    '\u0910': '\u090f',  # ऐ -> ए
+    '\u0914': '\u0913',  # औ -> ओ
+    '\u0901': '\u0902',  # ँ -> ं
+    '\u093c': None,       # nukta
+    '\u200c': None,       # ZWNJ
+    '\u200d': None,       # ZWJ
+})
+_PUNCTUATION_RE = re.compile(r'[।॥?!.,;:"\'()\[\]{}\-–—…|/\\+=]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+_TOKEN_RE = re.compile(r'[\w\u0900-\u097f]+')
+
+
+def fold(text: str) -> str:
+    """Fold Devanagari spelling variants, lowercase Latin text"""
+    # Decompose first so precomposed nukta letters (e.g. ड़) expose the nukta
+    text = unicodedata.normalize('NFD', text).translate(_FOLD)
+    return unicodedata.normalize('NFC', text).lower()
+
+
+def normalize(text: str) -> str:
+    """Fold text and strip punctuation and redundant whitespace"""
+    text = _PUNCTUATION_RE.sub(' ', fold(text))
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def tokenize(text: str) -> list:
+    """Split normalized text into word tokens"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def is_latin(token: str) -> bool:
+    return token.isascii()
+
+
+# Loose romanization used only to derive phonetic keys
+_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n',
+    'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n',
+    'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'व': 'v', 'श': 'sh',
+    'ष': 'sh', 'स': 's', 'ह': 'h',
+}
+_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ee', 'उ': 'u', 'ऊ': 'oo',
+    'ऋ': 'ri', 'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au',
+}
+_MATRAS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ee', 'ु': 'u', 'ू': 'oo',
+    'ृ': 'ri', 'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au',
+}
+_SIGNS = {'ं': 'n', 'ँ': 'n', 'ः': 'h'}
+_VIRAMA = '्'
+
+
+def romanize(text: str) -> str:
+    """Approximate Latin spelling of a Devanagari word"""
+    # ज्ञ is conventionally written "gy" (संज्ञा -> sangya)
+    text = unicodedata.normalize('NFD', text).replace('\u093c', '').replace('ज्ञ', '\x00')
+    out = []
+    pending_a = False
+    for ch in text:
+        if ch == '\x00' or ch in _CONSONANTS:
+            if pending_a:
+                out.append('a')
+            out.append('gy' if ch == '\x00' else _CONSONANTS[ch])
+            pending_a = True
+        elif ch in _MATRAS:
+            out.append(_MATRAS[ch])
+            pending_a = False
+        elif ch == _VIRAMA:
+            pending_a = False
+        else:
+            if pending_a:
+                out.append('a')
+            pending_a = False
+            out.append(_VOWELS.get(ch) or _SIGNS.get(ch) or (ch if ch.isascii() else ''))
+    # Final inherent vowel is silent in Hindi (राम -> ram)
+    return ''.join(out)
+
+
+_PHONETIC_RULES = [
+    (re.compile(r'[wq]'), lambda m: {'w': 'v', 'q': 'k'}[m.group()]),
+    (re.compile(r'z'), lambda m: 'j'),
+    (re.compile(r'x'), lambda m: 'ks'),
+    (re.compile(r'f'), lambda m: 'p'),
+    (re.compile(r'jn|gn'), lambda m: 'gy'),
+    (re.compile(r'c(?!h)'), lambda m: 'k'),
+    (re.compile(r'([bcdgjkprst])h'), lambda m: m.group(1)),
+    (re.compile(r'[aeiou]'), lambda m: ''),
+    (re.compile(r'(.)\1+'), lambda m: m.group(1)),
+]
+
+
+def phonetic_key(token: str) -> str:
+    """
+    Vowel-insensitive consonant skeleton of a word in either script
+
+    Both `संज्ञा` and `sangya` map to `sngy`, so Latin transliteration
+    queries and matra misspellings land on the same key.
+    """
+    text = token.lower() if is_latin(token) else romanize(token)
+    if not text:
+        return ''
+    first = text[0]
+    for pattern, replacement in _PHONETIC_RULES:
+        text = pattern.sub(replacement, text)
+    # Keep a leading vowel so words like "anek" and "nek" stay apart
+    return (first + text) if first in 'aeiou' else text
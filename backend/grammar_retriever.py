@@ -0,0 +1,217 @@
+"""
+Topic routing of the grammar knowledge base
+
+The system prompt is split into its numbered chapters once at startup.
+Each question is scored against every chapter by keyword matches (folded
+Devanagari, English chapter names and phonetic keys for transliterated
+questions) plus character trigram similarity, which catches inflected forms
+such as संधियों. Only the best 1-3 chapters are sent to the model; questions
+that match no chapter get the full knowledge base.
+"""
+import os
+import re
+import math
+from collections import Counter
+from devanagari import tokenize, phonetic_key, is_latin, normalize
+
+# Retrieval configuration
+CHAT_RETRIEVAL = os.environ.get('CHAT_RETRIEVAL', 'true').lower() == 'true'
+CHAT_RETRIEVAL_MAX_CHUNKS = int(os.environ.get('CHAT_RETRIEVAL_MAX_CHUNKS', '3'))
+CHAT_RETRIEVAL_MIN_SCORE = float(os.environ.get('CHAT_RETRIEVAL_MIN_SCORE', '1.0'))
+# Chapters scoring below this fraction of the best one are left out
+CHAT_RETRIEVAL_RELATIVE_SCORE = float(os.environ.get('CHAT_RETRIEVAL_RELATIVE_SCORE', '0.5'))
+
+NGRAM_WEIGHT = 3.0
+PHONETIC_WEIGHT = 0.8
+STEM_WEIGHT = 0.8
+
+# Postpositions, question words and requests carry no topic; the कारक chapter
+# lists most postpositions, so left in they would route everything there
+STOPWORDS = set(tokenize(
+    "का के की को में से पर ने तक और या है हैं था थी थे हो क्या कौन कौनसा कैसे क्यों किसे किस "
+    "किसको सा सी से यह वह ये वे इस उस इसे उसे एक भी तो ही मुझे हमें बताइए बताओ बताएं बताये "
+    "समझाइए समझाओ दीजिए दो लिखिए लिखो करो कीजिए what is are the a an of in and or"
+))
+
+_CHAPTER_RE = re.compile(r'^(\d+)\.\s+(.+?):?\s*$', re.MULTILINE)
+
+
+def _trigrams(tokens: list) -> Counter:
+    grams = Counter()
+    for token in tokens:
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams[padded[i:i + 3]] += 1
+    return grams
+
+
+_SUFFIXES = tuple(sorted(normalize("ियों ियां यों यां ओं एं ों ें").split(), key=len, reverse=True))
+
+
+def _stems(token: str) -> list:
+    """Candidate singular forms of a Devanagari plural or oblique word"""
+    if is_latin(token):
+        return []
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            stem = token[:-len(suffix)]
+            # संधियों -> संधि, लड़कियाँ -> लड़की: the ending hides the stem's vowel length
+            return [stem + 'ि', stem + 'ी'] if suffix[0] == 'ि' else [stem]
+    return []
+
+
+class Chapter:
+    def __init__(self, number: int, title: str, text: str):
+        self.number = number
+        self.title = title
+        self.text = text
+        # Chapter titles and bullet headings name the topic; examples are weaker evidence
+        heading_lines = [title] + [line.split(':', 1)[0] for line in text.splitlines()[1:] if line.startswith('-')]
+        self.terms = Counter()
+        for token in tokenize(title):
+            self.terms[token] += 3
+        for line in heading_lines[1:]:
+            for token in tokenize(line):
+                self.terms[token] += 2
+        for token in tokenize(text):
+            self.terms[token] += 1
+        self.phonetic_keys = {phonetic_key(token) for line in heading_lines for token in tokenize(line)} - {''}
+        self.grams = _trigrams(tokenize(' '.join(heading_lines)) * 2 + tokenize(text))
+
+
+class GrammarRetriever:
+    """Chapter-level retrieval over the tutor's knowledge base"""
+
+    def __init__(self, knowledge: str, count_tokens=None):
+        matches = list(_CHAPTER_RE.finditer(knowledge))
+        self.preamble = knowledge[:matches[0].start()].rstrip() if matches else knowledge
+        self.chapters = []
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(knowledge)
+            text = knowledge[match.start():end].strip()
+            if index + 1 == len(matches):
+                # The closing instructions follow the last chapter
+                text, _, closing = text.partition('\n\n')
+                self.closing = closing.strip()
+            self.chapters.append(Chapter(int(match.group(1)), match.group(2), text.strip()))
+        if not matches:
+            self.closing = ''
+
+        n = len(self.chapters)
+        document_frequency = Counter(term for chapter in self.chapters for term in chapter.terms)
+        self.idf = {term: math.log(1 + n / df) for term, df in document_frequency.items()}
+        phonetic_frequency = Counter(key for chapter in self.chapters for key in chapter.phonetic_keys)
+        self.phonetic_idf = {key: math.log(1 + n / df) for key, df in phonetic_frequency.items()}
+        gram_frequency = Counter(gram for chapter in self.chapters for gram in chapter.grams)
+        self.gram_idf = {gram: math.log(1 + n / df) for gram, df in gram_frequency.items()}
+        self._vectors = [self._gram_vector(chapter.grams) for chapter in self.chapters]
+
+        self.full_prompt = knowledge
+        self._count_tokens = count_tokens or len
+        self.full_tokens = self._count_tokens(knowledge)
+        # Assembled prompts by chapter selection; at most a few hundred combinations
+        self._prompts = {}
+
+    def _gram_vector(self, grams: Counter) -> dict:
+        vector = {gram: count * self.gram_idf.get(gram, 0.0) for gram, count in grams.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {gram: value / norm for gram, value in vector.items() if value}
+
+    def scores(self, text: str) -> list:
+        """Relevance of every chapter to `text`"""
+        tokens = [token for token in tokenize(text) if token not in STOPWORDS]
+        query_vector = self._gram_vector(_trigrams([token for token in tokens if not is_latin(token)]))
+        results = []
+        for chapter, vector in zip(self.chapters, self._vectors):
+            score = 0.0
+            for token in set(tokens):
+                if token in chapter.terms:
+                    score += self.idf[token] * (1 + math.log(chapter.terms[token]))
+                    continue
+                # Inflected forms: संधियों -> संधि, लड़कियाँ -> लड़की
+                stem = next((stem for stem in _stems(token) if stem in chapter.terms), None)
+                if stem:
+                    score += STEM_WEIGHT * self.idf[stem] * (1 + math.log(chapter.terms[stem]))
+                    continue
+                key = phonetic_key(token)
+                if len(key) >= 3 and key in chapter.phonetic_keys:
+                    score += PHONETIC_WEIGHT * self.phonetic_idf[key]
+            score += NGRAM_WEIGHT * sum(value * vector.get(gram, 0.0) for gram, value in query_vector.items())
+            results.append(score)
+        return results
+
+    def select(self, text: str) -> list:
+        """The chapters worth sending for `text`, best first"""
+        ranked = sorted(zip(self.scores(text), self.chapters), key=lambda pair: -pair[0])
+        best = ranked[0][0] if ranked else 0.0
+        if best < CHAT_RETRIEVAL_MIN_SCORE:
+            return []
+        return [
+            chapter for score, chapter in ranked[:CHAT_RETRIEVAL_MAX_CHUNKS]
+            if score >= best * CHAT_RETRIEVAL_RELATIVE_SCORE
+        ]
+
+    def route(self, user_message: str, conversation_history: list = None) -> list:
+        """
+        Chapters for a question in knowledge-base order
+
+        Follow-ups without a topic of their own ("और उदाहरण दो") are routed
+        by the student's previous question.
+        """
+        chapters = self.select(user_message)
+        if not chapters:
+            previous = [m["content"] for m in conversation_history or [] if m["role"] == "user"]
+            if previous:
+                chapters = self.select(previous[-1])
+        return sorted(chapters, key=lambda chapter: chapter.number)
+
+    def system_prompt(self, user_message: str, conversation_history: list = None):
+        """System prompt for a question, returns `(prompt, report)`"""
+        chapters = self.route(user_message, conversation_history)
+        if not chapters:
+            return self.full_prompt, {"chapters": [], "system_tokens": self.full_tokens, "system_tokens_saved": 0}
+
+        selection = tuple(chapter.number for chapter in chapters)
+        if selection not in self._prompts:
+            prompt = "\n\n".join([self.preamble] + [chapter.text for chapter in chapters] + [self.closing])
+            self._prompts[selection] = (prompt, self._count_tokens(prompt))
+        prompt, tokens = self._prompts[selection]
+        return prompt, {
+            "chapters": [chapter.title for chapter in chapters],
+            "system_tokens": tokens,
+            "system_tokens_saved": self.full_tokens - tokens
+        }
+
+
+class RetrievalStats:
+    """Aggregate system-prompt savings across requests"""
+
+    def __init__(self):
+        self.requests = 0
+        self.routed = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+        self.chapter_counts = Counter()
+
+    def record(self, report: dict, full_tokens: int):
+        self.requests += 1
+        self.full_tokens += full_tokens
+        self.sent_tokens += report["system_tokens"]
+        if report["chapters"]:
+            self.routed += 1
+            self.chapter_counts.update(report["chapters"])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CHAT_RETRIEVAL,
+            "requests": self.requests,
+            "routed_requests": self.routed,
+            "system_tokens_full": self.full_tokens,
+            "system_tokens_sent": self.sent_tokens,
+            "system_tokens_saved": self.full_tokens - self.sent_tokens,
+            "avg_tokens_saved_per_request": round((self.full_tokens - self.sent_tokens) / self.requests, 1) if self.requests else 0.0,
+            "chapters": dict(self.chapter_counts.most_common())
+        }
+
+
+retrieval_stats = RetrievalStats()
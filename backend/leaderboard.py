@@ -0,0 +1,395 @@
+"""
+School and class leaderboards
+
+A student's points are the sum of their best percentage, at most 100, on
+each practice set in the quiz bank. Every student has one document in
+`leaderboard_entries` holding their per-set bests, their points and their
+school and class scopes. Bests are only ever raised with $max and points
+with a conditional update, so any number of workers can record scores
+concurrently, or replay an update, without losing or double-counting points.
+
+Raised bests are not written on the request path: the progress store
+collects them and writes them with its write-behind flush, a few bulk
+writes for however many students synced.
+
+Each worker keeps the boards it has read recently as indexable skip lists,
+a read cache refreshed every LEADERBOARD_CACHE_TTL seconds, so top-N and
+rank-of-user queries on a busy board are O(log n). The worker's own updates
+are applied to its cached boards once they are written.
+
+To recompute every entry from the progress collection, e.g. after
+restoring a backup or when upgrading from per-worker snapshots:
+
+    python leaderboard.py rebuild
+"""
+import os
+import random
+import asyncio
+import logging
+from urllib.parse import quote, unquote
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from devanagari import normalize
+from database import get_db
+from singleflight import SingleFlight
+from ttl_cache import TTLCache
+from quiz_service import get_quiz_bank
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard configuration
+LEADERBOARD_CACHE_TTL = float(os.environ.get('LEADERBOARD_CACHE_TTL', '30'))
+LEADERBOARD_CACHE_SIZE = int(os.environ.get('LEADERBOARD_CACHE_SIZE', '1000'))
+LEADERBOARD_MAX_LIMIT = 100
+
+
+class IndexableSkipList:
+    """
+    Sorted keys with O(log n) insert, remove, rank and positional access
+
+    Each link stores how many level-0 steps it skips, which lets rank and
+    index lookups add widths up instead of walking the list.
+    """
+
+    MAX_LEVELS = 24  # ample for 16M entries at p = 0.5
+
+    class _Node:
+        __slots__ = ("key", "next", "width")
+
+        def __init__(self, key, levels: int):
+            self.key = key
+            self.next = [None] * levels
+            self.width = [1] * levels
+
+    def __init__(self, seed: int = None):
+        self.head = self._Node(None, self.MAX_LEVELS)
+        self.size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVELS and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._level()
+        new = self._Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """Number of keys ordered before `key`"""
+        position = 0
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def slice(self, start: int, count: int) -> list:
+        """Up to `count` keys starting at index `start`"""
+        if start >= self.size or count <= 0:
+            return []
+        node = self.head
+        remaining = start + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Board:
+    """Ranking of one school or class"""
+
+    def __init__(self):
+        self.ranking = IndexableSkipList()
+        self.entries = {}  # user_id -> (ranking key, name)
+
+    def update(self, user_id: str, name: str, points: int, achieved_at: float) -> bool:
+        current = self.entries.get(user_id)
+        if current is not None and -current[0][0] == points:
+            self.entries[user_id] = (current[0], name)
+            return False
+        if current is not None:
+            self.ranking.remove(current[0])
+        # Higher points first; ties go to whoever reached the score first
+        key = (-points, achieved_at, user_id)
+        self.ranking.insert(key)
+        self.entries[user_id] = (key, name)
+        return True
+
+    def rank(self, user_id: str):
+        current = self.entries.get(user_id)
+        if current is None:
+            return None
+        return {"rank": self.ranking.rank(current[0]) + 1, "name": current[1], "points": -current[0][0]}
+
+    def top(self, limit: int) -> list:
+        return [
+            {"rank": position + 1, "name": self.entries[user_id][1], "points": -points}
+            for position, (points, _, user_id) in enumerate(self.ranking.slice(0, limit))
+        ]
+
+
+def scopes(school: str, class_name: str) -> dict:
+    """Board keys for a student's school and class"""
+    school_key = normalize(school)
+    return {
+        "school": f"school:{school_key}",
+        "class": f"class:{school_key}:{normalize(class_name)}",
+    }
+
+
+def _best_key(item_id: str) -> str:
+    """Key of a practice set in an entry's `bests`; ids may contain dots or $"""
+    return quote(item_id, safe="").replace(".", "%2E")
+
+
+def _best_field(item_id: str) -> str:
+    return "bests." + _best_key(item_id)
+
+
+def total_points(bests: dict) -> int:
+    """Points for per-set bests; unknown sets count nothing and a set at most 100"""
+    bank = get_quiz_bank()
+    return sum(min(best, 100) for item_id, best in bests.items() if bank.has_set(item_id))
+
+
+def _entry_update(user: dict, bests: dict) -> dict:
+    """Raise an entry's per-set bests and refresh the student's name and scopes"""
+    return {
+        "$max": {_best_field(item_id): percentage for item_id, percentage in bests.items()},
+        "$set": {"name": user["name"], **scopes(user["school"], user["class_name"])}
+    }
+
+
+class Leaderboards:
+    """Entries in Mongo, with recently read boards cached in this process"""
+
+    def __init__(self):
+        self.boards = TTLCache(maxsize=LEADERBOARD_CACHE_SIZE, ttl=LEADERBOARD_CACHE_TTL)
+        self._loads = SingleFlight()
+        self.updates = 0
+        self.board_loads = 0
+
+    def _collection(self):
+        return get_db().leaderboard_entries
+
+    async def record(self, user, bests: dict) -> bool:
+        """Raise one student's per-set bests; returns whether their points went up"""
+        profile = {"id": user.id, "name": user.name, "school": user.school, "class_name": user.class_name}
+        return await self.record_many({user.id: {"user": profile, "bests": bests}}) > 0
+
+    async def record_many(self, raises: dict) -> int:
+        """
+        Raise per-set best percentages of many students; returns how many gained points
+
+        `raises` maps user ids to {"user": profile, "bests": {set id: best}}
+        as this worker knows them. Stale or replayed values are harmless:
+        they can never lower what another worker has recorded.
+        """
+        raises = {user_id: entry for user_id, entry in raises.items() if entry["bests"]}
+        if not raises:
+            return 0
+        entries = self._collection()
+        await entries.bulk_write([
+            UpdateOne({"_id": user_id}, _entry_update(entry["user"], entry["bests"]), upsert=True)
+            for user_id, entry in raises.items()
+        ], ordered=False)
+        achieved_at = datetime.now(timezone.utc)
+        raised = await _refresh_points(entries, list(raises), achieved_at)
+        self.updates += len(raised)
+        for user_id, points in raised.items():
+            user = raises[user_id]["user"]
+            for scope in scopes(user["school"], user["class_name"]).values():
+                board = self.boards.get(scope)
+                if board is not None:
+                    board.update(user_id, user["name"], points, achieved_at.timestamp())
+        return len(raised)
+
+    async def _load(self, kind: str, scope: str) -> Board:
+        board = Board()
+        cursor = self._collection().find(
+            {kind: scope, "points": {"$exists": True}}, {"name": 1, "points": 1, "achieved_at": 1}
+        )
+        async for doc in cursor:
+            board.update(doc["_id"], doc["name"], doc["points"], doc["achieved_at"].timestamp())
+        self.boards.set(scope, board)
+        self.board_loads += 1
+        return board
+
+    async def board(self, kind: str, scope: str) -> Board:
+        """Cached board of a scope, loaded from its entries when missing or expired"""
+        board = self.boards.get(scope)
+        if board is None:
+            board = await self._loads.do(scope, lambda: self._load(kind, scope))
+        return board
+
+    async def standings(self, user, kind: str, limit: int = 10) -> dict:
+        board = await self.board(kind, scopes(user.school, user.class_name)[kind])
+        return {
+            "scope": kind,
+            "size": len(board.ranking),
+            "top": board.top(min(limit, LEADERBOARD_MAX_LIMIT)),
+            "me": board.rank(user.id)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "updates": self.updates,
+            "board_loads": self.board_loads,
+            "cached_boards": self.boards.stats()
+        }
+
+
+leaderboards = Leaderboards()
+
+
+async def _refresh_points(entries, user_ids: list, achieved_at: datetime = None) -> dict:
+    """
+    Recompute points from the stored bests; returns the entries written and their points
+
+    With `achieved_at`, points are only ever raised and the time is
+    recorded: an update that saw more bests wins. Without it they are set
+    to whatever the bests add up to.
+    """
+    points = {}
+    async for doc in entries.find({"_id": {"$in": user_ids}}, {"bests": 1, "points": 1}):
+        bests = {unquote(field): best for field, best in doc.get("bests", {}).items()}
+        total = total_points(bests)
+        if total != doc.get("points"):
+            points[doc["_id"]] = (total, doc.get("points"))
+
+    operations = []
+    for user_id, (total, stored) in list(points.items()):
+        if achieved_at is None:
+            operations.append(UpdateOne({"_id": user_id}, {"$set": {"points": total}}))
+        elif stored is None or total > stored:
+            operations.append(UpdateOne(
+                {"_id": user_id, "$or": [{"points": {"$lt": total}}, {"points": {"$exists": False}}]},
+                {"$set": {"points": total, "achieved_at": achieved_at}}
+            ))
+        else:
+            del points[user_id]
+    if operations:
+        await entries.bulk_write(operations, ordered=False)
+    return {user_id: total for user_id, (total, _) in points.items()}
+
+
+async def rebuild(db, batch_size: int = 1000) -> dict:
+    """Recompute every entry from the progress and users collections"""
+    rows = {}
+    pipeline = [
+        {"$match": {"kind": "quiz", "best_percentage": {"$ne": None}}},
+        {"$group": {
+            "_id": "$user_id",
+            "bests": {"$push": {"item_id": "$item_id", "best": "$best_percentage"}},
+            "achieved_at": {"$max": "$updated_at"}
+        }},
+    ]
+    async for row in db.progress.aggregate(pipeline):
+        rows[row["_id"]] = row
+
+    bank = get_quiz_bank()
+    user_ids = list(rows)
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        cursor = db.users.find(
+            {"id": {"$in": user_ids[start:start + batch_size]}},
+            {"_id": 0, "id": 1, "name": 1, "school": 1, "class_name": 1}
+        )
+        operations, written_ids, emptied = [], [], []
+        async for user in cursor:
+            row = rows[user["id"]]
+            bests = {
+                entry["item_id"]: min(entry["best"], 100)
+                for entry in row["bests"] if bank.has_set(entry["item_id"])
+            }
+            if not bests:
+                emptied.append(user["id"])
+                continue
+            # Progress is the source of truth; replacing the bests drops values recorded before validation
+            update = {"$set": {
+                "name": user["name"], **scopes(user["school"], user["class_name"]),
+                "bests": {_best_key(item_id): best for item_id, best in bests.items()}
+            }}
+            update["$setOnInsert"] = {"achieved_at": row["achieved_at"] or datetime.now(timezone.utc)}
+            operations.append(UpdateOne({"_id": user["id"]}, update, upsert=True))
+            written_ids.append(user["id"])
+        if operations:
+            await db.leaderboard_entries.bulk_write(operations, ordered=False)
+            await _refresh_points(db.leaderboard_entries, written_ids)
+            written += len(operations)
+        if emptied:
+            await db.leaderboard_entries.delete_many({"_id": {"$in": emptied}})
+
+    # Per-worker snapshots written by earlier versions
+    await db.leaderboards.drop()
+    return {"users": len(rows), "entries": written}
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+    import database
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print(__doc__)
+        sys.exit(1)
+
+    async def main():
+        db = database.connect()
+        try:
+            report = await rebuild(db)
+        finally:
+            database.close()
+        print(json.dumps(report, indent=2))
+
+    asyncio.run(main())
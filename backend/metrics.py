@@ -0,0 +1,253 @@
+"""
+Prometheus-style metrics collected in process
+
+Counters, gauges and fixed-bucket histograms are plain dicts and lists
+updated without locks: every update is a handful of dict and list
+operations, cheap enough to stay on under production load. Updates from
+worker threads (bcrypt, pymongo listeners) rely on the GIL; a rare lost
+increment under contention is accepted in exchange for not locking.
+
+`render()` produces the Prometheus text exposition format served at
+/metrics. Each worker process exposes its own series.
+"""
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+LOOP_LAG_INTERVAL = 0.5
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, label_values)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value: float):
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+        # Counts are stored per bucket and accumulated when rendering
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def samples(self):
+        for label_values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, label_values)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram: Histogram, label_values: tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, including streamed bodies", ("method", "route")))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+mongo_duration = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips", ("command", "outcome")))
+bcrypt_duration = REGISTRY.register(Histogram(
+    "bcrypt_duration_seconds", "Password hashing work, excluding queueing", ("operation",), (0.01, 0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6)))
+jwt_duration = REGISTRY.register(Histogram(
+    "jwt_duration_seconds", "JWT encoding and decoding", ("operation",), (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)))
+llm_duration = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM round trips", ("model", "mode", "outcome"), LLM_BUCKETS))
+llm_first_token = REGISTRY.register(Histogram(
+    "llm_time_to_first_token_seconds", "Delay before the first streamed token", ("model",), LLM_BUCKETS))
+llm_tokens = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens reported by the LLM API", ("model", "type")))
+knowledge_tokens_saved = REGISTRY.register(Counter(
+    "chat_knowledge_tokens_saved_total", "System prompt tokens not sent thanks to topic routing"))
+llm_circuit_state = REGISTRY.register(Gauge(
+    "llm_circuit_state", "Circuit breaker state per model: 0 closed, 1 half-open, 2 open", ("model",)))
+llm_retries = REGISTRY.register(Counter(
+    "llm_retries_total", "LLM calls retried after a transient error", ("model", "mode")))
+llm_hedges = REGISTRY.register(Counter(
+    "llm_hedges_total", "Hedge requests sent after the p95 deadline", ("model", "mode")))
+llm_fallbacks = REGISTRY.register(Counter(
+    "chat_fallbacks_total", "Degraded chat answers by source", ("source",)))
+rate_limited = REGISTRY.register(Counter(
+    "chat_requests_limited_total", "Chat requests rejected with 429", ("reason",)))
+chat_batch_questions = REGISTRY.register(Counter(
+    "chat_batch_questions_total", "Questions in chat batches by outcome", ("outcome",)))
+llm_in_flight = REGISTRY.register(Gauge(
+    "llm_requests_in_flight", "LLM requests holding an upstream slot"))
+loop_lag = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer callback, a measure of event-loop blocking",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+
+def record_usage(model: str, usage: dict):
+    if usage:
+        llm_tokens.inc(model, "prompt", amount=usage["prompt_tokens"])
+        llm_tokens.inc(model, "completion", amount=usage["completion_tokens"])
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            # Route templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_duration.observe(time.perf_counter() - started, scope["method"], path)
+            http_requests.inc(scope["method"], path, str(status_code))
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Times MongoDB commands from pymongo command events"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name, "success")
+
+    def failed(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name, "failure")
+
+
+command_timer = CommandTimer()
+
+
+async def _measure_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag.observe(max(0.0, loop.time() - expected))
+
+
+_lag_task = None
+
+
+def start_loop_monitor():
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_measure_loop_lag())
+
+
+async def stop_loop_monitor():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        try:
+            await _lag_task
+        except asyncio.CancelledError:
+            pass
+        _lag_task = None
@@ -0,0 +1,198 @@
+"""
+Index bootstrap for the MongoDB collections
+
+Run automatically on app startup, or by hand:
+
+    python migrations.py                         # create missing indexes
+    python migrations.py --dry-run               # report what would change
+    python migrations.py --backfill-dates        # convert ISO string dates to BSON dates
+    python migrations.py --backfill-dates --dry-run
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Desired indexes per collection
+INDEXES = {
+    "users": [
+        IndexModel([("mobile", ASCENDING)], name="mobile_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "status_checks": [
+        # Serves the newest-first keyset pagination of GET /api/status
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id_desc"),
+    ],
+    "progress": [
+        IndexModel([("user_id", ASCENDING), ("item", ASCENDING)], name="user_item_unique", unique=True),
+    ],
+    "leaderboard_entries": [
+        # Board loads read one school or class in rank order
+        IndexModel([("school", ASCENDING), ("points", DESCENDING), ("achieved_at", ASCENDING)], name="school_rank"),
+        IndexModel([("class", ASCENDING), ("points", DESCENDING), ("achieved_at", ASCENDING)], name="class_rank"),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "chat_quotas": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "answer_cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        # TTL index - Mongo removes entries once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Indexes superseded by a definition above, dropped once the new one exists
+OBSOLETE_INDEXES = {
+    "status_checks": ["timestamp_desc"],
+}
+
+# Index options that must match for an existing index to count as the same
+_COMPARED_OPTIONS = ("unique", "expireAfterSeconds", "sparse", "partialFilterExpression")
+
+
+def _same_index(existing: dict, wanted: dict) -> bool:
+    if list(existing["key"]) != list(wanted["key"].items()):
+        return False
+    return all(existing.get(opt) == wanted.get(opt) for opt in _COMPARED_OPTIONS)
+
+
+async def ensure_indexes(db, dry_run: bool = False) -> dict:
+    """
+    Create missing indexes and return a report per collection
+
+    Each index is reported as `exists`, `created` (or `would_create` in dry
+    run), or `conflict` when an index with the same name but a different
+    definition is already present. Conflicts are never dropped automatically;
+    only the indexes listed in OBSOLETE_INDEXES are, as `dropped` (or
+    `would_drop`), and only after their replacement was built.
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        results = []
+        to_create = []
+
+        for model in models:
+            wanted = model.document
+            name = wanted["name"]
+            if name in existing:
+                state = "exists" if _same_index(existing[name], wanted) else "conflict"
+            else:
+                state = "would_create" if dry_run else "created"
+                to_create.append(model)
+            results.append({"name": name, "keys": dict(wanted["key"]), "state": state})
+
+        if to_create and not dry_run:
+            try:
+                await collection.create_indexes(to_create)
+            except Exception as e:
+                # Typically duplicate data blocking a unique index
+                logger.error(f"Index creation failed on {collection_name}: {e}")
+                for result in results:
+                    if result["state"] == "created":
+                        result["state"] = "failed"
+                        result["error"] = str(e)
+
+        replaced = all(result["state"] in ("exists", "created", "would_create") for result in results)
+        for name in OBSOLETE_INDEXES.get(collection_name, []):
+            if name not in existing or not replaced:
+                continue
+            if dry_run:
+                state = "would_drop"
+            else:
+                try:
+                    await collection.drop_index(name)
+                    state = "dropped"
+                except Exception as e:
+                    logger.error(f"Dropping index {collection_name}.{name} failed: {e}")
+                    state = "failed"
+            results.append({"name": name, "keys": dict(existing[name]["key"]), "state": state})
+
+        report[collection_name] = results
+    return report
+
+
+# Fields that used to be written as ISO strings
+DATE_FIELDS = [
+    ("status_checks", "timestamp"),
+    ("users", "created_at"),
+]
+
+
+def _parse_iso(value: str):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # Naive strings were written with datetime.utcnow()
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def backfill_native_dates(db, batch_size: int = 500, pause: float = 0.05, dry_run: bool = False) -> dict:
+    """
+    Convert string-typed date fields to native BSON dates, batch by batch
+
+    Safe to run against a live database: each update is conditional on the
+    field still holding the string that was read, and a short pause between
+    batches keeps the load on the primary low. Unparseable values are left
+    alone and counted as skipped.
+    """
+    report = {}
+    for collection_name, field in DATE_FIELDS:
+        collection = db[collection_name]
+        query = {field: {"$type": "string"}}
+        stats = {"pending": await collection.count_documents(query), "converted": 0, "skipped": 0}
+        if dry_run:
+            report[f"{collection_name}.{field}"] = stats
+            continue
+
+        skipped_ids = []
+        while True:
+            batch = await collection.find(
+                {**query, "_id": {"$nin": skipped_ids}}, {"_id": 1, field: 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            updates = []
+            for doc in batch:
+                parsed = _parse_iso(doc[field])
+                if parsed is None:
+                    skipped_ids.append(doc["_id"])
+                    continue
+                updates.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+
+            if updates:
+                result = await collection.bulk_write(updates, ordered=False)
+                stats["converted"] += result.modified_count
+            await asyncio.sleep(pause)
+
+        stats["skipped"] = len(skipped_ids)
+        report[f"{collection_name}.{field}"] = stats
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+    import database
+
+    async def main():
+        db = database.connect()
+        dry_run = "--dry-run" in sys.argv
+        try:
+            if "--backfill-dates" in sys.argv:
+                report = await backfill_native_dates(db, dry_run=dry_run)
+            else:
+                report = await ensure_indexes(db, dry_run=dry_run)
+        finally:
+            database.close()
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    asyncio.run(main())
@@ -0,0 +1,421 @@
+"""
+Write-behind sync of quiz scores and flashcard progress
+
+Progress events are merged into an in-memory per-user view and into a
+pending buffer that is flushed to Mongo with one `bulk_write` of upserts
+once PROGRESS_FLUSH_SIZE events are pending or every
+PROGRESS_FLUSH_INTERVAL seconds. Each event carries a client-generated
+idempotency key, and each write is conditional on the item not holding
+that key yet. A device retrying on a flaky network, a retry that reaches
+another worker, or a flush replayed after a timeout never counts the same
+quiz attempt twice.
+
+Quiz bests that rise are collected per user and written to the
+leaderboards by the same flush, so a sync makes no Mongo writes of its own.
+
+A write that keeps failing is retried on the next PROGRESS_MAX_ATTEMPTS
+flushes and then dropped and counted. Once PROGRESS_MAX_BUFFERED writes are
+waiting, new syncs get 503 until Mongo catches up, so an outage cannot grow
+the buffer without bound.
+"""
+import os
+import math
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field, validator, root_validator
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ttl_cache import TTLCache
+from database import get_db
+from leaderboard import leaderboards, total_points
+from quiz_service import get_quiz_bank
+
+logger = logging.getLogger(__name__)
+
+# Progress sync configuration
+PROGRESS_FLUSH_SIZE = int(os.environ.get('PROGRESS_FLUSH_SIZE', '200'))
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', '2.0'))
+PROGRESS_CACHE_SIZE = int(os.environ.get('PROGRESS_CACHE_SIZE', '5000'))
+PROGRESS_CACHE_TTL = float(os.environ.get('PROGRESS_CACHE_TTL', '900'))
+# Idempotency keys remembered per item, persisted with the item
+PROGRESS_KEYS_PER_ITEM = int(os.environ.get('PROGRESS_KEYS_PER_ITEM', '20'))
+PROGRESS_MAX_ATTEMPTS = int(os.environ.get('PROGRESS_MAX_ATTEMPTS', '5'))
+PROGRESS_MAX_BUFFERED = int(os.environ.get('PROGRESS_MAX_BUFFERED', '20000'))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ProgressEvent(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+    kind: str = Field(..., pattern="^(quiz|flashcard)$")
+    item_id: str = Field(..., min_length=1, max_length=100)
+    # Quiz attempts
+    score: Optional[int] = Field(None, ge=0)
+    total: Optional[int] = Field(None, ge=1)
+    # Flashcard reviews
+    known: Optional[bool] = None
+    recorded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @validator('recorded_at')
+    def assume_utc(cls, v):
+        # Device clocks can run ahead; never accept a time in the future
+        v = v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+        return min(v, datetime.now(timezone.utc))
+
+    @root_validator(skip_on_failure=True)
+    def check_fields(cls, values):
+        if values['kind'] == 'quiz':
+            if values.get('score') is None or values.get('total') is None:
+                raise ValueError('quiz events need score and total')
+            if values['score'] > values['total']:
+                raise ValueError('score cannot exceed total')
+            # Points on the leaderboards come from these; only real practice sets count
+            if not get_quiz_bank().has_set(values['item_id']):
+                raise ValueError('unknown practice set')
+        if values['kind'] == 'flashcard' and values.get('known') is None:
+            raise ValueError('flashcard events need known')
+        return values
+
+
+class ProgressSync(BaseModel):
+    events: List[ProgressEvent] = Field(..., max_length=500)
+
+
+def _apply(item: dict, event: ProgressEvent) -> dict:
+    """Merge an event into an item's state and return the Mongo update for it"""
+    newer = item.get("updated_at") is None or event.recorded_at >= item["updated_at"]
+    latest, inc, maximum = {}, {}, {"updated_at": event.recorded_at}
+    if event.kind == "quiz":
+        percentage = min(round(100 * event.score / event.total), 100)
+        inc["attempts"] = 1
+        maximum["best_percentage"] = percentage
+        if newer:
+            latest = {"last_score": event.score, "last_total": event.total}
+    else:
+        inc["reviews"] = 1
+        if newer:
+            latest = {"known": event.known}
+
+    item.update(latest)
+    for field, delta in inc.items():
+        item[field] = item.get(field, 0) + delta
+    for field, value in maximum.items():
+        if item.get(field) is None or value > item[field]:
+            item[field] = value
+    return {"set": latest, "inc": inc, "max": maximum}
+
+
+class _PendingWrite:
+    """One accepted event's change to a progress item, not yet written"""
+
+    def __init__(self, user_id: str, key: str, event: ProgressEvent, change: dict):
+        self.user_id = user_id
+        self.key = key
+        self.kind = event.kind
+        self.item_id = event.item_id
+        self.event_key = event.idempotency_key
+        self.change = change
+        self.attempts = 0
+
+    def apply_to(self, item: dict):
+        item.update(self.change["set"])
+        for field, delta in self.change["inc"].items():
+            item[field] = item.get(field, 0) + delta
+        for field, value in self.change["max"].items():
+            if item.get(field) is None or value > item[field]:
+                item[field] = value
+
+    def operation(self) -> UpdateOne:
+        """
+        Upsert that applies the event at most once however often it is sent
+
+        The event's key is part of the filter, so once an item holds it a
+        replay matches nothing; the upsert then collides with the unique
+        (user_id, item) index and fails with a duplicate key error instead
+        of counting the event again.
+        """
+        update = {
+            "$set": {**self.change["set"], "kind": self.kind, "item_id": self.item_id},
+            "$push": {"event_keys": {"$each": [self.event_key], "$slice": -PROGRESS_KEYS_PER_ITEM}},
+        }
+        if self.change["inc"]:
+            update["$inc"] = self.change["inc"]
+        if self.change["max"]:
+            update["$max"] = self.change["max"]
+        return UpdateOne(
+            {"user_id": self.user_id, "item": self.key, "event_keys": {"$ne": self.event_key}},
+            update, upsert=True
+        )
+
+
+class ProgressStore:
+    """Per-user progress cache in front of a write-behind buffer"""
+
+    def __init__(self):
+        self._users = TTLCache(maxsize=PROGRESS_CACHE_SIZE, ttl=PROGRESS_CACHE_TTL)
+        # Writes not yet acknowledged by Mongo, oldest first
+        self._pending = []
+        self._retries = []
+        self._in_flight = []
+        # Raised quiz bests per user, for the leaderboards
+        self._bests = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        self.events = 0
+        self.duplicates = 0
+        self.replays = 0
+        self.flushes = 0
+        self.writes = 0
+        self.flush_failures = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.leaderboard_failures = 0
+
+    def _collection(self):
+        return get_db().progress
+
+    def _buffered(self) -> int:
+        return len(self._in_flight) + len(self._retries) + len(self._pending)
+
+    def _unwritten(self, user_id: str) -> list:
+        return [
+            write for write in self._in_flight + self._retries + self._pending
+            if write.user_id == user_id
+        ]
+
+    async def _load(self, user_id: str) -> dict:
+        """The user's items and seen idempotency keys, from cache or Mongo"""
+        state = self._users.get(user_id)
+        if state is not None:
+            return state
+        # Writes of a flush that completes during the read may or may not be in it
+        unwritten = self._unwritten(user_id)
+        docs = [doc async for doc in self._collection().find({"user_id": user_id}, {"_id": 0})]
+        state = self._users.get(user_id)
+        if state is not None:
+            # A concurrent request loaded the user while we were reading
+            return state
+        state = {"items": {}, "keys": set()}
+        for doc in docs:
+            state["keys"].update(doc.pop("event_keys", []))
+            state["items"][doc["item"]] = doc
+        # Overlay every write whose event Mongo did not return
+        for write in unwritten + self._unwritten(user_id):
+            if write.event_key in state["keys"]:
+                continue
+            item = state["items"].setdefault(write.key, {"user_id": user_id, "item": write.key, "kind": write.kind, "item_id": write.item_id})
+            write.apply_to(item)
+            state["keys"].add(write.event_key)
+        self._users.set(user_id, state)
+        return state
+
+    async def record(self, user_id: str, events: List[ProgressEvent]) -> dict:
+        if self._buffered() + len(events) > PROGRESS_MAX_BUFFERED:
+            # Mongo is not keeping up; the client keeps its events and retries
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Progress sync is busy, please retry shortly",
+                headers={"Retry-After": str(math.ceil(PROGRESS_FLUSH_INTERVAL))}
+            )
+        state = await self._load(user_id)
+        accepted = duplicates = 0
+        raised = {}
+        for event in events:
+            if event.idempotency_key in state["keys"]:
+                duplicates += 1
+                continue
+            key = f"{event.kind}:{event.item_id}"
+            item = state["items"].setdefault(key, {"user_id": user_id, "item": key, "kind": event.kind, "item_id": event.item_id})
+            best = item.get("best_percentage")
+            change = _apply(item, event)
+            if event.kind == "quiz" and (best is None or item["best_percentage"] > best):
+                raised[event.item_id] = item["best_percentage"]
+            self._pending.append(_PendingWrite(user_id, key, event, change))
+            state["keys"].add(event.idempotency_key)
+            accepted += 1
+
+        self.events += accepted
+        self.duplicates += duplicates
+        if len(self._pending) >= PROGRESS_FLUSH_SIZE:
+            await self.flush()
+        points = total_points({
+            item["item_id"]: item["best_percentage"]
+            for item in state["items"].values() if item["kind"] == "quiz" and item.get("best_percentage") is not None
+        })
+        return {"accepted": accepted, "duplicates": duplicates, "points": points, "raised": raised}
+
+    def raise_bests(self, user, bests: dict):
+        """Queue a student's raised quiz bests for the leaderboards"""
+        entry = self._bests.setdefault(user.id, {"bests": {}, "attempts": 0})
+        entry["user"] = {"id": user.id, "name": user.name, "school": user.school, "class_name": user.class_name}
+        for item_id, best in bests.items():
+            entry["bests"][item_id] = max(best, entry["bests"].get(item_id, best))
+
+    async def get(self, user_id: str) -> list:
+        state = await self._load(user_id)
+        return [
+            {key: value for key, value in item.items() if key != "user_id"}
+            for item in state["items"].values()
+        ]
+
+    async def flush(self) -> int:
+        """Write all buffered events in one unordered bulk_write; returns how many were written"""
+        async with self._flush_lock:
+            written = await self._flush_events()
+            await self._flush_bests()
+            return written
+
+    async def _flush_events(self) -> int:
+        batch = self._retries + self._pending
+        if not batch:
+            return 0
+        self._retries, self._pending = [], []
+        self._in_flight = batch
+        try:
+            failed = await self._write(batch)
+        finally:
+            self._in_flight = []
+        # Every write is idempotent, so failed ones are simply sent again
+        self._retries = self._give_up(failed)
+        if not failed:
+            self.flushes += 1
+        self.writes += len(batch) - len(failed)
+        return len(batch) - len(failed)
+
+    async def _flush_bests(self):
+        """Write the queued quiz bests to the leaderboards"""
+        if not self._bests:
+            return
+        queued, self._bests = self._bests, {}
+        try:
+            await leaderboards.record_many(queued)
+            return
+        except Exception as e:
+            logger.error(f"Leaderboard flush of {len(queued)} students failed: {e}")
+            self.leaderboard_failures += 1
+        # $max makes a resend harmless; fold back anything queued meanwhile
+        for user_id, entry in queued.items():
+            entry["attempts"] += 1
+            if entry["attempts"] >= PROGRESS_MAX_ATTEMPTS:
+                logger.error(f"Dropping leaderboard update for {user_id} after {entry['attempts']} failed attempts")
+                self.dropped += 1
+                continue
+            newer = self._bests.get(user_id)
+            if newer is not None:
+                for item_id, best in newer["bests"].items():
+                    entry["bests"][item_id] = max(best, entry["bests"].get(item_id, best))
+                entry["user"] = newer["user"]
+            self._bests[user_id] = entry
+
+    async def _write(self, batch: list) -> list:
+        """Send the batch and return the writes that have to be retried"""
+        try:
+            await self._collection().bulk_write([write.operation() for write in batch], ordered=False)
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            logger.error(f"Progress flush: {len(errors)} of {len(batch)} writes failed")
+        except Exception as e:
+            # A timeout may hide a partial apply; replaying is safe
+            logger.error(f"Progress flush of {len(batch)} writes failed: {e}")
+            self.flush_failures += 1
+            return batch
+
+        self.flush_failures += 1
+        failed = []
+        for error in errors:
+            write = batch[error["index"]]
+            if error.get("code") == DUPLICATE_KEY_ERROR and await self._already_applied(write):
+                # A replay, or a client retry that another worker wrote first
+                self.replays += 1
+                # The cached view counted the event; reload it from Mongo
+                self._users.pop(write.user_id)
+                continue
+            failed.append(write)
+        return failed
+
+    def _give_up(self, failed: list) -> list:
+        """Drop writes that have failed PROGRESS_MAX_ATTEMPTS times; returns the rest"""
+        retries = []
+        for write in failed:
+            write.attempts += 1
+            if write.attempts < PROGRESS_MAX_ATTEMPTS:
+                retries.append(write)
+                continue
+            logger.error(
+                f"Dropping progress write for {write.user_id} {write.key} "
+                f"after {write.attempts} failed attempts"
+            )
+            self.dropped += 1
+            # The cached view counted the event; reload it from Mongo
+            self._users.pop(write.user_id)
+        return retries
+
+    async def _already_applied(self, write: _PendingWrite) -> bool:
+        """Whether a duplicate key error means the item already holds the event"""
+        # Two workers upserting the same new item also collide; that write still has to happen
+        doc = await self._collection().find_one(
+            {"user_id": write.user_id, "item": write.key, "event_keys": write.event_key}, {"_id": 1}
+        )
+        return doc is not None
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(PROGRESS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Progress flusher error: {e}")
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop the periodic flusher and write out whatever is buffered"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "events": self.events,
+            "duplicates": self.duplicates,
+            "pending_writes": len(self._pending),
+            "retrying_writes": len(self._retries),
+            "replays": self.replays,
+            "flushes": self.flushes,
+            "items_written": self.writes,
+            "flush_failures": self.flush_failures,
+            "dropped_writes": self.dropped,
+            "rejected_syncs": self.rejected,
+            "queued_leaderboard_updates": len(self._bests),
+            "leaderboard_failures": self.leaderboard_failures,
+            "users": self._users.stats()
+        }
+
+
+progress_store = ProgressStore()
+
+
+async def sync_progress(user, sync: ProgressSync) -> dict:
+    if not sync.events:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No progress events")
+    result = await progress_store.record(user.id, sync.events)
+    raised = result.pop("raised")
+    if raised:
+        progress_store.raise_bests(user, raised)
+    return result
+
+
+async def get_progress(user_id: str) -> dict:
+    return {"items": await progress_store.get(user_id)}
@@ -0,0 +1,158 @@
+"""
+Practice quizzes drawn from precomputed question pools
+
+Pools are built once from content/practice_sets.json. A quiz is identified
+by `(set_id, seed)`: the same pair always yields the same questions in the
+same order with the same option order, so a class can share a seed and be
+graded and compared on identical papers.
+"""
+import os
+import json
+import random
+import secrets
+from pathlib import Path
+from typing import List, Optional
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
+from ttl_cache import TTLCache
+
+CONTENT_DIR = Path(__file__).parent / 'content'
+
+# Quiz configuration
+QUIZ_DEFAULT_QUESTIONS = int(os.environ.get('QUIZ_DEFAULT_QUESTIONS', '20'))
+QUIZ_CACHE_SIZE = int(os.environ.get('QUIZ_CACHE_SIZE', '1000'))
+QUIZ_CACHE_TTL = float(os.environ.get('QUIZ_CACHE_TTL', '3600'))
+
+
+class QuizGradeRequest(BaseModel):
+    seed: str = Field(..., min_length=1, max_length=64)
+    count: int = Field(QUIZ_DEFAULT_QUESTIONS, ge=1, le=100)
+    # Chosen option per question in quiz order, None when skipped
+    answers: List[Optional[str]] = Field(..., max_length=100)
+
+
+class QuestionPool:
+    """Questions of one practice set with stable ids"""
+
+    def __init__(self, practice_set: dict):
+        self.set_id = practice_set["id"]
+        self.meta = {key: practice_set.get(key) for key in ("id", "title", "description", "difficulty", "icon")}
+        self.questions = [
+            {**question, "id": f"{self.set_id}-{index + 1}"}
+            for index, question in enumerate(practice_set["questions"])
+        ]
+
+    def summary(self) -> dict:
+        return {**self.meta, "pool_size": len(self.questions)}
+
+
+class QuizBank:
+    """Seeded quiz rendering and grading over all question pools"""
+
+    def __init__(self, practice_sets: list):
+        self.pools = {practice_set["id"]: QuestionPool(practice_set) for practice_set in practice_sets}
+        # Set ids as clients send them in progress events
+        self.set_ids = frozenset(str(set_id) for set_id in self.pools)
+        self._rendered = TTLCache(maxsize=QUIZ_CACHE_SIZE, ttl=QUIZ_CACHE_TTL)
+
+    @classmethod
+    def from_content(cls, content_dir: Path = CONTENT_DIR):
+        return cls(json.loads((content_dir / 'practice_sets.json').read_text(encoding='utf-8')))
+
+    def pool(self, set_id: int) -> QuestionPool:
+        pool = self.pools.get(set_id)
+        if pool is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Practice set not found")
+        return pool
+
+    def has_set(self, item_id: str) -> bool:
+        return item_id in self.set_ids
+
+    def sets(self) -> list:
+        return [pool.summary() for pool in self.pools.values()]
+
+    def render(self, set_id: int, seed: str, count: int = QUIZ_DEFAULT_QUESTIONS) -> dict:
+        """The quiz for `(set_id, seed)`, with answers"""
+        pool = self.pool(set_id)
+        count = min(count, len(pool.questions))
+        cache_key = (set_id, seed, count)
+        quiz = self._rendered.get(cache_key)
+        if quiz is not None:
+            return quiz
+
+        rng = random.Random(f"{set_id}:{seed}")
+        # Sampling indices picks k questions without shuffling the whole pool
+        picked = [pool.questions[i] for i in rng.sample(range(len(pool.questions)), count)]
+        questions = [
+            {
+                "id": question["id"],
+                "question": question["question"],
+                "options": rng.sample(question["options"], len(question["options"])),
+                "correctAnswer": question["correctAnswer"],
+                "explanation": question["explanation"]
+            }
+            for question in picked
+        ]
+        quiz = {**pool.meta, "seed": seed, "count": count, "questions": questions}
+        self._rendered.set(cache_key, quiz)
+        return quiz
+
+    def grade(self, set_id: int, request: QuizGradeRequest) -> dict:
+        """Score answers against the quiz they were given for"""
+        quiz = self.render(set_id, request.seed, request.count)
+        if len(request.answers) != len(quiz["questions"]):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Expected {len(quiz['questions'])} answers"
+            )
+
+        results = []
+        for question, answer in zip(quiz["questions"], request.answers):
+            results.append({
+                "id": question["id"],
+                "answer": answer,
+                "correct": answer == question["correctAnswer"],
+                "correctAnswer": question["correctAnswer"],
+                "explanation": question["explanation"]
+            })
+        score = sum(result["correct"] for result in results)
+        return {
+            "set_id": set_id,
+            "seed": request.seed,
+            "score": score,
+            "total": len(results),
+            "percentage": round(100 * score / len(results)) if results else 0,
+            "results": results
+        }
+
+    def stats(self) -> dict:
+        return {"sets": len(self.pools), "rendered_cache": self._rendered.stats()}
+
+
+def new_seed() -> str:
+    return secrets.token_hex(4)
+
+
+def without_answers(quiz: dict) -> dict:
+    """Copy of a quiz safe to hand out for a graded test"""
+    return {
+        **quiz,
+        "questions": [
+            {key: question[key] for key in ("id", "question", "options")}
+            for question in quiz["questions"]
+        ]
+    }
+
+
+_bank = None
+
+
+def load_quiz_bank() -> QuizBank:
+    """Build the question pools from the bundled content"""
+    global _bank
+    _bank = QuizBank.from_content()
+    return _bank
+
+
+def get_quiz_bank() -> QuizBank:
+    return _bank if _bank is not None else load_quiz_bank()
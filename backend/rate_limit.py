@@ -0,0 +1,247 @@
+"""
+Chat rate limiting and daily LLM token quotas
+
+Every chat request takes a token from a bucket keyed by the caller: the
+user id for authenticated requests, the client IP otherwise. Completion
+tokens reported by the model are charged to daily quotas for the caller and
+their school. Both checks run before any cache lookup or upstream call and
+fail with 429 and a Retry-After header.
+
+With RATE_LIMIT_STORE=mongo, buckets and quota counters are kept in
+MongoDB so all workers share them. That is the default when
+WEB_CONCURRENCY says more than one worker is running (serve.py sets it):
+with per-process state every rate and daily quota would be multiplied by
+the number of workers. A single worker keeps its state in process.
+"""
+import os
+import math
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from ttl_cache import TTLCache
+from devanagari import normalize
+from metrics import rate_limited
+
+logger = logging.getLogger(__name__)
+
+# Rate limit configuration
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# memory | mongo; shared through Mongo by default when several workers run
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE') or (
+    'mongo' if int(os.environ.get('WEB_CONCURRENCY') or '1') > 1 else 'memory'
+)
+# Sustained requests per minute and burst size, for users and anonymous IPs
+CHAT_RATE_PER_MINUTE = float(os.environ.get('CHAT_RATE_PER_MINUTE', '20'))
+CHAT_RATE_BURST = int(os.environ.get('CHAT_RATE_BURST', '10'))
+CHAT_ANON_RATE_PER_MINUTE = float(os.environ.get('CHAT_ANON_RATE_PER_MINUTE', '6'))
+CHAT_ANON_RATE_BURST = int(os.environ.get('CHAT_ANON_RATE_BURST', '3'))
+# Daily completion-token quotas; 0 disables a quota
+CHAT_DAILY_TOKENS_USER = int(os.environ.get('CHAT_DAILY_TOKENS_USER', '50000'))
+CHAT_DAILY_TOKENS_ANON = int(os.environ.get('CHAT_DAILY_TOKENS_ANON', '10000'))
+CHAT_DAILY_TOKENS_SCHOOL = int(os.environ.get('CHAT_DAILY_TOKENS_SCHOOL', '1000000'))
+# Quotas reset at local midnight (default IST)
+CHAT_QUOTA_UTC_OFFSET_MINUTES = int(os.environ.get('CHAT_QUOTA_UTC_OFFSET_MINUTES', '330'))
+# Only honour X-Forwarded-For behind a proxy that sets it
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+
+RATE_LIMIT_CACHE_SIZE = 100000
+
+
+def client_ip(request) -> str:
+    """Address of the caller, from X-Forwarded-For when trusted"""
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class Caller:
+    """Who a chat request is limited and charged as"""
+
+    def __init__(self, user=None, ip: str = None):
+        if user is not None:
+            self.key = f"user:{user.id}"
+            self.school_key = f"school:{normalize(user.school)}" if user.school else None
+            self.rate, self.burst = CHAT_RATE_PER_MINUTE / 60, CHAT_RATE_BURST
+            self.daily_tokens = CHAT_DAILY_TOKENS_USER
+        else:
+            self.key = f"ip:{ip}"
+            self.school_key = None
+            self.rate, self.burst = CHAT_ANON_RATE_PER_MINUTE / 60, CHAT_ANON_RATE_BURST
+            self.daily_tokens = CHAT_DAILY_TOKENS_ANON
+
+    def quotas(self) -> dict:
+        """Quota key -> daily token limit"""
+        quotas = {}
+        if self.daily_tokens:
+            quotas[self.key] = self.daily_tokens
+        if self.school_key and CHAT_DAILY_TOKENS_SCHOOL:
+            quotas[self.school_key] = CHAT_DAILY_TOKENS_SCHOOL
+        return quotas
+
+
+def quota_day(now: datetime = None):
+    """Current quota day and seconds until it resets"""
+    offset = timedelta(minutes=CHAT_QUOTA_UTC_OFFSET_MINUTES)
+    local = (now or datetime.now(timezone.utc)) + offset
+    next_midnight = datetime(local.year, local.month, local.day, tzinfo=timezone.utc) + timedelta(days=1)
+    return local.strftime('%Y-%m-%d'), (next_midnight - local).total_seconds()
+
+
+class MemoryStore:
+    """Buckets and quota counters of this worker only"""
+
+    def __init__(self):
+        # A bucket that has refilled completely is the same as no bucket, so
+        # entries may expire once the refill time has passed
+        self.buckets = TTLCache(maxsize=RATE_LIMIT_CACHE_SIZE, ttl=3600)
+        self.usage = TTLCache(maxsize=RATE_LIMIT_CACHE_SIZE, ttl=24 * 3600)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self.buckets.set(key, (tokens - 1, now), ttl=burst / rate)
+            return 0.0
+        self.buckets.set(key, (tokens, now), ttl=burst / rate)
+        return (1 - tokens) / rate
+
+    async def used(self, keys: list, day: str) -> dict:
+        return {key: self.usage.get(f"{day}:{key}", 0) for key in keys}
+
+    async def charge(self, keys: list, day: str, amount: int, ttl: float):
+        for key in keys:
+            entry = f"{day}:{key}"
+            self.usage.set(entry, self.usage.get(entry, 0) + amount, ttl=ttl)
+
+
+class MongoStore:
+    """Buckets and quota counters shared by all workers through MongoDB"""
+
+    def __init__(self, db):
+        self.buckets = db.rate_limits
+        self.usage = db.chat_quotas
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = datetime.now(timezone.utc)
+        # Refill and take in one atomic pipeline update
+        refilled = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}, rate]}
+        ]}]}
+        doc = await self.buckets.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=burst / rate)
+                }},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return 0.0 if doc["allowed"] else (1 - doc["tokens"]) / rate
+
+    async def used(self, keys: list, day: str) -> dict:
+        docs = await self.usage.find({"_id": {"$in": [f"{day}:{key}" for key in keys]}}).to_list(len(keys))
+        used = {doc["_id"].split(":", 1)[1]: doc["tokens"] for doc in docs}
+        return {key: used.get(key, 0) for key in keys}
+
+    async def charge(self, keys: list, day: str, amount: int, ttl: float):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        for key in keys:
+            await self.usage.update_one(
+                {"_id": f"{day}:{key}"},
+                {"$inc": {"tokens": amount}, "$set": {"expires_at": expires_at}},
+                upsert=True
+            )
+
+
+class ChatLimiter:
+    """Request-rate and token-quota gate in front of the chat endpoints"""
+
+    def __init__(self):
+        self.store = MemoryStore()
+        self.allowed = 0
+        self.rate_limited = 0
+        self.over_quota = 0
+        self.tokens_charged = 0
+
+    def attach(self, db):
+        """Share state through MongoDB when configured"""
+        if RATE_LIMIT_STORE == "mongo":
+            self.store = MongoStore(db)
+
+    async def check(self, caller: Caller):
+        """Raise 429 if the caller is over its request rate or a daily quota"""
+        if not RATE_LIMIT_ENABLED:
+            return
+        retry_after = await self.store.take(caller.key, caller.rate, caller.burst)
+        if retry_after:
+            self.rate_limited += 1
+            rate_limited.inc("rate")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many chat requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+        await self.check_quota(caller)
+        self.allowed += 1
+
+    async def check_quota(self, caller: Caller):
+        """Raise 429 if one of the caller's daily token quotas is used up"""
+        if not RATE_LIMIT_ENABLED:
+            return
+        quotas = caller.quotas()
+        if not quotas:
+            return
+        day, reset_in = quota_day()
+        used = await self.store.used(list(quotas), day)
+        exhausted = [key for key, limit in quotas.items() if used[key] >= limit]
+        if exhausted:
+            self.over_quota += 1
+            rate_limited.inc("quota")
+            scope = "School" if exhausted[0].startswith("school:") else "Daily"
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"{scope} chat token quota exhausted",
+                headers={"Retry-After": str(math.ceil(reset_in))}
+            )
+
+    async def charge(self, caller: Caller, usage: dict):
+        """Count a completion's tokens against the caller's quotas"""
+        if not RATE_LIMIT_ENABLED or not usage:
+            return
+        quotas = caller.quotas()
+        if not quotas:
+            return
+        day, reset_in = quota_day()
+        amount = usage["completion_tokens"]
+        self.tokens_charged += amount
+        try:
+            await self.store.charge(list(quotas), day, amount, reset_in + 3600)
+        except Exception:
+            # The answer has been produced; losing a charge is better than failing it
+            logger.exception("Failed to charge chat tokens for %s", caller.key)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "store": type(self.store).__name__,
+            "allowed": self.allowed,
+            "rate_limited": self.rate_limited,
+            "over_quota": self.over_quota,
+            "completion_tokens_charged": self.tokens_charged
+        }
+
+
+chat_limiter = ChatLimiter()
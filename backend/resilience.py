@@ -0,0 +1,358 @@
+"""
+Retries, circuit breaking and request hedging for upstream LLM calls
+
+Each model gets a circuit breaker shared by all call modes. Calls are
+retried on transient errors (timeouts, connection failures, 429 and 5xx)
+with full-jitter exponential backoff inside an overall deadline. Once a
+mode has enough latency samples, a call still running after that mode's
+p95 is hedged with a second identical request and the first to succeed
+wins; hedges are capped at a fraction of calls so they cannot double the
+upstream load during a slowdown, and are skipped when the caller has no
+free upstream slot to give them.
+
+When the breaker is open calls fail fast with CircuitOpenError, and callers
+fall back to a degraded answer instead of queueing on a dead upstream.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from metrics import llm_circuit_state, llm_retries, llm_hedges, llm_fallbacks
+
+logger = logging.getLogger(__name__)
+
+# Resilience configuration
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_RETRY_BASE_DELAY = float(os.environ.get('LLM_RETRY_BASE_DELAY', '0.25'))
+LLM_RETRY_MAX_DELAY = float(os.environ.get('LLM_RETRY_MAX_DELAY', '4'))
+# Overall time budget for one call including retries
+LLM_DEADLINE = float(os.environ.get('LLM_DEADLINE', '45'))
+# The breaker opens when this fraction of the last LLM_BREAKER_WINDOW calls failed
+LLM_BREAKER_WINDOW = int(os.environ.get('LLM_BREAKER_WINDOW', '20'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_FAILURE_RATIO = float(os.environ.get('LLM_BREAKER_FAILURE_RATIO', '0.5'))
+LLM_BREAKER_RESET_TIMEOUT = float(os.environ.get('LLM_BREAKER_RESET_TIMEOUT', '30'))
+LLM_HEDGE = os.environ.get('LLM_HEDGE', 'true').lower() == 'true'
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '1.0'))
+# At most this fraction of calls may send a hedge
+LLM_HEDGE_BUDGET = float(os.environ.get('LLM_HEDGE_BUDGET', '0.1'))
+
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """The model's circuit breaker is rejecting calls"""
+
+
+class UpstreamUnavailable(Exception):
+    """Retries were exhausted on transient upstream errors"""
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Transient failures worth another attempt"""
+    # Imported here to keep them off the startup path; by the time a call
+    # has failed the client has loaded both
+    import httpx
+    import openai
+
+    if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in (408, 409) or exc.status_code >= 500
+    return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _retry_after(exc: Exception) -> float:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+def backoff_delay(attempt: int, exc: Exception = None) -> float:
+    """Full-jitter exponential backoff, at least the server's Retry-After"""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+    return max(delay, _retry_after(exc)) if exc is not None else delay
+
+
+class CircuitBreaker:
+    """
+    Failure-ratio circuit breaker over a sliding window of outcomes
+
+    Open rejects every call until LLM_BREAKER_RESET_TIMEOUT has passed, then
+    half-open lets a single probe through: its success closes the breaker,
+    its failure opens it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=LLM_BREAKER_WINDOW)
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self._probing = False
+        llm_circuit_state.set(name, value=0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("Circuit breaker for %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+            llm_circuit_state.set(self.name, value=_STATE_VALUES[state])
+
+    def current_state(self) -> str:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= LLM_BREAKER_RESET_TIMEOUT:
+            self._set_state(HALF_OPEN)
+        return self.state
+
+    def acquire(self) -> bool:
+        """Whether a call may go upstream now; half-open admits one probe"""
+        state = self.current_state()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """End a call whose outcome says nothing about upstream health"""
+        self._probing = False
+
+    def success(self):
+        self._probing = False
+        self.outcomes.append(True)
+        if self.state == HALF_OPEN:
+            self.outcomes.clear()
+            self._set_state(CLOSED)
+
+    def failure(self):
+        self._probing = False
+        self.outcomes.append(False)
+        failures = self.outcomes.count(False)
+        if self.state == HALF_OPEN or (
+            len(self.outcomes) >= LLM_BREAKER_MIN_CALLS
+            and failures / len(self.outcomes) >= LLM_BREAKER_FAILURE_RATIO
+        ):
+            self.opened_at = time.monotonic()
+            self.opened_count += 1
+            self.outcomes.clear()
+            self._set_state(OPEN)
+
+    def stats(self) -> dict:
+        state = self.current_state()
+        return {
+            "state": state,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": self.outcomes.count(False),
+            "times_opened": self.opened_count,
+            "rejected": self.rejected,
+            "retry_in": round(max(0.0, self.opened_at + LLM_BREAKER_RESET_TIMEOUT - time.monotonic()), 1) if state == OPEN else 0.0
+        }
+
+
+def _abandon(task: asyncio.Task, discard):
+    """Cancel a losing attempt and clean up its result if it won anyway"""
+    def cleanup(task):
+        if task.cancelled():
+            return
+        if task.exception() is None and discard is not None:
+            asyncio.ensure_future(discard(task.result()))
+    task.cancel()
+    task.add_done_callback(cleanup)
+
+
+class ResilientCaller:
+    """Retrying, hedging wrapper for one model and call mode"""
+
+    def __init__(self, breaker: CircuitBreaker, model: str, mode: str):
+        self.breaker = breaker
+        self.model = model
+        self.mode = mode
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+        self.exhausted = 0
+        self._p95 = None
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there are too few samples"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._p95 is None:
+            ordered = sorted(self.latencies)
+            self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+        return max(LLM_HEDGE_MIN_DELAY, self._p95)
+
+    def _record_latency(self, seconds: float):
+        self.latencies.append(seconds)
+        # Recompute the percentile lazily every few samples
+        if len(self.latencies) % 10 == 0:
+            self._p95 = None
+
+    async def call(self, attempt, timeout: float, hedge: bool = False, discard=None, retries: int = None,
+                   hedge_slot=None):
+        """
+        Run `attempt(timeout)` with retries, breaker checks and optional hedging
+
+        `discard(result)` is awaited for the result of a hedge that lost the
+        race, e.g. to close an open stream. `hedge_slot()` is awaited before
+        a hedge is sent and returns a callable that frees the slot, or None
+        to skip the hedge. The whole call, backoff included, is cut off at
+        LLM_DEADLINE. Raises CircuitOpenError, UpstreamUnavailable, or the
+        attempt's own non-retryable error.
+        """
+        self.calls += 1
+        try:
+            return await asyncio.wait_for(
+                self._call(attempt, timeout, hedge, discard, retries, hedge_slot), LLM_DEADLINE)
+        except asyncio.TimeoutError:
+            # Retryable timeouts become UpstreamUnavailable inside, so this is the deadline
+            self.exhausted += 1
+            raise UpstreamUnavailable(f"{self.model} {self.mode} call exceeded {LLM_DEADLINE}s")
+
+    async def _call(self, attempt, timeout: float, hedge: bool, discard, retries, hedge_slot):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_DEADLINE
+        retries = LLM_MAX_RETRIES if retries is None else retries
+        last_error = None
+
+        for attempt_number in range(retries + 1):
+            if not self.breaker.acquire():
+                raise CircuitOpenError(f"Circuit breaker for {self.model} is {self.breaker.state}")
+            attempt_timeout = min(timeout, deadline - loop.time())
+            started = loop.time()
+            try:
+                if hedge and LLM_HEDGE:
+                    result = await self._hedged(attempt, attempt_timeout, discard, hedge_slot)
+                else:
+                    result = await attempt(attempt_timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as exc:
+                if not is_retryable(exc):
+                    self.breaker.release()
+                    raise
+                self.breaker.failure()
+                last_error = exc
+                delay = backoff_delay(attempt_number, exc)
+                if attempt_number == retries or loop.time() + delay >= deadline:
+                    break
+                logger.info("Retrying %s %s call in %.2fs after %s", self.model, self.mode, delay, type(exc).__name__)
+                self.retries += 1
+                llm_retries.inc(self.model, self.mode)
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.success()
+            self._record_latency(loop.time() - started)
+            return result
+
+        self.exhausted += 1
+        raise UpstreamUnavailable(f"{self.model} {self.mode} call failed: {last_error}") from last_error
+
+    async def _hedged(self, attempt, timeout: float, discard, hedge_slot=None):
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(attempt(timeout))
+        if delay is None or delay >= timeout or self.hedges >= LLM_HEDGE_BUDGET * self.calls:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            release = await hedge_slot() if hedge_slot is not None and not done else None
+        except asyncio.CancelledError:
+            _abandon(primary, discard)
+            raise
+        if done:
+            return primary.result()
+        if hedge_slot is not None and release is None:
+            # Every upstream slot is taken; a hedge would only add load
+            self.hedges_skipped += 1
+            return await primary
+
+        self.hedges += 1
+        llm_hedges.inc(self.model, self.mode)
+        secondary = asyncio.ensure_future(attempt(timeout - delay))
+        if release is not None:
+            secondary.add_done_callback(lambda task: release())
+        pending = {primary, secondary}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.hedges_won += 1
+                        # A simultaneous second success is discarded like a loser
+                        for other in done - {task}:
+                            _abandon(other, discard)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                _abandon(task, discard)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_after_s": self.hedge_delay()
+        }
+
+
+class Resilience:
+    """Breakers and callers by model, plus degraded-answer counters"""
+
+    def __init__(self):
+        self.breakers = {}
+        self.callers = {}
+        self.fallbacks = {"cache": 0, "rules": 0, "unavailable": 0}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(model)
+        return self.breakers[model]
+
+    def caller(self, model: str, mode: str) -> ResilientCaller:
+        key = (model, mode)
+        if key not in self.callers:
+            self.callers[key] = ResilientCaller(self.breaker(model), model, mode)
+        return self.callers[key]
+
+    def record_fallback(self, source: str):
+        self.fallbacks[source] += 1
+        llm_fallbacks.inc(source)
+
+    def stats(self) -> dict:
+        return {
+            "models": {
+                model: {
+                    "breaker": breaker.stats(),
+                    "modes": {mode: caller.stats() for (caller_model, mode), caller in self.callers.items()
+                              if caller_model == model}
+                }
+                for model, breaker in self.breakers.items()
+            },
+            "fallbacks": dict(self.fallbacks)
+        }
+
+
+resilience = Resilience()
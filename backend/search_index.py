@@ -0,0 +1,290 @@
+"""
+In-memory full-text search over lessons, flashcards and practice questions
+
+The inverted index is built once from backend/content at startup. Queries
+are matched on folded Devanagari terms, term prefixes, vowel-insensitive
+phonetic keys (which also cover Latin transliteration such as "sangya")
+and single-edit typos, then ranked with BM25 over weighted fields.
+"""
+import re
+import json
+import math
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from devanagari import tokenize, phonetic_key, is_latin
+from ttl_cache import TTLCache
+
+CONTENT_DIR = Path(__file__).parent / 'content'
+
+_RAW_WORD_RE = re.compile(r'[\w\u0900-\u097f]+')
+
+# Field weights for BM25F-style term frequencies
+FIELD_WEIGHTS = {"title": 3.0, "keywords": 2.0, "body": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multipliers for the ways a query token can match an indexed term
+EXACT_WEIGHT = 1.0
+TRANSLITERATION_WEIGHT = 0.9
+PREFIX_WEIGHT = 0.8
+PHONETIC_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up early once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _deletes(term: str) -> set:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def load_documents(content_dir: Path = CONTENT_DIR) -> list:
+    """Flatten the content files into searchable documents"""
+    documents = []
+
+    lessons = json.loads((content_dir / 'lessons.json').read_text(encoding='utf-8'))
+    for lesson in lessons:
+        documents.append({
+            "type": "lesson",
+            "id": f"lesson-{lesson['id']}",
+            "title": lesson["title"],
+            "icon": lesson.get("icon"),
+            "difficulty": lesson.get("difficulty"),
+            "link": f"/lesson/{lesson['id']}",
+            "keywords": lesson.get("keywords", []),
+            "body": lesson.get("content", [])
+        })
+
+    flashcards = json.loads((content_dir / 'flashcards.json').read_text(encoding='utf-8'))
+    for category_index, category in enumerate(flashcards):
+        for card_index, card in enumerate(category["cards"]):
+            documents.append({
+                "type": "flashcard",
+                "id": f"flashcard-{category_index + 1}-{card_index + 1}",
+                "title": card["front"],
+                "icon": card.get("icon") or category.get("icon"),
+                "difficulty": None,
+                "link": "/flashcards",
+                "keywords": [category["category"]],
+                "body": [line for line in card["back"].split("\n") if line.strip()]
+            })
+
+    practice_sets = json.loads((content_dir / 'practice_sets.json').read_text(encoding='utf-8'))
+    seen_questions = set()
+    for practice_set in practice_sets:
+        for question_index, question in enumerate(practice_set["questions"]):
+            # The mixed set reuses questions from the topic sets
+            if question["question"] in seen_questions:
+                continue
+            seen_questions.add(question["question"])
+            documents.append({
+                "type": "question",
+                "id": f"question-{practice_set['id']}-{question_index + 1}",
+                "title": question["question"],
+                "icon": practice_set.get("icon"),
+                "difficulty": practice_set.get("difficulty"),
+                "link": f"/practice/{practice_set['id']}",
+                "keywords": [practice_set["title"]],
+                "body": [question["explanation"]]
+            })
+
+    return documents
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking and fuzzy term expansion"""
+
+    def __init__(self, documents: list):
+        self.documents = documents
+        self.postings = defaultdict(dict)     # term -> {doc index: weighted tf}
+        self.doc_lengths = []
+        self.phonetic_terms = defaultdict(set)  # phonetic key -> terms
+        self.delete_terms = defaultdict(set)    # single-deletion variant -> terms
+        self._results_cache = TTLCache(maxsize=2000, ttl=600)
+
+        for index, doc in enumerate(documents):
+            frequencies = defaultdict(float)
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                values = doc[field] if isinstance(doc[field], list) else [doc[field]]
+                for value in values:
+                    for token in tokenize(value):
+                        frequencies[token] += weight
+                        length += weight
+            for term, frequency in frequencies.items():
+                self.postings[term][index] = frequency
+            self.doc_lengths.append(length)
+
+        for term in self.postings:
+            key = phonetic_key(term)
+            if key:
+                self.phonetic_terms[key].add(term)
+            if len(term) >= 4:
+                for variant in _deletes(term):
+                    self.delete_terms[variant].add(term)
+
+        self.vocabulary = sorted(self.postings)
+        self.phonetic_keys = sorted(self.phonetic_terms)
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    @classmethod
+    def from_content(cls, content_dir: Path = CONTENT_DIR):
+        return cls(load_documents(content_dir))
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings[term])
+        n = len(self.documents)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _prefixed(self, sorted_terms: list, prefix: str, limit: int = 50) -> list:
+        start = bisect_left(sorted_terms, prefix)
+        matches = []
+        for term in sorted_terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def expand(self, token: str, is_last: bool) -> dict:
+        """Map a query token to indexed terms with match weights"""
+        expansions = {}
+
+        def add(term, weight):
+            if weight > expansions.get(term, 0):
+                expansions[term] = weight
+
+        if token in self.postings:
+            add(token, EXACT_WEIGHT)
+
+        # Typeahead: the token being typed may be an unfinished word
+        if is_last and len(token) >= 2:
+            for term in self._prefixed(self.vocabulary, token):
+                add(term, PREFIX_WEIGHT)
+
+        key = phonetic_key(token)
+        if key:
+            weight = TRANSLITERATION_WEIGHT if is_latin(token) else PHONETIC_WEIGHT
+            exact_phonetic = self.phonetic_terms.get(key, ())
+            for term in exact_phonetic:
+                # Skeletons collide easily in Devanagari; stay close to the spelling
+                if is_latin(token) or _edit_distance(token, term, 2) <= 2:
+                    add(term, weight)
+            if is_last and is_latin(token) and len(key) >= 2:
+                # Unfinished transliteration; demoted further when the key already matched
+                prefix_weight = weight * (PREFIX_WEIGHT if not exact_phonetic else FUZZY_WEIGHT)
+                for prefix_key in self._prefixed(self.phonetic_keys, key):
+                    for term in self.phonetic_terms[prefix_key]:
+                        add(term, prefix_weight)
+
+        # Typo tolerance only when nothing better matched
+        if not expansions and len(token) >= 4:
+            limit = 2 if len(token) >= 8 else 1
+            candidates = set(self.delete_terms.get(token, ()))
+            for variant in _deletes(token):
+                candidates.update(self.delete_terms.get(variant, ()))
+                if variant in self.postings:
+                    candidates.add(variant)
+            for term in candidates:
+                if _edit_distance(token, term, limit) <= limit:
+                    add(term, FUZZY_WEIGHT)
+
+        return expansions
+
+    def _bm25(self, term: str, doc_index: int) -> float:
+        frequency = self.postings[term][doc_index]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_index] / self.avg_length)
+        return self._idf(term) * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    def _snippets(self, doc: dict, matched_terms: set, limit: int = 3) -> list:
+        lines = [line for line in doc["body"] if matched_terms.intersection(tokenize(line))]
+        return (lines or doc["body"][:2])[:limit]
+
+    def _highlights(self, texts: list, matched_terms: set) -> list:
+        """Words as written in the content whose folded form matched the query"""
+        words = []
+        for text in texts:
+            for word in _RAW_WORD_RE.findall(text):
+                if word not in words and matched_terms.intersection(tokenize(word)):
+                    words.append(word)
+        return words
+
+    def search(self, query: str, doc_type: str = None, page: int = 1, page_size: int = 10) -> dict:
+        """Ranked, paginated search results"""
+        started = time.perf_counter()
+        tokens = tokenize(query)
+        cache_key = (" ".join(tokens), query.endswith(" "), doc_type, page, page_size)
+        # Shared by every spelling that folds to the same tokens, so it holds no query
+        cached = self._results_cache.get(cache_key)
+        if cached is not None:
+            return {"query": query, **cached, "took_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+        scores = defaultdict(float)
+        matched = defaultdict(set)
+        for position, token in enumerate(tokens):
+            is_last = position == len(tokens) - 1 and not query.endswith(" ")
+            best = {}
+            for term, weight in self.expand(token, is_last).items():
+                for doc_index in self.postings[term]:
+                    best[doc_index] = max(best.get(doc_index, 0.0), weight * self._bm25(term, doc_index))
+                    matched[doc_index].add(term)
+            # Each query token contributes its best-matching term per document
+            for doc_index, score in best.items():
+                scores[doc_index] += score
+
+        ranked = sorted(
+            (i for i in scores if doc_type is None or self.documents[i]["type"] == doc_type),
+            key=lambda i: (-scores[i], i)
+        )
+        offset = (page - 1) * page_size
+        results = []
+        for doc_index in ranked[offset:offset + page_size]:
+            doc = self.documents[doc_index]
+            snippets = self._snippets(doc, matched[doc_index])
+            results.append({
+                "type": doc["type"],
+                "id": doc["id"],
+                "title": doc["title"],
+                "icon": doc["icon"],
+                "difficulty": doc["difficulty"],
+                "link": doc["link"],
+                "snippets": snippets,
+                "highlights": self._highlights([doc["title"]] + snippets, matched[doc_index]),
+                "score": round(scores[doc_index], 4)
+            })
+
+        response = {
+            "total": len(ranked),
+            "page": page,
+            "page_size": page_size,
+            "results": results
+        }
+        self._results_cache.set(cache_key, response)
+        return {"query": query, **response, "took_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+_index = None
+
+
+def load_search_index() -> SearchIndex:
+    """Build the index from the bundled content files"""
+    global _index
+    _index = SearchIndex.from_content()
+    return _index
+
+
+def get_search_index() -> SearchIndex:
+    return _index if _index is not None else load_search_index()
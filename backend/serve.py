@@ -0,0 +1,226 @@
+"""
+Production launcher: preforked uvicorn workers sharing one listening socket
+
+    python serve.py                              # one worker per core on 0.0.0.0:8001
+    python serve.py --workers-per-core 2 --port 8001
+    WEB_CONCURRENCY=4 python serve.py --graceful-timeout 20
+
+The parent imports the app and builds the in-memory indexes (search,
+content snapshot, quiz pools, grammar chapters, tokenizer) once, then forks
+the workers so they share those pages copy-on-write and their warm-up
+finishes almost at once. Clients that own sockets or threads - MongoDB,
+OpenAI, the bcrypt pool - are created by each worker after the fork. uvloop and httptools are used when installed.
+
+SIGTERM or SIGINT drains: each worker stops accepting connections, finishes
+in-flight requests for up to --graceful-timeout seconds, runs the lifespan
+shutdown (flushing buffered progress) and exits. Workers
+that die unexpectedly are replaced.
+"""
+import gc
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+# Launcher configuration
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '8001'))
+WEB_CONCURRENCY = os.environ.get('WEB_CONCURRENCY')
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+
+# A worker dying this soon after its start counts as a crash loop
+MIN_WORKER_LIFETIME = 5.0
+RESPAWN_BACKOFF_MAX = 30.0
+SUPERVISOR_POLL_INTERVAL = 0.2
+
+
+def event_loop_implementation() -> str:
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def http_implementation() -> str:
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
+def preload():
+    """Import the app and build its read-only in-memory state before forking"""
+    import server
+    import database
+    from search_index import get_search_index
+    from content_store import get_content_store
+    from quiz_service import get_quiz_bank
+    from chat_service import get_grammar_retriever
+    from chat_context import count_tokens
+
+    get_search_index()
+    get_content_store()
+    get_quiz_bank()
+    get_grammar_retriever()
+    count_tokens("नमस्ते")
+    # Only the modules; each worker creates its own client and connection pool
+    import openai  # noqa: F401
+    import motor.motor_asyncio  # noqa: F401
+    # Sockets must not be shared across the fork; each worker connects itself
+    database.close()
+    # Move the preloaded objects out of the collector's reach so collections
+    # in the workers do not write to, and so copy, the shared pages
+    gc.freeze()
+    return server.app
+
+
+class Supervisor:
+    """Forks the workers, replaces ones that die, and drains them on shutdown"""
+
+    def __init__(self, config: uvicorn.Config, workers: int, graceful_timeout: float):
+        self.config = config
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.sockets = []
+        self.workers = {}  # pid -> start time
+        self.stopping = False
+        self.respawn_delay = 0.0
+
+    def _run_worker(self):
+        # uvicorn installs its own SIGTERM/SIGINT handlers for a graceful exit
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        status = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=self.sockets)
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            logging.shutdown()
+            os._exit(status)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self):
+        """Collect exited workers, returning how many died on their own"""
+        died = 0
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                break
+            if pid == 0:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            if not self.stopping:
+                died += 1
+                lifetime = time.monotonic() - started
+                logger.warning("Worker %d exited with status %d after %.1fs", pid, os.waitstatus_to_exitcode(status), lifetime)
+                # Back off while workers crash on startup, e.g. a bad config
+                self.respawn_delay = min(RESPAWN_BACKOFF_MAX, max(0.5, self.respawn_delay * 2)) if lifetime < MIN_WORKER_LIFETIME else 0.0
+        return died
+
+    def _drain(self):
+        logger.info("Draining %d workers (up to %.0fs)", len(self.workers), self.graceful_timeout)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Workers get the graceful timeout plus time for the lifespan shutdown
+        deadline = time.monotonic() + self.graceful_timeout + 10
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(SUPERVISOR_POLL_INTERVAL)
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d after the drain timeout", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            self._reap()
+            time.sleep(SUPERVISOR_POLL_INTERVAL)
+
+    def run(self):
+        self.sockets = [self.config.bind_socket()]
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(
+            "Serving on %s:%d with %d workers (%s, %s)",
+            self.config.host, self.config.port, self.worker_count, self.config.loop, self.config.http
+        )
+        for _ in range(self.worker_count):
+            self.spawn()
+
+        while not self.stopping:
+            if self._reap() and self.respawn_delay:
+                time.sleep(self.respawn_delay)
+            while len(self.workers) < self.worker_count and not self.stopping:
+                self.spawn()
+            time.sleep(SUPERVISOR_POLL_INTERVAL)
+
+        # Workers close their copies as they start draining; once the last
+        # one is closed new connections are refused instead of queued
+        for sock in self.sockets:
+            sock.close()
+        self._drain()
+        logger.info("All workers stopped")
+
+
+def parse_args(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, help="worker processes (default: WEB_CONCURRENCY or cores x --workers-per-core)")
+    parser.add_argument("--workers-per-core", type=float, default=1.0)
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT,
+                        help="seconds workers may spend finishing requests on shutdown")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workers = args.workers or (int(WEB_CONCURRENCY) if WEB_CONCURRENCY else
+                               max(1, round((os.cpu_count() or 1) * args.workers_per_core)))
+
+    # Read at import by modules whose defaults depend on the worker count
+    os.environ['WEB_CONCURRENCY'] = str(workers)
+    app = preload()
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop=event_loop_implementation(),
+        http=http_implementation(),
+        backlog=args.backlog,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    Supervisor(config, workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
+from contextlib import asynccontextmanager, aclosing
 import uuid
+import json
+import base64
+import asyncio
 from datetime import datetime, timezone
-from chat_service import get_chat_response
+from chat_service import (
+    get_chat_response, stream_chat_response, get_client as get_chat_client, close_client as close_chat_client,
+    get_grammar_retriever, coalesce_key, PROMPT_VERSION, UNAVAILABLE_MESSAGE
+)
+from answer_cache import AnswerCache
+from singleflight import SingleFlight
+from grammar_retriever import retrieval_stats
+from rate_limit import chat_limiter, Caller, client_ip
+from chat_batch import run_batch, batch_stats, CHAT_BATCH_MAX_QUESTIONS
+from resilience import resilience
+from chat_context import check_request_size, context_stats, count_tokens
+from search_index import get_search_index
+from content_store import get_content_store, negotiate
+from quiz_service import get_quiz_bank, new_seed, without_answers, QuizGradeRequest, QUIZ_DEFAULT_QUESTIONS
+from progress_service import progress_store, sync_progress, get_progress, ProgressSync
+from leaderboard import leaderboards
+from migrations import ensure_indexes
+from warmup import readiness
+import database
+import metrics
+from database import get_db
 from auth_service import (
-    register_user, login_user, get_current_user,
+    register_user, login_user, get_current_user, password_pool, profile_stats, set_mobile_index_ready, secret_key,
     UserRegister, UserLogin, TokenResponse, User
 )
 
@@ -19,13 +43,36 @@ from auth_service import (
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Cache of first-turn chat answers (persistent tier attached on startup)
+answer_cache = AnswerCache()
+# Identical chat requests in flight at the same time share one upstream call
+chat_flight = SingleFlight()
+# Warm-up steps a chat request needs; earlier requests wait for them
+CHAT_WARMUP_STEPS = ("chat_client", "tokenizer", "grammar_retriever")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One shared MongoDB client per worker, opened after any fork; the OpenAI
+    # client and in-memory indexes are created by the background warm-up.
+    # A worker without a JWT secret must not start serving.
+    secret_key()
+    db = database.connect()
+    answer_cache.attach(db.answer_cache)
+    chat_limiter.attach(db)
+    metrics.start_loop_monitor()
+    readiness.start(warmup_steps())
+    # Periodic write-behind flush of buffered progress
+    progress_store.start()
+    yield
+    await readiness.stop()
+    await progress_store.stop()
+    await metrics.stop_loop_monitor()
+    database.close()
+    await close_chat_client()
+    password_pool.shutdown()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -50,10 +97,15 @@ class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[ChatMessage]] = []
 
+class ChatBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
 class ChatResponse(BaseModel):
     success: bool
     response: str
     error: Optional[str] = None
+    cached: bool = False
+    degraded: bool = False
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
@@ -65,35 +117,170 @@ async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
     
-    # Convert to dict and serialize datetime to ISO string for MongoDB
+    # Timestamps are stored as native BSON dates
     doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
     
-    _ = await db.status_checks.insert_one(doc)
+    _ = await get_db().status_checks.insert_one(doc)
     return status_obj
 
+# Older documents stored timestamps as ISO strings. Until the backfill in
+# migrations.py has run everywhere, queries also match the string form.
+LEGACY_STRING_TIMESTAMPS = os.environ.get('LEGACY_STRING_TIMESTAMPS', 'true').lower() == 'true'
+
+def _encode_cursor(timestamp, check_id: str) -> str:
+    """Opaque keyset cursor for the (timestamp, id) sort order"""
+    if isinstance(timestamp, datetime):
+        raw = json.dumps(["d", timestamp.isoformat(), check_id])
+    else:
+        raw = json.dumps(["s", timestamp, check_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str):
+    try:
+        kind, timestamp, check_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if kind == "d":
+            timestamp = datetime.fromisoformat(timestamp)
+        return timestamp, check_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _timestamp_range(operator: str, value: datetime) -> dict:
+    """Range condition on timestamp matching both storage formats"""
+    value = _as_utc(value)
+    condition = {"timestamp": {operator: value}}
+    if not LEGACY_STRING_TIMESTAMPS:
+        return condition
+    # Range operators only compare values of the same BSON type
+    return {"$or": [condition, {"timestamp": {operator: value.isoformat()}}]}
+
+def _status_query(after: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> dict:
+    """Build the filter for one page of status checks, newest first"""
+    conditions = []
+    if since is not None:
+        conditions.append(_timestamp_range("$gte", since))
+    if until is not None:
+        conditions.append(_timestamp_range("$lt", until))
+    if after:
+        timestamp, check_id = _decode_cursor(after)
+        page = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": check_id}}
+        ]
+        # Descending sort puts dates before strings, so every legacy string
+        # document still lies ahead of a date cursor
+        if isinstance(timestamp, datetime) and LEGACY_STRING_TIMESTAMPS:
+            page.append({"timestamp": {"$type": "string"}})
+        conditions.append({"$or": page})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _status_from_doc(doc: dict) -> StatusCheck:
+    # Legacy documents carry ISO string timestamps; Pydantic parses both forms
+    return StatusCheck(**doc)
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    List status checks, newest first, using keyset pagination
+
+    Pass the `X-Next-Cursor` response header back as `after` to get the next
+    page. `format=ndjson` streams every matching document (ignoring `limit`)
+    as the cursor yields it, so memory stays flat for any collection size.
+    """
+    query = _status_query(after, since, until)
+    sort = [("timestamp", -1), ("id", -1)]
+    
+    if format == "ndjson":
+        cursor = get_db().status_checks.find(query, {"_id": 0}, sort=sort, batch_size=500)
+        
+        async def stream_checks():
+            async for doc in cursor:
+                yield _status_from_doc(doc).model_dump_json() + "\n"
+        
+        return StreamingResponse(stream_checks(), media_type="application/x-ndjson")
+    
     # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+    docs = await get_db().status_checks.find(query, {"_id": 0}, sort=sort, limit=limit).to_list(limit)
     
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
+    if len(docs) == limit:
+        last = docs[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last["timestamp"], last["id"])
     
-    return status_checks
+    return [_status_from_doc(doc) for doc in docs]
+
+async def _chat_caller(http_request: Request, authorization: Optional[str]) -> Caller:
+    """Rate-limit identity: the signed-in student, else the client IP"""
+    if authorization:
+        return Caller(user=await get_current_user(_bearer_token(authorization)))
+    return Caller(ip=client_ip(http_request))
+
+async def _degraded_answer(message: str, history: list, fallback: str):
+    """
+    Best answer available while the model is unreachable
+
+    Prefers a cached answer to the same question - first-turn questions
+    were already looked up - over the rule-based fallback.
+    """
+    if history:
+        cached = await answer_cache.get(message, PROMPT_VERSION)
+        if cached:
+            resilience.record_fallback("cache")
+            return cached["response"], True
+    resilience.record_fallback("unavailable" if fallback == UNAVAILABLE_MESSAGE else "rules")
+    return fallback, False
+
+async def _chat_answer(message: str, history: list, caller: Caller) -> dict:
+    """Model answer shared by identical requests in flight, charged and cached once"""
+    async def answer():
+        result = await get_chat_response(message, history)
+        if result["success"] and not result.get("degraded"):
+            await chat_limiter.charge(caller, result["usage"])
+            if not history:
+                await answer_cache.set(message, PROMPT_VERSION, result["response"], result.get("usage"))
+        return result
+
+    return await chat_flight.do(coalesce_key(message, history), answer)
 
 @api_router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, authorization: Optional[str] = Header(None)):
     """
     Chat endpoint for Hindi grammar questions
+
+    The `Authorization` header is optional; signed-in students get their own
+    rate limit and token quota instead of sharing their IP's.
     """
     # Convert conversation history to the format expected by chat service
     history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
+    await readiness.wait(*CHAT_WARMUP_STEPS)
+    check_request_size(request.message, history)
+    caller = await _chat_caller(http_request, authorization)
+    await chat_limiter.check(caller)
+    
+    # First-turn questions can be answered from the cache without an upstream call
+    if not history:
+        cached = await answer_cache.get(request.message, PROMPT_VERSION)
+        if cached:
+            return ChatResponse(success=True, response=cached["response"], cached=True)
     
     # Get response from chat service
-    result = get_chat_response(request.message, history)
+    result = await _chat_answer(request.message, history, caller)
+    
+    if result.get("degraded"):
+        response, cached = await _degraded_answer(request.message, history, result["response"])
+        return ChatResponse(success=True, response=response, error=result["error"], cached=cached, degraded=True)
     
     return ChatResponse(
         success=result["success"],
@@ -101,7 +288,350 @@ async def chat(request: ChatRequest):
         error=result.get("error")
     )
 
+@api_router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, authorization: Optional[str] = Header(None)):
+    """
+    Streaming chat endpoint - forwards model tokens as Server-Sent Events
+
+    Emits `delta` events with text fragments, then a final `done` event with
+    token usage (or an `error` event carrying the fallback response). While
+    the model is unreachable a degraded answer is sent as one `delta` and a
+    `done` event with `degraded` set. Rate limits are checked before the
+    stream starts, so they surface as 429.
+    """
+    history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
+    await readiness.wait(*CHAT_WARMUP_STEPS)
+    check_request_size(request.message, history)
+    caller = await _chat_caller(http_request, authorization)
+    await chat_limiter.check(caller)
+    
+    def format_event(event: dict) -> str:
+        data = json.dumps(event, ensure_ascii=False)
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    
+    async def event_source():
+        if not history:
+            cached = await answer_cache.get(request.message, PROMPT_VERSION)
+            if cached:
+                yield format_event({"type": "delta", "content": cached["response"]})
+                yield format_event({"type": "done", "usage": None, "cached": True})
+                return
+        
+        # Closed with the response, so a disconnect unsubscribes straight away
+        async with aclosing(chat_flight.stream(coalesce_key(request.message, history), answer_stream)) as events:
+            async for event in events:
+                if event["type"] == "degraded":
+                    response, cached = await _degraded_answer(request.message, history, event["response"])
+                    yield format_event({"type": "delta", "content": response})
+                    yield format_event({"type": "done", "usage": None, "cached": cached, "degraded": True})
+                    continue
+                yield format_event(event)
+    
+    async def answer_stream():
+        chunks = []
+        async with aclosing(stream_chat_response(request.message, history)) as events:
+            async for event in events:
+                if event["type"] == "delta":
+                    chunks.append(event["content"])
+                elif event["type"] == "done":
+                    await chat_limiter.charge(caller, event.get("usage"))
+                    if not history:
+                        await answer_cache.set(request.message, PROMPT_VERSION, "".join(chunks), event.get("usage"))
+                yield event
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens flush immediately
+        }
+    )
+
+@api_router.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest, http_request: Request, authorization: Optional[str] = Header(None)):
+    """
+    Answer a worksheet of questions, streaming one NDJSON line per question
+
+    Result lines carry the question's `index` in the request plus the
+    ChatResponse fields, in the order questions finish - cached answers
+    first. A question that fails gets `success: false` with its own error
+    and `status`, and the rest of the batch carries on; a final `done` line
+    summarizes the batch. The request takes one token from the caller's
+    rate limit like any chat request, and that token covers the first
+    question sent to the model; every further unique, uncached question
+    takes another one and the daily token quotas are checked again, so a
+    question over the limit gets a 429 result.
+    """
+    if len(request.questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch can hold at most {CHAT_BATCH_MAX_QUESTIONS} questions"
+        )
+    await readiness.wait(*CHAT_WARMUP_STEPS)
+    caller = await _chat_caller(http_request, authorization)
+    await chat_limiter.check(caller)
+    prepaid = True
+
+    async def lookup(question: str):
+        if not question.strip():
+            raise HTTPException(status_code=400, detail="Empty question")
+        check_request_size(question, [])
+        cached = await answer_cache.get(question, PROMPT_VERSION)
+        if cached:
+            return {"success": True, "response": cached["response"], "cached": True}
+        return None
+
+    async def answer(question: str):
+        nonlocal prepaid
+        if prepaid:
+            prepaid = False
+            await chat_limiter.check_quota(caller)
+        else:
+            await chat_limiter.check(caller)
+        result = await _chat_answer(question, [], caller)
+        if result.get("degraded"):
+            response, cached = await _degraded_answer(question, [], result["response"])
+            return {"success": True, "response": response, "error": result["error"], "cached": cached, "degraded": True}
+        return {"success": result["success"], "response": result["response"], "error": result.get("error")}
+
+    async def lines():
+        async for event in run_batch(request.questions, lookup, answer):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/chat/batch/stats")
+async def chat_batch_stats():
+    """
+    Worksheet batch counters by outcome
+    """
+    return batch_stats.stats()
+
+@api_router.get("/chat/cache/stats")
+async def chat_cache_stats():
+    """
+    Answer cache hit/miss counters
+    """
+    return answer_cache.stats()
+
+@api_router.get("/chat/limits/stats")
+async def chat_limits_stats():
+    """
+    Requests allowed and rejected by the chat rate limiter and token quotas
+    """
+    return chat_limiter.stats()
+
+@api_router.get("/chat/resilience/stats")
+async def chat_resilience_stats():
+    """
+    Circuit breaker state, retries, hedges and degraded answers per model
+    """
+    return resilience.stats()
+
+@api_router.get("/chat/coalescing/stats")
+async def chat_coalescing_stats():
+    """
+    Upstream calls saved by sharing identical in-flight requests
+    """
+    return chat_flight.stats()
+
+@api_router.get("/chat/context/stats")
+async def chat_context_stats():
+    """
+    Conversation history trimming and prompt-token savings
+    """
+    return context_stats.stats()
+
+@api_router.get("/chat/retrieval/stats")
+async def chat_retrieval_stats():
+    """
+    Grammar chapters routed to the model and system-prompt tokens saved
+    """
+    return retrieval_stats.stats()
+
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    doc_type: Optional[str] = Query(None, alias="type", pattern="^(lesson|flashcard|question)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50)
+):
+    """
+    Search lessons, flashcards and practice questions
+
+    Accepts Devanagari or Latin transliteration, tolerates matra variants,
+    unfinished words and single-letter typos. Results are BM25-ranked.
+    """
+    await readiness.wait("search_index")
+    return get_search_index().search(q, doc_type=doc_type, page=page, page_size=page_size)
+
+def _content_response(etag: str, variants: dict, if_none_match: Optional[str],
+                      accept_encoding: Optional[str], cache_control: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    encoding, body = negotiate(variants, accept_encoding)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/content/manifest")
+async def content_manifest():
+    """
+    Current content version with per-item hashes
+    """
+    await readiness.wait("content_store")
+    return get_content_store().manifest()
+
+@api_router.get("/content/delta")
+async def content_delta(
+    since: str = Query(..., min_length=1, max_length=64),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Items changed since a previously synced content version
+
+    Unknown versions receive the full snapshot with `full: true`.
+    """
+    await readiness.wait("content_store")
+    etag, variants = get_content_store().delta(since)
+    return _content_response(etag, variants, if_none_match, accept_encoding, "no-cache")
+
+@api_router.get("/content")
+async def content_snapshot(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Full content snapshot at the current version
+
+    Revalidate with If-None-Match; the ETag is the content version.
+    """
+    await readiness.wait("content_store")
+    store = get_content_store()
+    return _content_response(store.etag, store.variants, if_none_match, accept_encoding, "no-cache")
+
+@api_router.get("/content/{version}")
+async def content_snapshot_version(
+    version: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Immutable snapshot for a specific content version
+    """
+    await readiness.wait("content_store")
+    store = get_content_store()
+    if version != store.version:
+        raise HTTPException(status_code=404, detail="Content version not available")
+    return _content_response(store.etag, store.variants, if_none_match, accept_encoding,
+                             "public, max-age=31536000, immutable")
+
+# Quiz Endpoints
+@api_router.get("/quiz/sets")
+async def quiz_sets():
+    """
+    Practice sets with their question pool sizes
+    """
+    await readiness.wait("quiz_bank")
+    return get_quiz_bank().sets()
+
+@api_router.get("/quiz/stats")
+async def quiz_stats():
+    """
+    Rendered quiz cache metrics
+    """
+    await readiness.wait("quiz_bank")
+    return get_quiz_bank().stats()
+
+@api_router.get("/quiz/{set_id}")
+async def get_quiz(
+    set_id: int,
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    count: int = Query(QUIZ_DEFAULT_QUESTIONS, ge=1, le=100),
+    include_answers: bool = True
+):
+    """
+    Reproducible quiz for a practice set
+
+    The same seed always returns the same questions and option order. A
+    random seed is chosen when none is given and returned with the quiz.
+    Pass include_answers=false for graded tests.
+    """
+    await readiness.wait("quiz_bank")
+    quiz = get_quiz_bank().render(set_id, seed or new_seed(), count)
+    return quiz if include_answers else without_answers(quiz)
+
+@api_router.post("/quiz/{set_id}/grade")
+async def grade_quiz(set_id: int, request: QuizGradeRequest):
+    """
+    Grade answers to a seeded quiz
+    """
+    await readiness.wait("quiz_bank")
+    return get_quiz_bank().grade(set_id, request)
+
+def _bearer_token(authorization: Optional[str]) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
+    return authorization.split(" ")[1]
+
+# Progress Endpoints
+@api_router.post("/progress")
+async def post_progress(sync: ProgressSync, authorization: Optional[str] = Header(None)):
+    """
+    Record quiz and flashcard progress events
+
+    Events are buffered and written in batches. Resending an event with the
+    same idempotency_key is acknowledged as a duplicate and not applied again.
+    """
+    user = await get_current_user(_bearer_token(authorization))
+    return await sync_progress(user, sync)
+
+@api_router.get("/progress")
+async def read_progress(authorization: Optional[str] = Header(None)):
+    """
+    Current user's progress, including writes not yet flushed
+    """
+    user = await get_current_user(_bearer_token(authorization))
+    return await get_progress(user.id)
+
+@api_router.get("/progress/stats")
+async def progress_stats():
+    """
+    Write-behind buffer and progress cache metrics
+    """
+    return progress_store.stats()
+
+# Leaderboard Endpoints
+@api_router.get("/leaderboard/stats")
+async def leaderboard_stats():
+    """
+    Leaderboard updates and board cache metrics
+    """
+    return leaderboards.stats()
+
+@api_router.get("/leaderboard/{kind}")
+async def get_leaderboard(
+    kind: str,
+    limit: int = Query(10, ge=1, le=100),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Top students and the current user's rank in their school or class
+    """
+    if kind not in ("school", "class"):
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
+    user = await get_current_user(_bearer_token(authorization))
+    return await leaderboards.standings(user, kind, limit)
+
 # Authentication Endpoints
+
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
     """
@@ -121,21 +651,51 @@ async def get_me(authorization: Optional[str] = Header(None)):
     """
     Get current user profile
     """
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
-    
-    token = authorization.split(" ")[1]
-    return await get_current_user(token)
+    return await get_current_user(_bearer_token(authorization))
+
+@api_router.get("/ready")
+async def ready(response: Response):
+    """
+    Readiness probe: 503 until the background warm-up has finished
+    """
+    report = readiness.status()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
+
+@api_router.get("/db/stats")
+async def db_stats():
+    """
+    MongoDB connection pool utilization
+    """
+    return {"pool": database.pool_metrics.stats()}
+
+@api_router.get("/auth/stats")
+async def auth_stats():
+    """
+    Password hashing pool and profile cache metrics
+    """
+    return {"password_pool": password_pool.stats(), "profile": profile_stats()}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus text exposition of this worker's metrics
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
 # Configure logging
@@ -145,6 +705,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def bootstrap_indexes(db):
+    if os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() != 'true':
+        return
+    try:
+        report = await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+        return
+    users = {result["name"]: result["state"] for result in report["users"]}
+    set_mobile_index_ready(users.get("mobile_unique") in ("exists", "created"))
+    for collection_name, results in report.items():
+        for result in results:
+            if result["state"] != "exists":
+                logger.info(f"Index {collection_name}.{result['name']}: {result['state']}")
+
+async def warm_mongo():
+    """First round trip to MongoDB, then the index bootstrap"""
+    db = get_db()
+    await db.command("ping")
+    await bootstrap_indexes(db)
+
+def warmup_steps() -> dict:
+    """
+    One-off startup work that runs after the worker starts serving
+
+    Blocking steps run in threads. In-memory indexes are built once per
+    worker, or inherited from the parent when serve.py preloaded them.
+    """
+    steps = {
+        "mongo": warm_mongo,
+        "chat_client": lambda: asyncio.to_thread(get_chat_client),
+        "tokenizer": lambda: asyncio.to_thread(count_tokens, "नमस्ते"),
+        "grammar_retriever": lambda: asyncio.to_thread(get_grammar_retriever),
+        "search_index": lambda: asyncio.to_thread(get_search_index),
+        "content_store": lambda: asyncio.to_thread(get_content_store),
+        "quiz_bank": lambda: asyncio.to_thread(get_quiz_bank)
+    }
+    if answer_cache.semantic is not None:
+        # Chat skips the semantic tier until its model is loaded
+        steps["semantic_cache"] = lambda: asyncio.to_thread(answer_cache.load_semantic)
+    return steps
@@ -0,0 +1,127 @@
+"""
+Coalescing of identical concurrent calls
+
+The first caller for a key starts the work; callers arriving while it is
+in flight wait for the same result instead of repeating it. Streams are
+fanned out: late joiners first replay the events produced so far, then
+follow along live. The work runs in its own task, so a leader whose client
+disconnects does not cancel it for everyone else. Once the last follower of
+a stream has gone, its producer is cancelled and the stream closed, so an
+upstream call nobody is reading does not hold its slot to the end.
+"""
+import asyncio
+import logging
+from contextlib import aclosing
+
+logger = logging.getLogger(__name__)
+
+
+class _Broadcast:
+    """Buffered event stream that any number of subscribers can follow"""
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.closed)
+                pending = self.events[index:]
+            for event in pending:
+                yield event
+            index += len(pending)
+            if not pending and self.closed:
+                return
+
+
+class _Flight:
+    """A shared stream: its events, the task producing them and who follows it"""
+
+    def __init__(self):
+        self.broadcast = _Broadcast()
+        self.producer = None
+        self.subscribers = 0
+
+
+class SingleFlight:
+    """Shares one in-flight call or stream among concurrent identical requests"""
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn):
+        """Await `fn()` once per key however many callers ask concurrently"""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.followers += 1
+        # Shielded so one caller going away leaves the shared call running
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, factory):
+        """Follow the events of `factory()`, started once per key"""
+        flight = self._streams.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = self._streams[key] = _Flight()
+            flight.producer = asyncio.ensure_future(self._produce(key, flight, factory))
+        else:
+            self.followers += 1
+        flight.subscribers += 1
+        try:
+            async for event in flight.broadcast.subscribe():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.producer.done():
+                # Nobody is reading any more; later callers start afresh
+                self._forget(key, flight)
+                flight.producer.cancel()
+                self.abandoned += 1
+
+    async def _produce(self, key: str, flight: _Flight, factory):
+        try:
+            # Closing the generator runs its cleanup when the producer is cancelled
+            async with aclosing(factory()) as events:
+                async for event in events:
+                    await flight.broadcast.publish(event)
+        except Exception as e:
+            logger.error(f"Coalesced stream failed: {e}")
+        finally:
+            self._forget(key, flight)
+            await flight.broadcast.close()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        return {
+            "upstream_calls": self.leaders,
+            "upstream_calls_saved": self.followers,
+            "coalesce_ratio": round(self.followers / total, 4) if total else 0.0,
+            "streams_abandoned": self.abandoned,
+            "in_flight": len(self._calls) + len(self._streams)
+        }
@@ -0,0 +1,118 @@
+"""
+Background warm-up and readiness reporting
+
+A worker starts serving as soon as its lifespan has run. Slow one-off work
+such as importing the OpenAI client, building the in-memory indexes and the
+first MongoDB round trip runs afterwards in the background. GET /api/ready
+answers 503 until every step has succeeded, so a load balancer only sends
+traffic to warm workers. Requests that arrive earlier wait for the steps
+they depend on instead of repeating that work on the event loop, and get
+503 if it takes longer than WARMUP_WAIT_TIMEOUT.
+"""
+import os
+import time
+import asyncio
+import inspect
+import logging
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# Warm-up configuration
+WARMUP_RETRY_BASE_DELAY = float(os.environ.get('WARMUP_RETRY_BASE_DELAY', '0.5'))
+WARMUP_RETRY_MAX_DELAY = float(os.environ.get('WARMUP_RETRY_MAX_DELAY', '30'))
+# How long a request waits for a step it depends on before giving up with 503
+WARMUP_WAIT_TIMEOUT = float(os.environ.get('WARMUP_WAIT_TIMEOUT', '10'))
+
+
+class Readiness:
+    """Runs the warm-up steps and tracks which of them have succeeded"""
+
+    def __init__(self):
+        self.checks = {}
+        self._done = {}
+        self.started_at = None
+        self.warm_seconds = None
+        self._task = None
+
+    def start(self, steps: dict):
+        """
+        Run `steps` (name -> callable) concurrently in the background
+
+        A step may return an awaitable; blocking work should be handed to a
+        thread so it does not stall requests being served meanwhile. Failed
+        steps are retried with backoff until they succeed.
+        """
+        if self._task is not None:
+            return
+        self.started_at = time.monotonic()
+        self.checks = {name: {"ready": False} for name in steps}
+        self._done = {name: asyncio.Event() for name in steps}
+        self._task = asyncio.create_task(self._warm(steps))
+
+    async def _warm(self, steps: dict):
+        await asyncio.gather(*(self._run(name, step) for name, step in steps.items()))
+        self.warm_seconds = round(time.monotonic() - self.started_at, 3)
+        logger.info("Warm-up finished in %.2fs", self.warm_seconds)
+
+    async def _run(self, name: str, step):
+        delay = WARMUP_RETRY_BASE_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                result = step()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning("Warm-up step %s failed, retrying in %.1fs: %s", name, delay, e)
+                self.checks[name] = {"ready": False, "error": str(e)}
+                await asyncio.sleep(delay)
+                delay = min(WARMUP_RETRY_MAX_DELAY, delay * 2)
+                continue
+            self.checks[name] = {"ready": True, "seconds": round(time.monotonic() - started, 3)}
+            self._done[name].set()
+            return
+
+    async def wait(self, *names: str):
+        """
+        Wait for the named steps to succeed, or raise 503
+
+        Steps that are not part of the warm-up (e.g. when the app runs
+        without its lifespan) do not wait; callers then build on first use.
+        """
+        pending = [self._done[name].wait() for name in names if name in self._done and not self._done[name].is_set()]
+        if not pending:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), WARMUP_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service is warming up",
+                headers={"Retry-After": "1"}
+            )
+
+    async def stop(self):
+        """Cancel steps that are still running"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.checks) and all(check["ready"] for check in self.checks.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3) if self.started_at else 0.0,
+            "warm_seconds": self.warm_seconds,
+            "checks": dict(self.checks)
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,108 @@
+"""
+OpenAI-compatible chat completions stand-in for load tests
+
+Answers POST /v1/chat/completions after a configurable delay and emits
+tokens at a configurable rate, streamed or not, so the backend's LLM path
+can be exercised without network access or API costs.
+
+    python benchmarks/fake_openai.py --port 8901 --latency 0.3 --tokens-per-second 80
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=fake uvicorn server:app
+"""
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+REPLY_TOKEN = "संज्ञा "
+
+
+def create_app(latency: float = 0.3, tokens_per_second: float = 80.0, reply_tokens: int = 60) -> Starlette:
+    stats = {"requests": 0, "streamed": 0}
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats["requests"] += 1
+        prompt_tokens = max(1, len(json.dumps(body["messages"], ensure_ascii=False).encode('utf-8')) // 4)
+        completion_tokens = min(reply_tokens, body.get("max_tokens") or reply_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-fake-{stats['requests']}", "created": int(time.time()), "model": body["model"]}
+        await asyncio.sleep(latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(completion_tokens / tokens_per_second)
+            return JSONResponse({
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": REPLY_TOKEN * completion_tokens}}],
+                "usage": usage
+            })
+
+        stats["streamed"] += 1
+
+        async def events():
+            for _ in range(completion_tokens):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": REPLY_TOKEN}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(1 / tokens_per_second)
+            final = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def fake_stats(request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", fake_stats),
+    ])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeOpenAIServer:
+    """Runs the fake in a background thread with its own event loop"""
+
+    def __init__(self, port: int = None, **options):
+        self.port = port or free_port()
+        config = uvicorn.Config(create_app(**options), host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.tokens_per_second, args.reply_tokens), host="127.0.0.1", port=args.port)
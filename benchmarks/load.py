@@ -0,0 +1,326 @@
+"""
+In-process load test of the backend API
+
+Boots `server.app` (lifespan included) behind an in-memory ASGI transport,
+points the chat service at a fake OpenAI-compatible server, and drives
+concurrent workloads against it. Each workload reports requests per second,
+latency percentiles of its successful (2xx) requests, and how long the
+event loop was blocked while it ran. Chat rate limits are switched off
+unless --rate-limits is given, since every virtual user shares one IP.
+
+    python benchmarks/load.py --fake-mongo                  # no services needed
+    python benchmarks/load.py --mongo-url mongodb://localhost:27017
+    python benchmarks/load.py --fake-mongo --workloads chat,chat_stream --concurrency 100
+    python benchmarks/load.py --fake-mongo --mixed          # all workloads at once
+    python benchmarks/load.py compare results/a.json results/b.json
+
+Workloads run one after another by default. --mixed runs them
+concurrently, reported as mixed/<workload>, to show what chat traffic does
+to the latency of the other endpoints. --fake-mongo needs the optional
+mongomock-motor package (`pip install mongomock-motor`). Results are
+written as JSON to benchmarks/results/ (not tracked by git) so runs from
+two commits can be compared.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / 'backend'
+RESULTS_DIR = BENCH_DIR / 'results'
+
+WORKLOADS = ["register", "login", "me", "status_write", "status_read", "chat", "chat_stream"]
+
+# Lag beyond this counts as the loop being blocked
+BLOCKING_THRESHOLD = 0.005
+LAG_SAMPLE_INTERVAL = 0.005
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoopMonitor:
+    """Samples event-loop lag with a short periodic timer"""
+
+    def __init__(self):
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LAG_SAMPLE_INTERVAL
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            lag = loop.time() - expected
+            self.max_lag = max(self.max_lag, lag)
+            if lag > BLOCKING_THRESHOLD:
+                self.blocked += lag
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def mobile_number(index: int) -> str:
+    return f"9{index:09d}"
+
+
+class Workloads:
+    """One coroutine per workload; each performs a single request"""
+
+    def __init__(self, client, run_id: str):
+        self.client = client
+        self.run_id = run_id
+        self.tokens = []
+        self.registered = 0
+
+    def _user(self, index: int) -> dict:
+        return {
+            "name": f"Bench Student {index}",
+            "mobile": mobile_number(index),
+            "school": f"Bench School {index % 20}",
+            "class_name": f"Class {6 + index % 5}",
+            "password": "bench123"
+        }
+
+    async def register(self, i: int):
+        self.registered += 1
+        response = await self.client.post("/api/auth/register", json=self._user(self.registered))
+        if response.status_code == 200:
+            self.tokens.append(response.json()["access_token"])
+        return response
+
+    async def login(self, i: int):
+        index = i % max(self.registered, 1) + 1
+        return await self.client.post("/api/auth/login", json={"mobile": mobile_number(index), "password": "bench123"})
+
+    async def me(self, i: int):
+        token = self.tokens[i % len(self.tokens)]
+        return await self.client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    async def status_write(self, i: int):
+        return await self.client.post("/api/status", json={"client_name": f"bench-{self.run_id}-{i}"})
+
+    async def status_read(self, i: int):
+        return await self.client.get("/api/status", params={"limit": 50})
+
+    async def chat(self, i: int):
+        # Unique questions so every request takes the upstream path
+        return await self.client.post("/api/chat", json={"message": f"प्रश्न {self.run_id}-{i}: संज्ञा क्या है?"})
+
+    async def chat_stream(self, i: int):
+        return await self.client.post("/api/chat/stream", json={"message": f"प्रश्न {self.run_id}-s{i}: काल क्या है?"})
+
+
+async def run_workload(name: str, perform, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await perform(i)
+                ok = 200 <= response.status_code < 300
+            except Exception:
+                ok = False
+            # Rejections return quickly and would flatter the percentiles
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    with LoopMonitor() as monitor:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+        duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "rps": round(requests / duration, 1) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "loop_blocked_ms": round(monitor.blocked * 1000, 1),
+        "loop_max_lag_ms": round(monitor.max_lag * 1000, 1)
+    }
+
+
+def use_fake_mongo():
+    """Swap the shared Motor client for an in-memory one"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--fake-mongo needs mongomock-motor: pip install mongomock-motor")
+    import database
+
+    client = AsyncMongoMockClient()
+
+    def connect():
+        database._client = client
+        database._db = client[os.environ.get('DB_NAME', 'hindi_grammar_db')]
+        return database._db
+
+    def close():
+        database._client = None
+        database._db = None
+
+    database.connect = connect
+    database.close = close
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    import httpx
+    import server
+    from warmup import readiness
+
+    workloads_to_run = args.workloads.split(",")
+    unknown = set(workloads_to_run) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        # Measure a warm worker, as a load balancer only routes to those
+        while not readiness.ready:
+            await asyncio.sleep(0.05)
+        print(f"{'warm-up':13s} {readiness.warm_seconds}s", flush=True)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            workloads = Workloads(client, run_id=str(int(time.time())))
+            # Token-based workloads need registered users
+            if {"login", "me"} & set(workloads_to_run) and "register" not in workloads_to_run:
+                workloads_to_run.insert(0, "register")
+            names = [name for name in WORKLOADS if name in workloads_to_run]
+            if args.mixed and "register" in names:
+                # Login and me need the users to exist before they start
+                names.remove("register")
+                results["register"] = await run_workload("register", workloads.register, args.users, args.concurrency)
+                print(f"{'register':13s} {json.dumps(results['register'])}", flush=True)
+            if args.mixed:
+                runs = await asyncio.gather(*(
+                    run_workload(name, getattr(workloads, name), args.requests, args.concurrency) for name in names
+                ))
+                for name, result in zip(names, runs):
+                    results[f"mixed/{name}"] = result
+                    print(f"{'mixed/' + name:19s} {json.dumps(result)}", flush=True)
+                return results
+            for name in names:
+                requests = args.users if name == "register" else args.requests
+                results[name] = await run_workload(name, getattr(workloads, name), requests, args.concurrency)
+                print(f"{name:13s} {json.dumps(results[name])}", flush=True)
+    return results
+
+
+def compare(old_path: str, new_path: str):
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{'workload':13s} {'rps':>22s} {'p95 ms':>22s} {'p99 ms':>22s}")
+    for name, after in new["workloads"].items():
+        before = old["workloads"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for metric in ("rps", "p95_ms", "p99_ms"):
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            cells.append(f"{before[metric]:>8} -> {after[metric]:<8} {change:+6.1f}%")
+        print(f"{name:13s} " + " ".join(cells))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        if len(sys.argv) != 4:
+            sys.exit("usage: load.py compare OLD.json NEW.json")
+        return compare(sys.argv[2], sys.argv[3])
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per workload")
+    parser.add_argument("--users", type=int, default=100, help="users registered by the register workload")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent requests per workload")
+    parser.add_argument("--mixed", action="store_true", help="run the workloads concurrently instead of in turn")
+    parser.add_argument("--fake-mongo", action="store_true", help="use an in-memory Mongo stand-in")
+    parser.add_argument("--mongo-url", help="MongoDB to run against (default: MONGO_URL)")
+    parser.add_argument("--db-name", default="hindi_grammar_bench")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--llm-reply-tokens", type=int, default=60)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep chat rate limits on; all virtual users share one IP, so most chats get 429")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<rev>.json)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    sys.path.insert(0, str(BENCH_DIR))
+    from fake_openai import FakeOpenAIServer
+
+    fake_llm = FakeOpenAIServer(latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second,
+                                reply_tokens=args.llm_reply_tokens).start()
+    # Must be set before the backend modules are imported
+    os.environ["OPENAI_BASE_URL"] = fake_llm.base_url
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    os.environ["DB_NAME"] = args.db_name
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if args.rate_limits else "false"
+    if args.fake_mongo:
+        use_fake_mongo()
+
+    try:
+        workloads = asyncio.run(run(args))
+    finally:
+        fake_llm.stop()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "mongo": "fake" if args.fake_mongo else "mongod",
+            "args": vars(args)
+        },
+        "workloads": workloads
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Microbenchmarks for auth and serialization hot paths
+
+Times single functions with timeit and compares them against the last
+saved baseline in benchmarks/baselines/micro.json. The process exits with
+status 1 when any benchmark is slower than its baseline by more than the
+threshold, so it can gate a deploy.
+
+    python benchmarks/micro.py                      # compare against the baseline
+    python benchmarks/micro.py --save               # append this run as the new baseline
+    python benchmarks/micro.py --filter jwt --threshold 0.5
+
+Timings are normalized by a fixed pure-Python calibration loop measured in
+the same run, so a baseline recorded on one machine stays meaningful on a
+faster or slower one.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / 'backend'
+BASELINE_FILE = BENCH_DIR / 'baselines' / 'micro.json'
+
+REPEATS = 7
+DEFAULT_THRESHOLD = 0.25
+
+
+def _calibration():
+    total = 0
+    for i in range(10000):
+        total += i * i
+    return total
+
+
+def build_benchmarks() -> dict:
+    """Benchmark name -> zero-argument callable"""
+    from pydantic import TypeAdapter
+    from typing import List
+    import auth_service
+    import server
+
+    benchmarks = {}
+
+    password = "bench123"
+    for rounds in (4, 8, 10, 12):
+        hashed = auth_service.hash_password(password, rounds=rounds)
+        benchmarks[f"bcrypt_hash_cost{rounds}"] = lambda rounds=rounds: auth_service.hash_password(password, rounds=rounds)
+        benchmarks[f"bcrypt_verify_cost{rounds}"] = lambda hashed=hashed: auth_service.verify_password(password, hashed)
+
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    user = auth_service.User(id="u-1", name="छात्र", mobile="9876543210", school="विद्यालय",
+                             class_name="8", created_at=created_at)
+    claims = auth_service.token_claims(user)
+    token = auth_service.create_access_token(claims)
+    benchmarks["jwt_create"] = lambda: auth_service.create_access_token(claims)
+    benchmarks["jwt_decode"] = lambda: auth_service.decode_access_token(token)
+
+    user_fields = user.model_dump()
+    benchmarks["model_user"] = lambda: auth_service.User(**user_fields)
+    benchmarks["model_token_response"] = lambda: auth_service.TokenResponse(
+        access_token=token, token_type="bearer", user=user)
+    status_doc = {"id": "s-1", "client_name": "bench", "timestamp": created_at}
+    benchmarks["model_status_check"] = lambda: server.StatusCheck(**status_doc)
+
+    # GET /api/status: half native dates, half legacy ISO strings
+    docs = [
+        {"id": f"s-{i}", "client_name": "bench",
+         "timestamp": (created_at + timedelta(seconds=i)) if i % 2 else (created_at + timedelta(seconds=i)).isoformat()}
+        for i in range(1000)
+    ]
+    benchmarks["status_from_docs_1000"] = lambda: [server._status_from_doc(doc) for doc in docs]
+    # What FastAPI's response_model then does with the returned models
+    adapter = TypeAdapter(List[server.StatusCheck])
+    checks = [server._status_from_doc(doc) for doc in docs]
+    benchmarks["status_response_1000"] = lambda: adapter.dump_json(adapter.validate_python(checks))
+
+    return benchmarks
+
+
+def measure(func) -> float:
+    """Best seconds per call over several repeats"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # The minimum is the least noisy estimate; slower repeats measure interference
+    return min(timer.repeat(repeat=REPEATS, number=number)) / number
+
+
+def load_baselines() -> dict:
+    if not BASELINE_FILE.exists():
+        return {"runs": []}
+    return json.loads(BASELINE_FILE.read_text())
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (default: 0.25)")
+    parser.add_argument("--save", action="store_true", help="append this run to the baselines")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+    benchmarks = {name: func for name, func in build_benchmarks().items() if args.filter in name}
+    calibration = measure(_calibration)
+    baseline = (load_baselines()["runs"] or [None])[-1]
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':26s} {'time':>12s} {'baseline':>12s} {'change':>8s}")
+    for name, func in benchmarks.items():
+        seconds = measure(func)
+        results[name] = round(seconds * 1e6, 3)
+        line = f"{name:26s} {seconds * 1e6:10.2f}us"
+        if baseline and name in baseline["results"]:
+            # Compare in calibration units to factor out machine speed
+            expected = baseline["results"][name] / baseline["calibration_us"] * calibration * 1e6
+            change = seconds * 1e6 / expected - 1
+            line += f" {expected:10.2f}us {change:+7.1%}"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line, flush=True)
+
+    if args.save:
+        baselines = load_baselines()
+        baselines["runs"].append({
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "calibration_us": round(calibration * 1e6, 3),
+            # Keep earlier results for benchmarks not run this time
+            "results": {**(baseline["results"] if baseline else {}), **results}
+        })
+        BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_FILE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baseline saved to {BASELINE_FILE}")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Throughput scaling of backend/serve.py across worker counts
+
+Starts the preforked server with each worker count in turn, drives it over
+real HTTP from several client processes, and reports requests per second
+and how close each step comes to linear scaling from one worker.
+
+    python benchmarks/scaling.py --fake-mongo                   # 1, 2, 4... up to the core count
+    python benchmarks/scaling.py --fake-mongo --workers 1,2,4,8 --duration 20
+    python benchmarks/scaling.py --mongo-url mongodb://localhost:27017 --paths /api/,/api/quiz/1
+
+The default paths are CPU-bound and need no database: search queries and
+freshly seeded quizzes. Client processes share the machine with the
+workers, so leave cores free for them (or pin with taskset) - a saturated
+client flattens the curve. Results are written as JSON to
+benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / 'backend'
+RESULTS_DIR = BENCH_DIR / 'results'
+
+DEFAULT_PATHS = [
+    "/api/search?q=संज्ञा",
+    "/api/search?q=sandhi",
+    "/api/search?q=क्रिया विशेषण",
+    "/api/quiz/1?seed={i}&count=10",
+    "/api/quiz/2?seed={i}&count=10",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(argv: list):
+    """Entry point of the server subprocess: serve.py, optionally on fake Mongo"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    if "--fake-mongo" in argv:
+        argv.remove("--fake-mongo")
+        from load import use_fake_mongo
+        # Patched before the fork, so every worker inherits it
+        use_fake_mongo()
+    import serve as launcher
+    launcher.main(argv)
+
+
+async def _drive(base_url: str, paths: list, connections: int, duration: float, warmup: float, offset: int) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    counts = {"ok": 0, "errors": 0}
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        loop = asyncio.get_running_loop()
+        measure_from = loop.time() + warmup
+        stop_at = measure_from + duration
+
+        async def worker(worker_id: int):
+            i = offset + worker_id * 1_000_000
+            while loop.time() < stop_at:
+                i += 1
+                path = paths[i % len(paths)].format(i=i)
+                started = loop.time()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if started >= measure_from:
+                    counts["ok" if ok else "errors"] += 1
+                    latencies.append(loop.time() - started)
+
+        await asyncio.gather(*(worker(w) for w in range(connections)))
+    return {**counts, "latencies": latencies}
+
+
+def _client_process(args: tuple, results):
+    results.put(asyncio.run(_drive(*args)))
+
+
+def measure(base_url: str, paths: list, clients: int, connections: int, duration: float, warmup: float) -> dict:
+    """Drive the server from `clients` processes and merge their counts"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    per_client = max(1, connections // clients)
+    processes = [
+        context.Process(target=_client_process,
+                        args=((base_url, paths, per_client, duration, warmup, n * 100_000_000), results))
+        for n in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    merged = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    from load import percentile
+    latencies = sorted(latency for result in merged for latency in result["latencies"])
+    ok = sum(result["ok"] for result in merged)
+    return {
+        "requests": ok,
+        "errors": sum(result["errors"] for result in merged),
+        "rps": round(ok / duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with status {process.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/api/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit("Server did not become ready in time")
+
+
+def run_step(workers: int, args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, __file__, "_serve", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    if args.fake_mongo:
+        command.append("--fake-mongo")
+    server = subprocess.Popen(command)
+    try:
+        wait_until_ready(base_url, server)
+        # Every worker runs its lifespan on start; give the last ones a moment
+        time.sleep(1 + 0.2 * workers)
+        return measure(base_url, args.paths.split(","), args.clients, args.connections, args.duration, args.warmup)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_serve":
+        return serve(sys.argv[2:])
+
+    cores = os.cpu_count() or 1
+    default_steps = sorted({1, *(2 ** n for n in range(1, cores.bit_length()) if 2 ** n <= cores), cores})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(map(str, default_steps)), help="worker counts to measure")
+    parser.add_argument("--paths", default=",".join(DEFAULT_PATHS),
+                        help="comma-separated paths, {i} is replaced by a request counter")
+    parser.add_argument("--clients", type=int, default=max(1, cores // 2), help="load generator processes")
+    parser.add_argument("--connections", type=int, default=64, help="concurrent connections in total")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--fake-mongo", action="store_true", help="use an in-memory Mongo stand-in in the workers")
+    parser.add_argument("--mongo-url", help="MongoDB to run against (default: MONGO_URL)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/scaling-<time>-<rev>.json)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_NAME", "hindi_grammar_bench")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+
+    steps = {}
+    baseline = None
+    print(f"{'workers':>7s} {'rps':>10s} {'p50 ms':>8s} {'p99 ms':>8s} {'efficiency':>10s}")
+    for workers in (int(count) for count in args.workers.split(",")):
+        result = run_step(workers, args)
+        baseline = baseline or result["rps"] / workers
+        # Share of perfectly linear scaling from the first step
+        result["efficiency"] = round(result["rps"] / (baseline * workers), 3) if baseline else 0.0
+        steps[workers] = result
+        print(f"{workers:7d} {result['rps']:10.1f} {result['p50_ms']:8.2f} {result['p99_ms']:8.2f} {result['efficiency']:10.1%}",
+              flush=True)
+
+    from load import git_revision
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "cores": cores,
+            "args": vars(args)
+        },
+        "workers": steps
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"scaling-{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
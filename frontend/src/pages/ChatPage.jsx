@@ -7,12 +7,13 @@ import { Input } from '@/components/ui/input';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { MessageCircle, Send, Loader2, Sparkles } from 'lucide-react';
 import { toast } from 'sonner';
-import axios from 'axios';
+import { useAuth } from '@/context/AuthContext';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 export default function ChatPage() {
+  const { token } = useAuth();
   const [messages, setMessages] = useState([
     {
       role: 'assistant',
@@ -21,6 +22,7 @@ export default function ChatPage() {
   ]);
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const scrollRef = useRef(null);
   const inputRef = useRef(null);
 
@@ -32,7 +34,7 @@ export default function ChatPage() {
   }, [messages]);
 
   const handleSendMessage = async () => {
-    if (!inputMessage.trim() || isLoading) return;
+    if (!inputMessage.trim() || isLoading || isStreaming) return;
 
     const userMessage = inputMessage.trim();
     setInputMessage('');
@@ -41,21 +43,69 @@ export default function ChatPage() {
     const newMessages = [...messages, { role: 'user', content: userMessage }];
     setMessages(newMessages);
     setIsLoading(true);
+    setIsStreaming(true);
 
     try {
-      // Send to backend
-      const response = await axios.post(`${API}/chat`, {
-        message: userMessage,
-        conversation_history: messages.filter(msg => msg.role !== 'system')
+      // Stream the answer from the backend as Server-Sent Events
+      const response = await fetch(`${API}/chat/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          // Signed-in students get their own rate limit and daily quota
+          ...(token ? { Authorization: `Bearer ${token}` } : {})
+        },
+        body: JSON.stringify({
+          message: userMessage,
+          conversation_history: messages.filter(msg => msg.role !== 'system')
+        })
       });
 
-      if (response.data.success) {
-        setMessages([...newMessages, { 
-          role: 'assistant', 
-          content: response.data.response 
-        }]);
-      } else {
-        throw new Error(response.data.error || 'Unknown error');
+      if (response.status === 429) {
+        const retryAfter = Number(response.headers.get('Retry-After')) || 60;
+        const waitText = retryAfter >= 3600
+          ? `${Math.ceil(retryAfter / 3600)} घंटे`
+          : retryAfter >= 60 ? `${Math.ceil(retryAfter / 60)} मिनट` : `${retryAfter} सेकंड`;
+        const notice = `आपने बहुत सारे प्रश्न पूछ लिए हैं। कृपया ${waitText} बाद पुनः प्रयास करें।`;
+        toast.error(notice);
+        setMessages([...newMessages, { role: 'assistant', content: notice }]);
+        return;
+      }
+
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder('utf-8');
+      let buffer = '';
+      let answer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE events are separated by a blank line
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const rawEvent of events) {
+          const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const event = JSON.parse(dataLine.slice(6));
+
+          if (event.type === 'delta') {
+            answer += event.content;
+            setIsLoading(false);
+            setMessages([...newMessages, { role: 'assistant', content: answer }]);
+          } else if (event.type === 'error') {
+            throw new Error(event.error || 'Unknown error');
+          }
+        }
+      }
+
+      if (!answer) {
+        throw new Error('Empty response');
       }
     } catch (error) {
       console.error('Chat error:', error);
@@ -66,6 +116,7 @@ export default function ChatPage() {
       }]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
       inputRef.current?.focus();
     }
   };
@@ -181,14 +232,14 @@ export default function ChatPage() {
                 onKeyPress={handleKeyPress}
                 placeholder="अपना प्रश्न यहाँ लिखें..."
                 className="flex-grow hindi-text"
-                disabled={isLoading}
+                disabled={isLoading || isStreaming}
               />
               <Button
                 onClick={handleSendMessage}
-                disabled={!inputMessage.trim() || isLoading}
+                disabled={!inputMessage.trim() || isLoading || isStreaming}
                 className="hindi-text"
               >
-                {isLoading ? (
+                {isLoading || isStreaming ? (
                   <Loader2 className="h-4 w-4 animate-spin" />
                 ) : (
                   <>
@@ -1,3 +1,4 @@
+import { useState, useEffect } from 'react';
 import { Navbar } from '@/components/Navbar';
 import { Footer } from '@/components/Footer';
 import { Card } from '@/components/ui/card';
@@ -5,9 +6,34 @@ import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
 import { Link } from 'react-router-dom';
 import { Target, ArrowRight } from 'lucide-react';
-import practiceExercises from '@/data/questionBank';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
 
 export default function PracticeExercisesPage() {
+  const [practiceExercises, setPracticeExercises] = useState([]);
+
+  useEffect(() => {
+    fetch(`${API}/quiz/sets`)
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json();
+      })
+      .then(setPracticeExercises)
+      .catch(async error => {
+        console.error('Failed to load practice sets:', error);
+        // Offline, list the sets of the bundled bank instead
+        const { default: offlineExercises } = await import('@/data/questionBank');
+        setPracticeExercises(offlineExercises.map(({ questions, ...exercise }) => ({
+          ...exercise,
+          pool_size: questions.length
+        })));
+      })
+      .catch(error => console.error('Failed to load offline practice sets:', error));
+  }, []);
+
+  const totalQuestions = practiceExercises.reduce((sum, exercise) => sum + exercise.pool_size, 0);
+
   return (
     <div className="min-h-screen bg-background">
       <Navbar />
@@ -24,12 +50,12 @@ export default function PracticeExercisesPage() {
             </h1>
           </div>
           <p className="text-lg text-muted-foreground hindi-text">
-            10 अभ्यास श्रृंखलाएँ, प्रत्येक में 100 प्रश्न
+            {practiceExercises.length} अभ्यास श्रृंखलाएँ, हर बार नए क्रम में प्रश्न
           </p>
           <div className="flex items-center space-x-4 text-sm text-muted-foreground">
             <div className="flex items-center space-x-2">
               <div className="w-3 h-3 rounded-full bg-success"></div>
-              <span className="hindi-text">कुल प्रश्न: 1000</span>
+              <span className="hindi-text">कुल प्रश्न: {totalQuestions}</span>
             </div>
             <div className="flex items-center space-x-2">
               <div className="w-3 h-3 rounded-full bg-primary"></div>
@@ -75,7 +101,7 @@ export default function PracticeExercisesPage() {
               <div className="space-y-4 mt-auto">
                 <div className="flex items-center justify-between text-sm">
                   <span className="text-muted-foreground hindi-text">कुल प्रश्न</span>
-                  <span className="font-bold text-foreground">{exercise.totalQuestions}</span>
+                  <span className="font-bold text-foreground">{exercise.pool_size}</span>
                 </div>
                 
                 <Button asChild className="w-full group">
@@ -95,11 +121,11 @@ export default function PracticeExercisesPage() {
         {/* Stats Section */}
         <div className="mt-16 grid md:grid-cols-3 gap-6">
           <Card className="p-6 text-center bg-gradient-to-br from-primary/10 to-secondary/10 border-primary/20">
-            <div className="text-4xl font-bold gradient-text mb-2">1000</div>
+            <div className="text-4xl font-bold gradient-text mb-2">{totalQuestions}</div>
             <p className="text-sm text-muted-foreground hindi-text">कुल प्रश्न</p>
           </Card>
           <Card className="p-6 text-center bg-gradient-to-br from-accent/10 to-primary/10 border-accent/20">
-            <div className="text-4xl font-bold gradient-text mb-2">10</div>
+            <div className="text-4xl font-bold gradient-text mb-2">{practiceExercises.length}</div>
             <p className="text-sm text-muted-foreground hindi-text">अभ्यास श्रृंखला</p>
           </Card>
           <Card className="p-6 text-center bg-gradient-to-br from-success/10 to-accent/10 border-success/20">
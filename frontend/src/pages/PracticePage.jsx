@@ -7,11 +7,13 @@ import { Button } from '@/components/ui/button';
 import { Card } from '@/components/ui/card';
 import { Progress } from '@/components/ui/progress';
 import { Badge } from '@/components/ui/badge';
-import { Trophy, RotateCcw, ArrowLeft } from 'lucide-react';
-import practiceExercises from '@/data/questionBank';
+import { Trophy, RotateCcw, ArrowLeft, WifiOff } from 'lucide-react';
 import { useSpeech } from '@/hooks/useSpeech';
 import { AudioControls } from '@/components/AudioControls';
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
 export default function PracticePage() {
   const { exerciseId } = useParams();
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
@@ -19,9 +21,60 @@ export default function PracticePage() {
   const [isCompleted, setIsCompleted] = useState(false);
   const { speak, pause, resume, stop, isPlaying, isPaused, rate, changeRate } = useSpeech();
   
-  // Get exercise or default to first one
-  const exercise = practiceExercises.find(ex => ex.id === parseInt(exerciseId)) || practiceExercises[0];
-  const questions = exercise.questions;
+  const [exercise, setExercise] = useState(null);
+  const [loadError, setLoadError] = useState(false);
+  const [isOffline, setIsOffline] = useState(false);
+  const [attempt, setAttempt] = useState(0);
+  
+  // Fetch a freshly seeded quiz; the returned seed reproduces it exactly
+  useEffect(() => {
+    const setId = parseInt(exerciseId) || 1;
+    let cancelled = false;
+    setExercise(null);
+    setLoadError(false);
+    setCurrentQuestionIndex(0);
+    setScore(0);
+    setIsCompleted(false);
+    
+    fetch(`${API}/quiz/${setId}`)
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json();
+      })
+      .then(quiz => {
+        if (!quiz.questions || quiz.questions.length === 0) throw new Error('Quiz has no questions');
+        if (!cancelled) {
+          setIsOffline(false);
+          setExercise(quiz);
+        }
+      })
+      .catch(async error => {
+        console.error('Failed to load quiz:', error);
+        // The bundled bank keeps the app usable without a connection
+        let offlineExercise;
+        try {
+          const { default: practiceExercises } = await import('@/data/questionBank');
+          offlineExercise = practiceExercises.find(ex => ex.id === setId);
+        } catch (importError) {
+          console.error('Failed to load offline questions:', importError);
+        }
+        if (cancelled) return;
+        if (offlineExercise) {
+          setIsOffline(true);
+          setExercise(offlineExercise);
+        } else {
+          setLoadError(true);
+        }
+      });
+    
+    return () => {
+      cancelled = true;
+    };
+  }, [exerciseId, attempt]);
+  
+  const retryLoad = () => setAttempt(attempt + 1);
+  
+  const questions = exercise ? exercise.questions : [];
   
   // Stop audio when question changes
   useEffect(() => {
@@ -111,6 +164,43 @@ export default function PracticePage() {
   const progress = ((currentQuestionIndex + 1) / questions.length) * 100;
   const percentage = Math.round((score / questions.length) * 100);
   
+  if (loadError) {
+    return (
+      <div className="min-h-screen bg-background">
+        <Navbar />
+        <div className="max-w-3xl mx-auto px-4 sm:px-6 lg:px-8 py-12">
+          <Card className="p-8 space-y-4 text-center">
+            <p className="text-lg text-foreground hindi-text">
+              प्रश्न लोड नहीं हो सके।
+            </p>
+            <div className="flex gap-4 justify-center">
+              <Button onClick={retryLoad} className="hindi-text">
+                <RotateCcw className="h-4 w-4 mr-2" />
+                फिर से कोशिश करें
+              </Button>
+              <Button variant="outline" asChild className="hindi-text">
+                <Link to="/practice">सभी अभ्यास</Link>
+              </Button>
+            </div>
+          </Card>
+        </div>
+        <Footer />
+      </div>
+    );
+  }
+  
+  if (!exercise) {
+    return (
+      <div className="min-h-screen bg-background">
+        <Navbar />
+        <div className="max-w-3xl mx-auto px-4 sm:px-6 lg:px-8 py-12 text-center text-muted-foreground hindi-text">
+          प्रश्न लोड हो रहे हैं...
+        </div>
+        <Footer />
+      </div>
+    );
+  }
+  
   return (
     <div className="min-h-screen bg-background">
       <Navbar />
@@ -139,6 +229,18 @@ export default function PracticePage() {
               </p>
             </div>
           </div>
+          
+          {isOffline && (
+            <Card className="p-4 flex items-center justify-between gap-4">
+              <span className="flex items-center text-sm text-muted-foreground hindi-text">
+                <WifiOff className="h-4 w-4 mr-2" />
+                इंटरनेट के बिना सहेजे गए प्रश्न दिखाए जा रहे हैं
+              </span>
+              <Button variant="outline" size="sm" onClick={retryLoad} className="hindi-text">
+                फिर से कोशिश करें
+              </Button>
+            </Card>
+          )}
         </div>
         
         {!isCompleted ? (
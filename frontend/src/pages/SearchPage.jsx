@@ -8,244 +8,95 @@ import { Button } from '@/components/ui/button';
 import { Search, BookOpen, ArrowRight } from 'lucide-react';
 import { Link } from 'react-router-dom';
 
-// All lesson content for searching
-const lessonContent = [
-  {
-    id: 1,
-    title: 'संज्ञा (Noun)',
-    icon: '📝',
-    difficulty: 'आसान',
-    content: [
-      'संज्ञा उस शब्द को कहते हैं जिससे किसी व्यक्ति, स्थान, वस्तु, भाव या प्राणी के नाम का बोध हो।',
-      'व्यक्तिवाचक संज्ञा: किसी विशेष व्यक्ति, स्थान या वस्तु का नाम। उदाहरण: राम, दिल्ली, ताजमहल',
-      'जातिवाचक संज्ञा: किसी जाति या वर्ग का बोध कराने वाली संज्ञा। उदाहरण: लड़का, शहर, नदी',
-      'भाववाचक संज्ञा: किसी भाव, गुण या अवस्था का बोध कराने वाली संज्ञा। उदाहरण: सुंदरता, बचपन, क्रोध',
-      'समूहवाचक संज्ञा: समूह का बोध कराने वाली संज्ञा। उदाहरण: सेना, टीम, परिवार',
-      'द्रव्यवाचक संज्ञा: पदार्थ या द्रव्य का बोध कराने वाली संज्ञा। उदाहरण: सोना, दूध, पानी'
-    ],
-    keywords: ['संज्ञा', 'noun', 'नाम', 'व्यक्ति', 'स्थान', 'वस्तु', 'भाव', 'व्यक्तिवाचक', 'जातिवाचक', 'भाववाचक', 'समूहवाचक', 'द्रव्यवाचक']
-  },
-  {
-    id: 2,
-    title: 'सर्वनाम (Pronoun)',
-    icon: '👤',
-    difficulty: 'आसान',
-    content: [
-      'संज्ञा के स्थान पर प्रयोग होने वाले शब्द को सर्वनाम कहते हैं।',
-      'पुरुषवाचक सर्वनाम: उत्तम पुरुष (मैं, हम), मध्यम पुरुष (तू, तुम, आप), अन्य पुरुष (वह, वे)',
-      'निश्चयवाचक सर्वनाम: यह, वह, ये, वे',
-      'अनिश्चयवाचक सर्वनाम: कोई, कुछ',
-      'संबंधवाचक सर्वनाम: जो, सो',
-      'प्रश्नवाचक सर्वनाम: कौन, क्या',
-      'निजवाचक सर्वनाम: आप, स्वयं, खुद'
-    ],
-    keywords: ['सर्वनाम', 'pronoun', 'पुरुषवाचक', 'निश्चयवाचक', 'अनिश्चयवाचक', 'संबंधवाचक', 'प्रश्नवाचक', 'निजवाचक', 'मैं', 'तुम', 'वह']
-  },
-  {
-    id: 3,
-    title: 'क्रिया (Verb)',
-    icon: '🏃',
-    difficulty: 'मध्यम',
-    content: [
-      'क्रिया वह शब्द है जिससे किसी कार्य का करना या होना प्रकट होता है।',
-      'अकर्मक क्रिया: जिस क्रिया का फल कर्ता पर ही पड़े। उदाहरण: सोना, हँसना, रोना',
-      'सकर्मक क्रिया: जिस क्रिया का फल कर्म पर पड़े। उदाहरण: खाना, पीना, लिखना',
-      'प्रेरणार्थक क्रिया: जिसमें कर्ता स्वयं कार्य न करके दूसरे को प्रेरित करे। उदाहरण: खिलाना, पढ़ाना',
-      'नामधातु क्रिया: संज्ञा या विशेषण से बनी क्रिया। उदाहरण: हथियाना, लजाना',
-      'संयुक्त क्रिया: दो या अधिक क्रियाओं के योग से बनी क्रिया। उदाहरण: पढ़ लेना, खा चुकना'
-    ],
-    keywords: ['क्रिया', 'verb', 'अकर्मक', 'सकर्मक', 'प्रेरणार्थक', 'नामधातु', 'संयुक्त', 'कार्य', 'काम']
-  },
-  {
-    id: 4,
-    title: 'विशेषण (Adjective)',
-    icon: '✨',
-    difficulty: 'मध्यम',
-    content: [
-      'विशेषण वह शब्द है जो संज्ञा या सर्वनाम की विशेषता बताता है।',
-      'गुणवाचक विशेषण: गुण बताने वाला। उदाहरण: अच्छा, बुरा, सुंदर, मीठा',
-      'संख्यावाचक विशेषण: संख्या बताने वाला। उदाहरण: एक, दो, कुछ, बहुत',
-      'परिमाणवाचक विशेषण: मात्रा बताने वाला। उदाहरण: थोड़ा, बहुत, कम, अधिक',
-      'सार्वनामिक विशेषण: सर्वनाम से बना। उदाहरण: यह, वह, कोई, कुछ',
-      'व्यक्तिवाचक विशेषण: व्यक्तिवाचक संज्ञा से बना। उदाहरण: भारतीय, जयपुरी'
-    ],
-    keywords: ['विशेषण', 'adjective', 'गुण', 'संख्या', 'परिमाण', 'गुणवाचक', 'संख्यावाचक', 'परिमाणवाचक', 'विशेषता']
-  },
-  {
-    id: 5,
-    title: 'क्रिया विशेषण (Adverb)',
-    icon: '⚡',
-    difficulty: 'मध्यम',
-    content: [
-      'क्रिया विशेषण वह शब्द है जो क्रिया की विशेषता बताता है।',
-      'कालवाचक क्रिया विशेषण: समय बताता है। उदाहरण: अब, तब, कल, आज, परसों',
-      'स्थानवाचक क्रिया विशेषण: स्थान बताता है। उदाहरण: यहाँ, वहाँ, ऊपर, नीचे, बाहर',
-      'रीतिवाचक क्रिया विशेषण: तरीका बताता है। उदाहरण: धीरे-धीरे, जल्दी-जल्दी, अचानक',
-      'परिमाणवाचक क्रिया विशेषण: मात्रा बताता है। उदाहरण: बहुत, कम, थोड़ा, अधिक'
-    ],
-    keywords: ['क्रिया विशेषण', 'adverb', 'कालवाचक', 'स्थानवाचक', 'रीतिवाचक', 'समय', 'स्थान', 'तरीका']
-  },
-  {
-    id: 6,
-    title: 'वचन (Number)',
-    icon: '🔢',
-    difficulty: 'आसान',
-    content: [
-      'वचन से संख्या का बोध होता है कि एक है या अनेक।',
-      'एकवचन: जिससे एक का बोध हो। उदाहरण: लड़का, किताब, गाय, माता',
-      'बहुवचन: जिससे एक से अधिक का बोध हो। उदाहरण: लड़के, किताबें, गायें, माताएँ',
-      'आकारांत पुल्लिंग में ए जोड़ना: लड़का → लड़के, घोड़ा → घोड़े',
-      'इकारांत स्त्रीलिंग में याँ जोड़ना: लड़की → लड़कियाँ, नदी → नदियाँ'
-    ],
-    keywords: ['वचन', 'number', 'एकवचन', 'बहुवचन', 'singular', 'plural', 'संख्या']
-  },
-  {
-    id: 7,
-    title: 'लिंग (Gender)',
-    icon: '⚥',
-    difficulty: 'आसान',
-    content: [
-      'लिंग का अर्थ है चिह्न या निशान। व्याकरण में लिंग से संज्ञा के स्त्री या पुरुष जाति का बोध होता है।',
-      'पुल्लिंग: जिन शब्दों से पुरुष जाति का बोध हो। उदाहरण: लड़का, पिता, घोड़ा, सूरज',
-      'स्त्रीलिंग: जिन शब्दों से स्त्री जाति का बोध हो। उदाहरण: लड़की, माता, घोड़ी, चाँद',
-      'पुल्लिंग: पर्वत, महीने, दिन, धातु, अनाज, वृक्ष आदि के नाम',
-      'स्त्रीलिंग: नदी, भाषा, लिपि, तिथि, आकारांत भाववाचक संज्ञाएँ'
-    ],
-    keywords: ['लिंग', 'gender', 'पुल्लिंग', 'स्त्रीलिंग', 'masculine', 'feminine', 'जाति']
-  },
-  {
-    id: 8,
-    title: 'कारक (Case)',
-    icon: '🔗',
-    difficulty: 'कठिन',
-    content: [
-      'कारक उसे कहते हैं जो संज्ञा या सर्वनाम का क्रिया के साथ संबंध बताए।',
-      'कर्ता कारक (ने): काम करने वाला। उदाहरण: राम ने पुस्तक पढ़ी',
-      'कर्म कारक (को): जिस पर क्रिया का फल पड़े। उदाहरण: राम ने रावण को मारा',
-      'करण कारक (से, के द्वारा): साधन। उदाहरण: मैं कलम से लिखता हूँ',
-      'संप्रदान कारक (के लिए, को): जिसके लिए कार्य हो। उदाहरण: गुरु के लिए फल लाओ',
-      'अपादान कारक (से-अलग होना): जिससे अलगाव हो। उदाहरण: पेड़ से पत्ता गिरा',
-      'संबंध कारक (का, की, के): संबंध बताए। उदाहरण: राम का घर',
-      'अधिकरण कारक (में, पर): आधार। उदाहरण: घर में बच्चे हैं',
-      'संबोधन कारक (हे!, ओ!): बुलाना। उदाहरण: हे राम!'
-    ],
-    keywords: ['कारक', 'case', 'कर्ता', 'कर्म', 'करण', 'संप्रदान', 'अपादान', 'संबंध', 'अधिकरण', 'संबोधन', 'विभक्ति']
-  },
-  {
-    id: 9,
-    title: 'काल (Tense)',
-    icon: '⏰',
-    difficulty: 'कठिन',
-    content: [
-      'काल का अर्थ है समय। क्रिया के जिस रूप से कार्य के होने के समय का पता चले, उसे काल कहते हैं।',
-      'भूतकाल: बीता हुआ समय। उदाहरण: मैंने खाना खाया। वह गया था',
-      'सामान्य भूत: मैं गया। आसन्न भूत: मैं गया हूँ। पूर्ण भूत: मैं गया था',
-      'अपूर्ण भूत: मैं जा रहा था। संदिग्ध भूत: मैं गया होऊँगा',
-      'वर्तमानकाल: वर्तमान समय। उदाहरण: मैं खाना खाता हूँ। वह जा रहा है',
-      'भविष्यकाल: आने वाला समय। उदाहरण: मैं खाना खाऊँगा। वह जाएगा'
-    ],
-    keywords: ['काल', 'tense', 'समय', 'भूतकाल', 'वर्तमानकाल', 'भविष्यकाल', 'past', 'present', 'future']
-  },
-  {
-    id: 10,
-    title: 'समास (Compound)',
-    icon: '🔀',
-    difficulty: 'कठिन',
-    content: [
-      'समास का अर्थ है संक्षिप्तीकरण। दो या दो से अधिक शब्दों से मिलकर बने नए शब्द को समास कहते हैं।',
-      'अव्ययीभाव समास: पहला पद अव्यय हो। उदाहरण: यथाशक्ति, प्रतिदिन',
-      'तत्पुरुष समास: दूसरा पद प्रधान हो। उदाहरण: राजपुत्र, गंगाजल',
-      'कर्मधारय समास: विशेषण-विशेष्य संबंध। उदाहरण: नीलकमल, महापुरुष',
-      'द्विगु समास: पहला पद संख्यावाचक हो। उदाहरण: त्रिलोक, पंचवटी',
-      'द्वंद्व समास: दोनों पद प्रधान हों। उदाहरण: माता-पिता, रात-दिन',
-      'बहुव्रीहि समास: दोनों पद मिलकर तीसरे के विशेषण। उदाहरण: दशानन, चक्रपाणि'
-    ],
-    keywords: ['समास', 'compound', 'अव्ययीभाव', 'तत्पुरुष', 'कर्मधारय', 'द्विगु', 'द्वंद्व', 'बहुव्रीहि', 'विग्रह']
-  },
-  {
-    id: 11,
-    title: 'संधि (Sandhi)',
-    icon: '🔤',
-    difficulty: 'कठिन',
-    content: [
-      'दो वर्णों के मेल से जो विकार उत्पन्न होता है, उसे संधि कहते हैं।',
-      'स्वर संधि: दो स्वरों के मेल से होने वाले विकार',
-      'दीर्घ संधि: अ/आ + अ/आ = आ। उदाहरण: विद्या + आलय = विद्यालय',
-      'गुण संधि: अ/आ + इ/ई = ए। उदाहरण: महा + इंद्र = महेंद्र',
-      'वृद्धि संधि: अ/आ + ए/ऐ = ऐ। उदाहरण: सदा + एव = सदैव',
-      'व्यंजन संधि: व्यंजन का व्यंजन या स्वर से मेल। उदाहरण: जगत् + नाथ = जगन्नाथ',
-      'विसर्ग संधि: विसर्ग का स्वर या व्यंजन से मेल। उदाहरण: मनः + रथ = मनोरथ'
-    ],
-    keywords: ['संधि', 'sandhi', 'स्वर संधि', 'व्यंजन संधि', 'विसर्ग संधि', 'दीर्घ', 'गुण', 'वृद्धि', 'यण', 'विच्छेद']
-  },
-  {
-    id: 12,
-    title: 'विलोम शब्द (Antonyms)',
-    icon: '↔️',
-    difficulty: 'मध्यम',
-    content: [
-      'विलोम शब्द या विपरीतार्थक शब्द वे शब्द हैं जिनका अर्थ एक-दूसरे के विपरीत होता है।',
-      'अच्छा - बुरा, अमीर - गरीब, आदि - अंत, उत्तर - दक्षिण',
-      'एक - अनेक, ऊँचा - नीचा, कठिन - सरल, गर्म - ठंडा',
-      'छोटा - बड़ा, जीवन - मृत्यु, दिन - रात, धनी - निर्धन',
-      'पूर्व - पश्चिम, प्रकाश - अंधकार, बाहर - अंदर, भूत - भविष्य',
-      'मित्र - शत्रु, राजा - रंक, लाभ - हानि, विद्या - अविद्या'
-    ],
-    keywords: ['विलोम', 'antonym', 'विपरीत', 'उल्टा', 'opposite', 'पर्यायवाची', 'synonym']
-  }
-];
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 10;
+
+const resultTypeLabels = {
+  lesson: 'पाठ',
+  flashcard: 'फ्लैशकार्ड',
+  question: 'अभ्यास प्रश्न'
+};
+
+const resultLinkLabels = {
+  lesson: 'पाठ देखें',
+  flashcard: 'फ्लैशकार्ड देखें',
+  question: 'अभ्यास करें'
+};
+
+const escapeRegExp = (text) => text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
 
 export default function SearchPage() {
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]);
+  const [totalResults, setTotalResults] = useState(0);
+  const [page, setPage] = useState(1);
+  const [isSearching, setIsSearching] = useState(false);
   const [showResults, setShowResults] = useState(false);
 
   useEffect(() => {
     if (searchQuery.trim().length < 2) {
       setSearchResults([]);
+      setTotalResults(0);
       setShowResults(false);
       return;
     }
 
-    // Perform search
-    const query = searchQuery.toLowerCase().trim();
-    const results = [];
-
-    lessonContent.forEach(lesson => {
-      // Check if query matches title or keywords
-      const titleMatch = lesson.title.toLowerCase().includes(query);
-      const keywordMatch = lesson.keywords.some(keyword => 
-        keyword.toLowerCase().includes(query) || query.includes(keyword.toLowerCase())
-      );
-
-      if (titleMatch || keywordMatch) {
-        // Find matching content lines
-        const matchingContent = lesson.content.filter(line => 
-          line.toLowerCase().includes(query)
-        );
-
-        if (matchingContent.length > 0 || titleMatch) {
-          results.push({
-            ...lesson,
-            matchingContent: matchingContent.length > 0 ? matchingContent : lesson.content.slice(0, 2),
-            relevance: titleMatch ? 3 : keywordMatch ? 2 : 1
-          });
+    // Debounce keystrokes and drop responses for stale queries
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      setIsSearching(true);
+      try {
+        const params = new URLSearchParams({ q: searchQuery, page: 1, page_size: PAGE_SIZE });
+        const response = await fetch(`${API}/search?${params}`, { signal: controller.signal });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+        setSearchResults(data.results);
+        setTotalResults(data.total);
+        setPage(1);
+        setShowResults(true);
+      } catch (error) {
+        if (error.name !== 'AbortError') {
+          console.error('Search error:', error);
+          setSearchResults([]);
+          setTotalResults(0);
+          setShowResults(true);
         }
+      } finally {
+        setIsSearching(false);
       }
-    });
+    }, 200);
 
-    // Sort by relevance
-    results.sort((a, b) => b.relevance - a.relevance);
-    setSearchResults(results);
-    setShowResults(true);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
   }, [searchQuery]);
 
-  const highlightText = (text, query) => {
-    if (!query) return text;
+  const loadMore = async () => {
+    const nextPage = page + 1;
+    setIsSearching(true);
+    try {
+      const params = new URLSearchParams({ q: searchQuery, page: nextPage, page_size: PAGE_SIZE });
+      const response = await fetch(`${API}/search?${params}`);
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      const data = await response.json();
+      setSearchResults(prev => [...prev, ...data.results]);
+      setPage(nextPage);
+    } catch (error) {
+      console.error('Search error:', error);
+    } finally {
+      setIsSearching(false);
+    }
+  };
+
+  const highlightText = (text, words) => {
+    if (!words || words.length === 0) return text;
     
-    const parts = text.split(new RegExp(`(${query})`, 'gi'));
+    const pattern = new RegExp(`(${words.map(escapeRegExp).join('|')})`, 'g');
+    const parts = text.split(pattern);
     return parts.map((part, index) => 
-      part.toLowerCase() === query.toLowerCase() ? 
+      words.includes(part) ? 
         <mark key={index} className="bg-secondary text-secondary-foreground px-1 rounded">{part}</mark> : 
         part
     );
@@ -311,7 +162,7 @@ export default function SearchPage() {
           <div className="space-y-4">
             <div className="flex items-center justify-between">
               <h2 className="text-xl font-semibold text-foreground hindi-text">
-                खोज परिणाम ({searchResults.length})
+                खोज परिणाम ({totalResults})
               </h2>
             </div>
 
@@ -331,7 +182,7 @@ export default function SearchPage() {
                   <Card 
                     key={result.id}
                     className="p-6 hover:shadow-lg transition-all duration-300 animate-fade-in"
-                    style={{ animationDelay: `${index * 50}ms` }}
+                    style={{ animationDelay: `${(index % PAGE_SIZE) * 50}ms` }}
                   >
                     <div className="flex items-start justify-between mb-4">
                       <div className="flex items-center space-x-3">
@@ -340,31 +191,45 @@ export default function SearchPage() {
                         </div>
                         <div>
                           <h3 className="text-lg font-semibold text-foreground hindi-text">
-                            {highlightText(result.title, searchQuery)}
+                            {highlightText(result.title, result.highlights)}
                           </h3>
-                          <Badge variant="outline" className="mt-1 hindi-text">
-                            {result.difficulty}
-                          </Badge>
+                          <div className="flex items-center gap-2 mt-1">
+                            <Badge variant="secondary" className="hindi-text">
+                              {resultTypeLabels[result.type]}
+                            </Badge>
+                            {result.difficulty && (
+                              <Badge variant="outline" className="hindi-text">
+                                {result.difficulty}
+                              </Badge>
+                            )}
+                          </div>
                         </div>
                       </div>
                       <Button size="sm" asChild>
-                        <Link to={`/lesson/${result.id}`} className="flex items-center space-x-2">
+                        <Link to={result.link} className="flex items-center space-x-2">
                           <BookOpen className="h-4 w-4" />
-                          <span className="hindi-text">पाठ देखें</span>
+                          <span className="hindi-text">{resultLinkLabels[result.type]}</span>
                           <ArrowRight className="h-4 w-4" />
                         </Link>
                       </Button>
                     </div>
 
                     <div className="space-y-2">
-                      {result.matchingContent.slice(0, 3).map((content, idx) => (
+                      {result.snippets.map((content, idx) => (
                         <p key={idx} className="text-sm text-foreground leading-relaxed hindi-text bg-muted/50 p-3 rounded-lg">
-                          {highlightText(content, searchQuery)}
+                          {highlightText(content, result.highlights)}
                         </p>
                       ))}
                     </div>
                   </Card>
                 ))}
+                {searchResults.length < totalResults && (
+                  <div className="text-center">
+                    <Button variant="outline" onClick={loadMore} disabled={isSearching}>
+                      <span className="hindi-text">{isSearching ? 'खोज रहे हैं...' : 'और परिणाम देखें'}</span>
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </div>
@@ -377,9 +242,10 @@ export default function SearchPage() {
               खोज सुविधा के बारे में
             </h3>
             <div className="space-y-2 text-sm text-foreground hindi-text">
-              <p>• सभी 12 व्याकरण विषयों में खोज करें</p>
-              <p>• विषय का नाम, परिभाषा, या उदाहरण खोजें</p>
-              <p>• संबंधित पाठ सीधे खोलें</p>
+              <p>• सभी पाठों, फ्लैशकार्ड और अभ्यास प्रश्नों में खोज करें</p>
+              <p>• हिंदी या रोमन लिपि में लिखें (जैसे "sangya")</p>
+              <p>• मात्रा या वर्तनी की छोटी गलतियाँ भी समझी जाती हैं</p>
+              <p>• संबंधित पाठ या अभ्यास सीधे खोलें</p>
               <p>• खोज शब्द हाइलाइट होते हैं</p>
             </div>
           </Card>
@@ -0,0 +1,29 @@
+"""
+Shared test setup
+
+Backend modules import each other flat, as the app runs from backend/, so
+that directory goes on the path. Tests that touch Mongo get an in-memory
+mongomock database in place of the shared Motor client.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database behind database.get_db()"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import database
+
+    client = mongomock_motor.AsyncMongoMockClient()
+    test_db = client["hindi_grammar_test"]
+    monkeypatch.setattr(database, "_client", client)
+    monkeypatch.setattr(database, "_db", test_db)
+    return test_db
@@ -0,0 +1,84 @@
+import sys
+import asyncio
+import hashlib
+from types import ModuleType
+
+import pytest
+
+from answer_cache import AnswerCache, _SemanticIndex
+
+
+class FakeModel:
+    """Stands in for a SentenceTransformer; identical texts embed identically"""
+
+    loads = 0
+
+    def __init__(self, model_name: str):
+        FakeModel.loads += 1
+        self.encoded = []
+
+    def encode(self, texts, normalize_embeddings=True):
+        import numpy as np
+
+        self.encoded.extend(texts)
+        seed = int(hashlib.sha256(texts[0].encode('utf-8')).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).normal(size=8)
+        return [vector / np.linalg.norm(vector)]
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    module = ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    FakeModel.loads = 0
+
+
+def semantic_cache() -> AnswerCache:
+    cache = AnswerCache()
+    cache.semantic = _SemanticIndex("fake-model", threshold=0.99, maxsize=10)
+    return cache
+
+
+def test_semantic_tier_bypassed_until_loaded(fake_sentence_transformers):
+    async def scenario():
+        cache = semantic_cache()
+        # Building the cache must not load the model
+        assert FakeModel.loads == 0 and not cache.semantic.ready
+        await cache.set("संज्ञा क्या है?", "v1", "उत्तर")
+        assert await cache.get("संज्ञा क्या है?", "v2") is None
+        assert (cache.semantic_hits, FakeModel.loads, cache.semantic._keys) == (0, 0, [])
+        assert cache.stats()["semantic_ready"] is False
+
+    asyncio.run(scenario())
+
+
+def test_semantic_hits_after_background_load(fake_sentence_transformers):
+    pytest.importorskip("numpy")
+
+    async def scenario():
+        cache = semantic_cache()
+        await asyncio.to_thread(cache.load_semantic)
+        assert cache.semantic.ready and FakeModel.loads == 1
+        await cache.set("संज्ञा क्या है?", "v1", "उत्तर")
+        # A different prompt version misses the exact tier but the question embeds the same
+        assert (await cache.get("संज्ञा क्या है?", "v2"))["response"] == "उत्तर"
+        assert cache.semantic_hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_missing_or_broken_model_disables_the_tier(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    cache = semantic_cache()
+    cache.load_semantic()
+    assert cache.semantic is None
+
+    def broken(self):
+        raise OSError("model download failed")
+
+    monkeypatch.setattr(_SemanticIndex, "load", broken)
+    cache = semantic_cache()
+    cache.load_semantic()
+    assert cache.semantic is None
+    assert cache.stats()["semantic_enabled"] is False
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import rate_limit
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server.chat_limiter, "store", rate_limit.MemoryStore())
+    monkeypatch.setattr(server, "answer_cache", server.AnswerCache())
+    calls = []
+
+    async def fake_answer(message, history, caller):
+        calls.append(message)
+        return {"success": True, "response": f"उत्तर: {message}", "usage": None}
+
+    monkeypatch.setattr(server, "_chat_answer", fake_answer)
+    # No lifespan: nothing here needs Mongo or the warm-up
+    return TestClient(server.app), calls
+
+
+def batch(client, questions: list):
+    response = client.post("/api/chat/batch", json={"questions": questions})
+    if response.status_code != 200:
+        return response.status_code, []
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return 200, sorted((line for line in lines if line["type"] == "result"), key=lambda line: line["index"])
+
+
+def test_batch_questions_count_against_rate_limit(client):
+    client, calls = client
+    burst = rate_limit.CHAT_ANON_RATE_BURST
+    # A repeated question is answered, and charged, once
+    questions = [f"प्रश्न {i}" for i in range(burst + 2)] + ["प्रश्न 0"]
+
+    status_code, results = batch(client, questions)
+    assert status_code == 200
+    assert len(calls) == burst
+    limited = [result for result in results if result.get("status") == 429]
+    assert len(limited) == 2
+    assert all(result["retry_after"] >= 1 for result in limited)
+    assert results[0]["success"] and results[-1]["success"]
+
+    # The bucket is empty, so the next batch is refused outright
+    assert batch(client, ["प्रश्न 0"])[0] == 429
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import chat_context
+from chat_context import check_request_size, prepare_history
+
+
+def turns(count: int, size: int = 20) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"संदेश {i} " + "क" * size}
+        for i in range(count)
+    ]
+
+
+def test_history_size_limits():
+    check_request_size("संज्ञा क्या है?", turns(20))
+
+    oversized = turns(3)
+    oversized[1]["content"] = "क" * (chat_context.CHAT_MAX_HISTORY_MESSAGE_BYTES // 3 + 1)
+    with pytest.raises(HTTPException) as error:
+        check_request_size("संज्ञा क्या है?", oversized)
+    assert error.value.status_code == 413
+
+    # Every message is within the limit but together they are not
+    per_message = chat_context.CHAT_MAX_HISTORY_MESSAGE_BYTES // 3 - 20
+    count = chat_context.CHAT_MAX_HISTORY_BYTES // (per_message * 3) + 1
+    with pytest.raises(HTTPException) as error:
+        check_request_size("संज्ञा क्या है?", turns(count, size=per_message))
+    assert error.value.status_code == 413
+
+    with pytest.raises(HTTPException):
+        check_request_size("क" * chat_context.CHAT_MAX_HISTORY_MESSAGE_BYTES, [])
+
+
+def test_fallback_summary_is_not_cached(monkeypatch):
+    monkeypatch.setattr(chat_context, "_summary_cache", chat_context.TTLCache(maxsize=10, ttl=3600))
+    history = turns(40, size=200)
+    upstream_up = False
+    calls = []
+
+    async def summarize(previous, messages, max_tokens):
+        calls.append(len(messages))
+        if not upstream_up:
+            raise ConnectionError("upstream down")
+        return "मॉडल का सारांश"
+
+    async def scenario():
+        nonlocal upstream_up
+        messages, _ = await prepare_history(history, summarize=summarize, budget=800)
+        assert messages[0]["content"].startswith("पिछली बातचीत का सारांश: छात्र ने पहले")
+
+        upstream_up = True
+        messages, _ = await prepare_history(history, summarize=summarize, budget=800)
+        assert messages[0]["content"].endswith("मॉडल का सारांश")
+        # The model summary is cached
+        await prepare_history(history, summarize=summarize, budget=800)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_oversized_newest_message_is_truncated_to_the_budget():
+    history = turns(4, size=50)
+    history[-1]["content"] = "लंबा उत्तर " * 400
+
+    async def scenario():
+        messages, report = await prepare_history(history, budget=400)
+        assert report["history_tokens_sent"] <= 400
+        newest = messages[-1]["content"]
+        assert newest.startswith("लंबा उत्तर") and newest.endswith(" …")
+        # Everything older went into the summary
+        assert report["summarized_messages"] == 3
+
+    asyncio.run(scenario())
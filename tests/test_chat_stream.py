@@ -0,0 +1,154 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import chat_service
+
+
+def chunk(content: str = None, usage: dict = None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content else []
+    return SimpleNamespace(choices=choices, usage=SimpleNamespace(**usage) if usage else None)
+
+
+class FakeStream:
+    """An upstream completion stream that yields one word every few milliseconds"""
+
+    def __init__(self, words: int):
+        self.chunks = [chunk(f"शब्द{i} ") for i in range(words)]
+        self.chunks.append(chunk(usage={"prompt_tokens": 5, "completion_tokens": words, "total_tokens": 5 + words}))
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0.005)
+        if self.closed or not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    streams = []
+
+    async def create(**kwargs):
+        streams.append(FakeStream(words=50))
+        return streams[-1]
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(chat_service, "get_client", lambda: client)
+    monkeypatch.setattr(chat_service, "select_knowledge", lambda message, history: ("", {}))
+    return streams
+
+
+def free_slots() -> int:
+    return chat_service._llm_semaphore._value
+
+
+def test_history_failure_yields_error_event(upstream, monkeypatch):
+    async def broken_history(history, summarize=None):
+        raise RuntimeError("tokenizer unavailable")
+
+    monkeypatch.setattr(chat_service, "prepare_history", broken_history)
+
+    async def scenario():
+        slots = free_slots()
+        events = [event async for event in chat_service.stream_chat_response("संज्ञा क्या है?", [])]
+        assert [event["type"] for event in events] == ["error"]
+        assert "tokenizer unavailable" in events[0]["error"]
+        assert free_slots() == slots and not upstream
+
+    asyncio.run(scenario())
+
+
+def test_client_disconnect_closes_upstream_stream(upstream):
+    async def scenario():
+        slots = free_slots()
+        events = chat_service.stream_chat_response("संज्ञा क्या है?", [])
+        assert (await events.__anext__())["type"] == "delta"
+        assert (await events.__anext__())["type"] == "delta"
+        # What Starlette does when the client goes away
+        await events.aclose()
+        assert upstream[0].closed
+        assert free_slots() == slots
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_stream_closes_upstream(upstream):
+    async def scenario():
+        slots = free_slots()
+        deltas = []
+
+        async def consume():
+            async for event in chat_service.stream_chat_response("काल क्या है?", []):
+                deltas.append(event)
+
+        task = asyncio.ensure_future(consume())
+        while len(deltas) < 3:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert upstream[0].closed
+        assert free_slots() == slots
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def endpoint(upstream, monkeypatch):
+    """The /api/chat/stream handler with warm-up, rate limits and the answer cache out of the way"""
+    import server
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(server.readiness, "wait", nothing)
+    monkeypatch.setattr(server, "_chat_caller", nothing)
+    monkeypatch.setattr(server.chat_limiter, "check", nothing)
+    monkeypatch.setattr(server.chat_limiter, "charge", nothing)
+    monkeypatch.setattr(server.answer_cache, "get", nothing)
+    monkeypatch.setattr(server, "chat_flight", server.SingleFlight())
+
+    async def open_response(message: str):
+        response = await server.chat_stream(server.ChatRequest(message=message), None, None)
+        return response.body_iterator
+
+    return open_response
+
+
+def test_endpoint_disconnect_closes_upstream_stream(endpoint, upstream):
+    async def scenario():
+        slots = free_slots()
+        body = await endpoint("संज्ञा क्या है?")
+        assert (await body.__anext__()).startswith("event: delta")
+        # The only client goes away; the coalesced stream has nobody left
+        await body.aclose()
+        await asyncio.sleep(0.02)
+        assert upstream[0].closed
+        assert free_slots() == slots
+
+    asyncio.run(scenario())
+
+
+def test_endpoint_stream_survives_one_of_two_clients_leaving(endpoint, upstream):
+    async def scenario():
+        slots = free_slots()
+        leaving = await endpoint("सर्वनाम क्या है?")
+        staying = await endpoint("सर्वनाम क्या है?")
+        await leaving.__anext__()
+        await staying.__anext__()
+        await leaving.aclose()
+
+        rest = [event async for event in staying]
+        assert rest[-1].startswith("event: done")
+        assert len(upstream) == 1
+        assert free_slots() == slots
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import server
+from content_store import ContentSnapshot, ContentStore, negotiate
+
+
+def write_content(content_dir, lessons: list, flashcards: list = None, practice_sets: list = None):
+    content_dir.mkdir(exist_ok=True)
+    files = {
+        "lessons": lessons,
+        "flashcards": flashcards or [{"category": "संज्ञा", "cards": []}],
+        "practice_sets": practice_sets or [{"id": 1, "title": "संज्ञा", "questions": []}],
+    }
+    for name, items in files.items():
+        (content_dir / f"{name}.json").write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    return ContentSnapshot(content_dir)
+
+
+def published(snapshot: ContentSnapshot) -> dict:
+    return {"version": snapshot.version, "items": snapshot.item_hashes}
+
+
+def body(variants: dict) -> dict:
+    return json.loads(variants["identity"])
+
+
+def test_version_depends_only_on_content(tmp_path):
+    first = write_content(tmp_path / "a", [{"id": 1, "title": "संज्ञा"}])
+    again = write_content(tmp_path / "b", [{"id": 1, "title": "संज्ञा"}])
+    changed = write_content(tmp_path / "c", [{"id": 1, "title": "सर्वनाम"}])
+    assert first.version == again.version != changed.version
+
+
+def test_delta_holds_only_changed_and_removed_items(tmp_path):
+    old = write_content(tmp_path, [{"id": 1, "title": "संज्ञा"}, {"id": 2, "title": "लिंग"}, {"id": 3, "title": "वचन"}])
+    new = write_content(tmp_path, [{"id": 1, "title": "संज्ञा"}, {"id": 2, "title": "लिंग (संशोधित)"}])
+    store = ContentStore(new, [published(old), published(new)], dist_dir=tmp_path / "dist")
+
+    etag, variants = store.delta(old.version)
+    delta = body(variants)
+    assert etag == f'"{old.version}..{new.version}"'
+    assert (delta["full"], delta["removed"]) == (False, ["lessons/3"])
+    assert delta["changed"]["lessons"] == [{"id": 2, "title": "लिंग (संशोधित)"}]
+    assert delta["changed"]["flashcards"] == [] and delta["changed"]["practice_sets"] == []
+    assert gzip.decompress(variants["gzip"]) == variants["identity"]
+
+    # Already current: an empty delta
+    assert body(store.delta(new.version)[1])["changed"]["lessons"] == []
+
+
+def test_unknown_version_gets_the_full_snapshot(tmp_path):
+    snapshot = write_content(tmp_path, [{"id": 1, "title": "संज्ञा"}])
+    store = ContentStore(snapshot, [published(snapshot)], dist_dir=tmp_path / "dist")
+    delta = body(store.delta("0123456789abcdef")[1])
+    assert delta["full"] is True
+    assert delta["changed"]["lessons"] == [{"id": 1, "title": "संज्ञा"}]
+
+
+def test_etag_revalidation_and_encoding(tmp_path):
+    snapshot = write_content(tmp_path, [{"id": 1, "title": "संज्ञा"}])
+    store = ContentStore(snapshot, [], dist_dir=tmp_path / "dist")
+
+    fresh = server._content_response(store.etag, store.variants, None, "gzip, deflate", "no-cache")
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] == f'"{snapshot.version}"'
+    assert fresh.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(fresh.body))["version"] == snapshot.version
+
+    unchanged = server._content_response(store.etag, store.variants, f'"stale", {store.etag}', "gzip", "no-cache")
+    assert unchanged.status_code == 304 and not unchanged.body
+    assert unchanged.headers["ETag"] == store.etag
+
+    stale = server._content_response(store.etag, store.variants, '"stale"', None, "no-cache")
+    assert stale.status_code == 200 and "Content-Encoding" not in stale.headers
+
+
+def test_negotiate_prefers_the_smallest_accepted_encoding():
+    variants = {"identity": b"{}", "gzip": b"gz", "br": b"br"}
+    assert negotiate(variants, "gzip, br;q=0.9") == ("br", b"br")
+    assert negotiate(variants, "gzip") == ("gzip", b"gz")
+    assert negotiate({"identity": b"{}", "gzip": b"gz"}, "*") == ("gzip", b"gz")
+    assert negotiate(variants, None) == ("identity", b"{}")
@@ -0,0 +1,56 @@
+"""
+Import-time budget for the backend
+
+Every worker start pays for what `import server` does, so a regression
+here slows down deploys and autoscaling. The import runs in a fresh
+interpreter under -X importtime; the test fails when it exceeds the budget
+or loads a dependency that should only load on first use.
+
+    python -m pytest tests/test_import_time.py
+    BACKEND_IMPORT_BUDGET_MS=600 python -m pytest tests/test_import_time.py
+"""
+import os
+import re
+import sys
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / 'backend'
+
+# About twice the import time measured on a developer laptop
+IMPORT_BUDGET_MS = float(os.environ.get('BACKEND_IMPORT_BUDGET_MS', '900'))
+IMPORT_RUNS = 3
+
+# Loaded by the background warm-up or the first request, never at import
+LAZY_MODULES = ("openai", "httpx", "tiktoken", "motor")
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def import_profile(module: str = "server") -> dict:
+    """Module -> cumulative import time in microseconds, from a fresh interpreter"""
+    # Importing must not need the JWT secret; it is checked on startup
+    env = {name: value for name, value in os.environ.items() if name != "JWT_SECRET_KEY"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            profile[match.group(4)] = int(match.group(2))
+    return profile
+
+
+def test_lazy_dependencies_not_imported():
+    profile = import_profile()
+    eager = sorted(name for name in profile if name.split(".")[0] in LAZY_MODULES)
+    assert not eager, f"imported at startup: {', '.join(eager)}"
+
+
+def test_import_within_budget():
+    # Best of a few runs, so one slow run on a busy machine does not fail it
+    best_ms = min(import_profile()["server"] for _ in range(IMPORT_RUNS)) / 1000
+    assert best_ms <= IMPORT_BUDGET_MS, f"import server took {best_ms:.0f}ms, budget {IMPORT_BUDGET_MS:.0f}ms"
@@ -0,0 +1,162 @@
+import random
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from leaderboard import IndexableSkipList, Board, Leaderboards, scopes, rebuild
+
+
+def student(user_id: str, school: str = "DPS", class_name: str = "7A", name: str = None):
+    return SimpleNamespace(id=user_id, name=name or user_id, school=school, class_name=class_name)
+
+
+def test_skip_list_rank_and_slice_match_sorted_list():
+    ranking = IndexableSkipList(seed=7)
+    shadow = []
+    rng = random.Random(7)
+    for _ in range(2000):
+        key = rng.randrange(500)
+        if shadow and rng.random() < 0.3:
+            victim = rng.choice(shadow)
+            ranking.remove(victim)
+            shadow.remove(victim)
+        else:
+            ranking.insert(key)
+            shadow.append(key)
+        shadow.sort()
+
+    assert len(ranking) == len(shadow)
+    for key in range(0, 500, 7):
+        assert ranking.rank(key) == sum(1 for other in shadow if other < key)
+    for start in (0, 1, len(shadow) // 2, len(shadow) - 3):
+        assert ranking.slice(start, 5) == shadow[start:start + 5]
+    assert ranking.slice(len(shadow), 5) == []
+
+
+def test_skip_list_remove_missing_key_raises():
+    ranking = IndexableSkipList(seed=1)
+    ranking.insert(3)
+    try:
+        ranking.remove(4)
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("removing a missing key must raise KeyError")
+
+
+def test_board_orders_by_points_then_time():
+    board = Board()
+    board.update("a", "A", 150, achieved_at=2.0)
+    board.update("b", "B", 150, achieved_at=1.0)
+    board.update("c", "C", 90, achieved_at=0.5)
+
+    assert [entry["name"] for entry in board.top(10)] == ["B", "A", "C"]
+    assert board.rank("a") == {"rank": 2, "name": "A", "points": 150}
+    assert board.rank("missing") is None
+
+
+def test_board_update_moves_entry_and_ignores_same_points():
+    board = Board()
+    board.update("a", "A", 50, achieved_at=1.0)
+    board.update("b", "B", 80, achieved_at=1.0)
+
+    assert board.update("a", "A", 120, achieved_at=2.0)
+    assert board.rank("a")["rank"] == 1
+    assert len(board.ranking) == 2
+    # Same points only refreshes the name
+    assert not board.update("a", "Asha", 120, achieved_at=3.0)
+    assert board.top(1) == [{"rank": 1, "name": "Asha", "points": 120}]
+
+
+def test_workers_record_without_losing_points(db):
+    async def scenario():
+        # Two workers, each with its own cache and a partial view of the student
+        first, second = Leaderboards(), Leaderboards()
+        await first.record(student("u1"), {"1": 80})
+        await second.record(student("u1"), {"2": 90})
+        # A stale replay cannot lower anything
+        await first.record(student("u1"), {"1": 40})
+        await second.record(student("u2"), {"1": 100})
+
+        entry = await db.leaderboard_entries.find_one({"_id": "u1"})
+        assert entry["points"] == 170
+        for worker in (first, second):
+            standings = await worker.standings(student("u2"), "school")
+            assert [row["points"] for row in standings["top"]] == [170, 100]
+            assert standings["me"]["rank"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_cached_board_sees_own_updates(db):
+    async def scenario():
+        boards = Leaderboards()
+        await boards.record(student("u1"), {"1": 60})
+        assert (await boards.standings(student("u1"), "class"))["me"]["points"] == 60
+        await boards.record(student("u1"), {"2": 70})
+        assert (await boards.standings(student("u1"), "class"))["me"]["points"] == 130
+        assert boards.board_loads == 1
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_from_progress(db):
+    async def scenario():
+        await db.users.insert_many([
+            {"id": "u1", "name": "Asha", "school": "DPS", "class_name": "7A"},
+            {"id": "u2", "name": "Ravi", "school": "DPS", "class_name": "7B"},
+        ])
+        await db.progress.insert_many([
+            {"user_id": "u1", "kind": "quiz", "item_id": "1", "best_percentage": 70, "updated_at": None},
+            {"user_id": "u1", "kind": "quiz", "item_id": "2", "best_percentage": 30, "updated_at": None},
+            {"user_id": "u1", "kind": "quiz", "item_id": "999", "best_percentage": 500000, "updated_at": None},
+            {"user_id": "u2", "kind": "quiz", "item_id": "1", "best_percentage": 90, "updated_at": None},
+            {"user_id": "u2", "kind": "flashcard", "item_id": "1", "updated_at": None},
+        ])
+        await db.leaderboards.insert_one({"scope": scopes("DPS", "7A")["school"], "entries": []})
+        # Written before scores were validated
+        await db.leaderboard_entries.insert_one({
+            "_id": "u2", "bests": {"1": 500000}, "points": 500000, "achieved_at": datetime.now(timezone.utc)
+        })
+
+        assert await rebuild(db) == {"users": 2, "entries": 2}
+        standings = await Leaderboards().standings(student("u1", name="Asha"), "school")
+        assert [(row["name"], row["points"]) for row in standings["top"]] == [("Asha", 100), ("Ravi", 90)]
+        assert "leaderboards" not in await db.list_collection_names()
+
+    asyncio.run(scenario())
+
+
+def test_unknown_sets_and_percentages_over_100_earn_nothing(db):
+    async def scenario():
+        boards = Leaderboards()
+        await boards.record(student("u1"), {"1": 80, "999": 100, "2": 500})
+        assert (await db.leaderboard_entries.find_one({"_id": "u1"}))["points"] == 180
+
+    asyncio.run(scenario())
+
+
+def test_many_students_are_recorded_in_a_few_writes(db):
+    async def scenario():
+        boards = Leaderboards()
+        calls = []
+        entries = db.leaderboard_entries
+        original = entries.bulk_write
+
+        async def counting(operations, ordered=True):
+            calls.append(len(operations))
+            return await original(operations, ordered=ordered)
+
+        entries.bulk_write = counting
+        boards._collection = lambda: entries
+        raises = {
+            f"u{index}": {"user": {"id": f"u{index}", "name": f"S{index}", "school": "DPS", "class_name": "7A"}, "bests": {"1": 50 + index}}
+            for index in range(30)
+        }
+        assert await boards.record_many(raises) == 30
+        assert calls == [30, 30]
+        # Nothing rose, so the replay writes no points
+        assert await boards.record_many(raises) == 0
+        assert calls == [30, 30, 30]
+
+    asyncio.run(scenario())
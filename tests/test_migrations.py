@@ -0,0 +1,46 @@
+import asyncio
+
+from fastapi import HTTPException
+from pymongo import DESCENDING
+
+import auth_service
+from auth_service import UserRegister, register_user
+from migrations import ensure_indexes
+
+
+def states(report: dict, collection: str) -> dict:
+    return {result["name"]: result["state"] for result in report[collection]}
+
+
+def test_obsolete_status_index_dropped_after_replacement(db):
+    async def scenario():
+        await db.status_checks.create_index([("timestamp", DESCENDING)], name="timestamp_desc")
+
+        dry = await ensure_indexes(db, dry_run=True)
+        assert states(dry, "status_checks") == {"timestamp_id_desc": "would_create", "timestamp_desc": "would_drop"}
+        assert "timestamp_desc" in await db.status_checks.index_information()
+
+        report = await ensure_indexes(db)
+        assert states(report, "status_checks") == {"timestamp_id_desc": "created", "timestamp_desc": "dropped"}
+        assert "timestamp_desc" not in await db.status_checks.index_information()
+        assert states(await ensure_indexes(db), "status_checks") == {"timestamp_id_desc": "exists"}
+
+    asyncio.run(scenario())
+
+
+def test_registration_rejects_duplicate_mobile_without_index(db, monkeypatch):
+    monkeypatch.setattr(auth_service, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(auth_service, "mobile_index_ready", False)
+    student = UserRegister(name="Asha", mobile="9876543210", school="DPS", class_name="7A", password="secret1")
+
+    async def scenario():
+        await register_user(student)
+        try:
+            await register_user(student)
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("a second registration of the number must fail")
+        assert await db.users.count_documents({"mobile": student.mobile}) == 1
+
+    asyncio.run(scenario())
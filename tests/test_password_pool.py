@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from auth_service import PasswordPool
+
+
+def test_failed_jobs_are_not_counted_as_completed():
+    pool = PasswordPool(workers=2, queue_limit=2)
+
+    def broken(password):
+        raise ValueError("invalid salt")
+
+    async def scenario():
+        assert await pool.run(str.upper, "secret") == "SECRET"
+        with pytest.raises(ValueError):
+            await pool.run(broken, "secret")
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"], stats["queued"], stats["in_flight"]) == (1, 1, 0, 0)
+    pool.shutdown()
+
+
+def test_full_queue_is_rejected_with_429():
+    pool = PasswordPool(workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def scenario():
+        jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as raised:
+            await pool.run(release.wait)
+        assert raised.value.status_code == 429
+        release.set()
+        await asyncio.gather(*jobs)
+
+    asyncio.run(scenario())
+    assert (pool.stats()["completed"], pool.stats()["rejected"]) == (2, 1)
+    pool.shutdown()
@@ -0,0 +1,244 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, NetworkTimeout
+
+import progress_service
+from migrations import ensure_indexes
+from progress_service import ProgressStore, ProgressEvent, ProgressSync, sync_progress
+
+
+def quiz(key: str, item_id: str = "1", score: int = 8, total: int = 10) -> ProgressEvent:
+    return ProgressEvent(idempotency_key=key, kind="quiz", item_id=item_id, score=score, total=total)
+
+
+class FaultyCollection:
+    """The progress collection, with bulk_write behaviour scripted per call"""
+
+    def __init__(self, collection, *behaviours):
+        self.collection = collection
+        self.behaviours = list(behaviours)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, ordered=True):
+        behaviour = self.behaviours.pop(0) if self.behaviours else None
+        if behaviour is None:
+            return await self.collection.bulk_write(operations, ordered=ordered)
+        return await behaviour(self.collection, operations)
+
+
+async def stored(db, user_id: str = "u1", item: str = "quiz:1") -> dict:
+    return await db.progress.find_one({"user_id": user_id, "item": item}, {"_id": 0})
+
+
+def test_replay_after_timeout_is_not_double_counted(db):
+    async def apply_then_time_out(collection, operations):
+        await collection.bulk_write(operations, ordered=False)
+        raise NetworkTimeout("timed out waiting for the reply")
+
+    async def scenario():
+        await ensure_indexes(db)
+        store = ProgressStore()
+        faulty = FaultyCollection(db.progress, apply_then_time_out)
+        store._collection = lambda: faulty
+        await store.record("u1", [quiz("k1"), quiz("k2", score=10)])
+
+        assert await store.flush() == 0
+        assert store.stats()["retrying_writes"] == 2
+        # The replay lands on items that already hold both events
+        await store.flush()
+        doc = await stored(db)
+        assert doc["attempts"] == 2
+        assert doc["best_percentage"] == 100
+        assert store.replays == 2
+        assert store.stats()["retrying_writes"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_partial_bulk_failure_retries_only_failed_writes(db):
+    async def fail_second(collection, operations):
+        written = [operation for index, operation in enumerate(operations) if index != 1]
+        await collection.bulk_write(written, ordered=False)
+        raise BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 91, "errmsg": "shutdown in progress"}],
+            "nUpserted": len(written)
+        })
+
+    async def scenario():
+        await ensure_indexes(db)
+        store = ProgressStore()
+        faulty = FaultyCollection(db.progress, fail_second)
+        store._collection = lambda: faulty
+        await store.record("u1", [quiz("k1", "1"), quiz("k2", "2"), quiz("k3", "3")])
+
+        assert await store.flush() == 2
+        assert store.stats()["retrying_writes"] == 1
+        assert await store.flush() == 1
+        for item in ("quiz:1", "quiz:2", "quiz:3"):
+            assert (await stored(db, item=item))["attempts"] == 1
+        assert store.replays == 0
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_event_on_another_worker_is_applied_once(db):
+    async def scenario():
+        await ensure_indexes(db)
+        first, second = ProgressStore(), ProgressStore()
+        await first.record("u1", [quiz("k1")])
+        # The client retried and the retry reached a worker that had not seen the key
+        await second.record("u1", [quiz("k1"), quiz("k2", score=5)])
+        await first.flush()
+        await second.flush()
+
+        doc = await stored(db)
+        assert doc["attempts"] == 2
+        assert sorted(doc["event_keys"]) == ["k1", "k2"]
+        assert second.replays == 1
+        # The worker that over-counted drops its cached view
+        items = await second.get("u1")
+        assert items[0]["attempts"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_event_on_same_worker_is_ignored(db):
+    async def scenario():
+        await ensure_indexes(db)
+        store = ProgressStore()
+        first = await store.record("u1", [quiz("k1")])
+        again = await store.record("u1", [quiz("k1")])
+        await store.flush()
+        assert (first["accepted"], again["accepted"], again["duplicates"]) == (1, 0, 1)
+        assert (await stored(db))["attempts"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_load_during_flush_sees_in_flight_writes_once(db):
+    for applied_before_read in (False, True):
+        async def scenario():
+            await db.progress.delete_many({})
+            await ensure_indexes(db)
+            started, release = asyncio.Event(), asyncio.Event()
+
+            async def slow_write(collection, operations):
+                if applied_before_read:
+                    await collection.bulk_write(operations, ordered=False)
+                started.set()
+                await release.wait()
+                if not applied_before_read:
+                    await collection.bulk_write(operations, ordered=False)
+
+            store = ProgressStore()
+            faulty = FaultyCollection(db.progress, slow_write)
+            store._collection = lambda: faulty
+            await store.record("u1", [quiz("k1")])
+            store._users.clear()
+
+            flush = asyncio.create_task(store.flush())
+            await started.wait()
+            items = await store.get("u1")
+            release.set()
+            await flush
+
+            assert items[0]["attempts"] == 1
+            # The cached view stays right after the flush
+            assert (await store.get("u1"))[0]["attempts"] == 1
+
+        asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("fields", [
+    {"score": 5000, "total": 1},
+    {"item_id": "999"},
+    {"item_id": "01"},
+])
+def test_quiz_event_rejects_impossible_scores_and_unknown_sets(fields):
+    with pytest.raises(ValidationError):
+        ProgressEvent(**{"idempotency_key": "k1", "kind": "quiz", "item_id": "1", "score": 8, "total": 10, **fields})
+
+
+def test_flashcard_event_needs_known():
+    with pytest.raises(ValidationError):
+        ProgressEvent(idempotency_key="k1", kind="flashcard", item_id="any-card")
+    assert ProgressEvent(idempotency_key="k1", kind="flashcard", item_id="any-card", known=True).known
+
+
+def test_write_that_keeps_failing_is_dropped(db, monkeypatch):
+    monkeypatch.setattr(progress_service, "PROGRESS_MAX_ATTEMPTS", 3)
+
+    async def always_fail(collection, operations):
+        raise NetworkTimeout("timed out waiting for the reply")
+
+    async def scenario():
+        await ensure_indexes(db)
+        store = ProgressStore()
+        store._collection = lambda: FaultyCollection(db.progress, always_fail)
+        await store.record("u1", [quiz("k1")])
+
+        for _ in range(3):
+            assert await store.flush() == 0
+        assert store.stats()["retrying_writes"] == 0
+        assert store.dropped == 1
+        # The cached view no longer claims the event, so a resend is accepted
+        store._collection = lambda: db.progress
+        assert (await store.record("u1", [quiz("k1")]))["accepted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_sync_is_rejected_while_the_buffer_is_full(db, monkeypatch):
+    monkeypatch.setattr(progress_service, "PROGRESS_MAX_BUFFERED", 2)
+
+    async def scenario():
+        await ensure_indexes(db)
+        store = ProgressStore()
+        await store.record("u1", [quiz("k1", "1"), quiz("k2", "2")])
+        with pytest.raises(HTTPException) as raised:
+            await store.record("u1", [quiz("k3", "3")])
+        assert raised.value.status_code == 503
+        assert store.stats()["rejected_syncs"] == 1
+        # Flushing frees the buffer
+        await store.flush()
+        assert (await store.record("u1", [quiz("k3", "3")]))["accepted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_load_reads_every_item(db):
+    async def scenario():
+        await db.progress.insert_many([
+            {"user_id": "u1", "item": f"flashcard:{index}", "kind": "flashcard", "item_id": str(index), "reviews": 1}
+            for index in range(1500)
+        ])
+        assert len(await ProgressStore().get("u1")) == 1500
+
+    asyncio.run(scenario())
+
+
+def test_raised_bests_reach_the_leaderboard_with_the_flush(db, monkeypatch):
+    store = ProgressStore()
+    monkeypatch.setattr(progress_service, "progress_store", store)
+    user = SimpleNamespace(id="u1", name="Asha", school="DPS", class_name="7A")
+
+    async def scenario():
+        await ensure_indexes(db)
+        result = await sync_progress(user, ProgressSync(events=[quiz("k1", score=7), quiz("k2", "2", score=10)]))
+        assert result["points"] == 170
+        # Nothing is written on the request path
+        assert await db.leaderboard_entries.count_documents({}) == 0
+        await store.flush()
+        assert (await db.leaderboard_entries.find_one({"_id": "u1"}))["points"] == 170
+
+        # A lower score raises nothing, so nothing is queued
+        await sync_progress(user, ProgressSync(events=[quiz("k3", score=2)]))
+        assert store.stats()["queued_leaderboard_updates"] == 0
+
+    asyncio.run(scenario())
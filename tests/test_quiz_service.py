@@ -0,0 +1,89 @@
+import pytest
+from fastapi import HTTPException
+
+from quiz_service import QuizBank, QuizGradeRequest, without_answers
+
+
+def practice_set(set_id: int, size: int) -> dict:
+    return {
+        "id": set_id,
+        "title": f"Set {set_id}",
+        "questions": [
+            {
+                "question": f"प्रश्न {index}",
+                "options": ["क", "ख", "ग", "घ"],
+                "correctAnswer": ["क", "ख", "ग", "घ"][index % 4],
+                "explanation": f"व्याख्या {index}"
+            }
+            for index in range(size)
+        ]
+    }
+
+
+def bank() -> QuizBank:
+    return QuizBank([practice_set(1, 30), practice_set(2, 5)])
+
+
+def question_ids(quiz: dict) -> list:
+    return [question["id"] for question in quiz["questions"]]
+
+
+def test_same_seed_gives_the_same_paper():
+    first = bank().render(1, "class-7a", 10)
+    # A separate bank, as on another worker or after a restart
+    second = bank().render(1, "class-7a", 10)
+    assert first["questions"] == second["questions"]
+    assert len(set(question_ids(first))) == 10
+
+
+def test_other_seeds_and_sets_give_other_papers():
+    papers = bank()
+    assert question_ids(papers.render(1, "a", 10)) != question_ids(papers.render(1, "b", 10))
+    # The seed is mixed with the set id
+    assert [q["question"] for q in papers.render(2, "a", 5)["questions"]] != \
+        [q["question"] for q in papers.render(1, "a", 5)["questions"]]
+
+
+def test_options_are_shuffled_but_complete():
+    quiz = bank().render(1, "seed", 30)
+    assert all(sorted(question["options"]) == ["क", "ख", "ग", "घ"] for question in quiz["questions"])
+    assert any(question["options"] != ["क", "ख", "ग", "घ"] for question in quiz["questions"])
+
+
+def test_count_is_capped_at_the_pool_size():
+    assert bank().render(2, "seed", 20)["count"] == 5
+
+
+def test_grading_scores_against_the_seeded_paper():
+    papers = bank()
+    quiz = papers.render(1, "seed", 4)
+    answers = [question["correctAnswer"] for question in quiz["questions"]]
+    answers[1] = next(option for option in quiz["questions"][1]["options"] if option != answers[1])
+    answers[3] = None
+
+    graded = papers.grade(1, QuizGradeRequest(seed="seed", count=4, answers=answers))
+    assert (graded["score"], graded["total"], graded["percentage"]) == (2, 4, 50)
+    assert [result["correct"] for result in graded["results"]] == [True, False, True, False]
+    assert [result["id"] for result in graded["results"]] == question_ids(quiz)
+
+
+def test_grading_needs_one_answer_per_question():
+    with pytest.raises(HTTPException) as raised:
+        bank().grade(1, QuizGradeRequest(seed="seed", count=4, answers=["क"]))
+    assert raised.value.status_code == 422
+
+
+def test_unknown_set_is_404():
+    with pytest.raises(HTTPException) as raised:
+        bank().render(99, "seed")
+    assert raised.value.status_code == 404
+
+
+def test_set_ids_as_sent_in_progress_events():
+    papers = bank()
+    assert papers.has_set("1") and not papers.has_set("01") and not papers.has_set("99")
+
+
+def test_handout_hides_answers():
+    quiz = without_answers(bank().render(1, "seed", 3))
+    assert all(set(question) == {"id", "question", "options"} for question in quiz["questions"])
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limit
+from rate_limit import Caller, ChatLimiter, MemoryStore, MongoStore, quota_day
+
+START = datetime(2024, 1, 1, 6, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    """Stands in for time.monotonic and datetime.now in rate_limit"""
+
+    def __init__(self):
+        self.now = START
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+    def monotonic(self) -> float:
+        return (self.now - START).total_seconds()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock.now
+
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limit, "datetime", FrozenDatetime)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    return clock
+
+
+def student(user_id: str = "u1", school: str = "DPS"):
+    return Caller(user=SimpleNamespace(id=user_id, school=school))
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def stores(request, clock):
+    """Two handles on the same state, as two workers would have"""
+    if request.param == "memory":
+        store = MemoryStore()
+        return store, store
+    db = pytest.importorskip("mongomock_motor").AsyncMongoMockClient()["rate_limit_test"]
+    return MongoStore(db), MongoStore(db)
+
+
+def test_take_spends_the_burst_then_refills(stores, clock):
+    first, second = stores
+
+    async def scenario():
+        # One token a second, bursts of three, shared between workers
+        assert [await first.take("k", 1.0, 3), await second.take("k", 1.0, 3), await first.take("k", 1.0, 3)] == [0, 0, 0]
+        assert await second.take("k", 1.0, 3) == pytest.approx(1.0)
+        clock.advance(0.5)
+        assert await first.take("k", 1.0, 3) == pytest.approx(0.5)
+        clock.advance(0.5)
+        assert await first.take("k", 1.0, 3) == 0
+        # Idle time never fills past the burst
+        clock.advance(60)
+        assert [await second.take("k", 1.0, 3) for _ in range(4)][-1] > 0
+        # Other keys have their own bucket
+        assert await first.take("other", 1.0, 3) == 0
+
+    asyncio.run(scenario())
+
+
+def test_charges_add_up_per_key_and_day(stores):
+    first, second = stores
+
+    async def scenario():
+        await first.charge(["user:u1", "school:dps"], "2024-01-01", 40, ttl=3600)
+        await second.charge(["user:u1"], "2024-01-01", 2, ttl=3600)
+        assert await first.used(["user:u1", "school:dps", "user:u2"], "2024-01-01") == {
+            "user:u1": 42, "school:dps": 40, "user:u2": 0
+        }
+        assert await second.used(["user:u1"], "2024-01-02") == {"user:u1": 0}
+
+    asyncio.run(scenario())
+
+
+def test_check_raises_429_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "CHAT_ANON_RATE_PER_MINUTE", 6)
+    monkeypatch.setattr(rate_limit, "CHAT_ANON_RATE_BURST", 2)
+    limiter, caller = ChatLimiter(), Caller(ip="10.0.0.1")
+
+    async def scenario():
+        await limiter.check(caller)
+        await limiter.check(caller)
+        with pytest.raises(HTTPException) as raised:
+            await limiter.check(caller)
+        assert raised.value.status_code == 429
+        assert raised.value.headers["Retry-After"] == "10"
+        assert (limiter.allowed, limiter.rate_limited) == (2, 1)
+        clock.advance(10)
+        await limiter.check(caller)
+
+    asyncio.run(scenario())
+
+
+def test_daily_and_school_quotas(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "CHAT_DAILY_TOKENS_USER", 100)
+    monkeypatch.setattr(rate_limit, "CHAT_DAILY_TOKENS_SCHOOL", 150)
+    limiter = ChatLimiter()
+
+    async def scenario():
+        await limiter.charge(student("u1"), {"completion_tokens": 100})
+        with pytest.raises(HTTPException) as raised:
+            await limiter.check_quota(student("u1"))
+        assert raised.value.detail == "Daily chat token quota exhausted"
+        # The school has 50 left
+        await limiter.check_quota(student("u2"))
+        await limiter.charge(student("u2"), {"completion_tokens": 50})
+        with pytest.raises(HTTPException) as raised:
+            await limiter.check_quota(student("u3"))
+        assert raised.value.detail == "School chat token quota exhausted"
+        assert limiter.over_quota == 2 and limiter.tokens_charged == 150
+
+        # Quotas reset at local midnight
+        _, reset_in = quota_day()
+        clock.advance(reset_in)
+        await limiter.check_quota(student("u1"))
+
+    asyncio.run(scenario())
+
+
+def test_failed_charge_does_not_fail_the_answer(clock):
+    class BrokenStore(MemoryStore):
+        async def charge(self, keys, day, amount, ttl):
+            raise ConnectionError("mongo unreachable")
+
+    limiter = ChatLimiter()
+    limiter.store = BrokenStore()
+    asyncio.run(limiter.charge(student(), {"completion_tokens": 10}))
+
+
+def test_disabled_limiter_lets_everything_through(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    limiter, caller = ChatLimiter(), Caller(ip="10.0.0.1")
+
+    async def scenario():
+        for _ in range(50):
+            await limiter.check(caller)
+
+    asyncio.run(scenario())
+
+
+def test_quota_day_turns_over_at_local_midnight(monkeypatch):
+    monkeypatch.setattr(rate_limit, "CHAT_QUOTA_UTC_OFFSET_MINUTES", 330)
+    # 18:29 UTC is 23:59 in India
+    day, reset_in = quota_day(datetime(2024, 1, 1, 18, 29, tzinfo=timezone.utc))
+    assert (day, reset_in) == ("2024-01-01", 60)
+    assert quota_day(datetime(2024, 1, 1, 18, 30, tzinfo=timezone.utc))[0] == "2024-01-02"
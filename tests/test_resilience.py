@@ -0,0 +1,190 @@
+import asyncio
+
+import httpx
+import openai
+
+import resilience
+from resilience import (
+    CircuitBreaker, ResilientCaller, CircuitOpenError, UpstreamUnavailable, is_retryable,
+    CLOSED, HALF_OPEN, OPEN
+)
+
+
+def status_error(code: int) -> openai.APIStatusError:
+    response = httpx.Response(code, request=httpx.Request("POST", "http://llm/v1/chat/completions"))
+    return openai.APIStatusError("upstream error", response=response, body=None)
+
+
+def caller(name: str = "model") -> ResilientCaller:
+    return ResilientCaller(CircuitBreaker(name), name, "complete")
+
+
+def test_breaker_opens_probes_and_closes(monkeypatch):
+    breaker = CircuitBreaker("breaker-test")
+    for _ in range(resilience.LLM_BREAKER_MIN_CALLS - 1):
+        breaker.failure()
+    assert breaker.current_state() == CLOSED
+    breaker.failure()
+    assert breaker.current_state() == OPEN
+    assert not breaker.acquire()
+
+    # After the reset timeout a single probe goes through
+    breaker.opened_at -= resilience.LLM_BREAKER_RESET_TIMEOUT
+    assert breaker.current_state() == HALF_OPEN
+    assert breaker.acquire()
+    assert not breaker.acquire()
+    breaker.failure()
+    assert breaker.current_state() == OPEN
+
+    breaker.opened_at -= resilience.LLM_BREAKER_RESET_TIMEOUT
+    assert breaker.acquire()
+    breaker.success()
+    assert breaker.current_state() == CLOSED
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_retry_classification():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert is_retryable(status_error(503))
+    assert is_retryable(status_error(408))
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(status_error(401))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_transient_errors_are_retried_and_others_raised(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_RETRY_BASE_DELAY", 0.001)
+
+    async def scenario():
+        flaky = caller()
+        failures = [status_error(502)]
+
+        async def attempt(timeout):
+            if failures:
+                raise failures.pop()
+            return "answer"
+
+        assert await flaky.call(attempt, 1.0) == "answer"
+        assert flaky.retries == 1
+
+        broken = caller()
+
+        async def bad_request(timeout):
+            raise status_error(400)
+
+        try:
+            await broken.call(bad_request, 1.0)
+        except openai.APIStatusError as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("a non-retryable error must be raised as is")
+        assert broken.retries == 0
+        assert broken.breaker.outcomes.count(False) == 0
+
+        down = caller()
+
+        async def unavailable(timeout):
+            raise status_error(503)
+
+        try:
+            await down.call(unavailable, 1.0, retries=2)
+        except UpstreamUnavailable:
+            pass
+        else:
+            raise AssertionError("exhausted retries must raise UpstreamUnavailable")
+        assert down.retries == 2
+
+        down.breaker._set_state(OPEN)
+        down.breaker.opened_at = resilience.time.monotonic()
+        try:
+            await down.call(unavailable, 1.0)
+        except CircuitOpenError:
+            pass
+        else:
+            raise AssertionError("an open breaker must fail fast")
+
+    asyncio.run(scenario())
+
+
+def warmed_up(monkeypatch) -> ResilientCaller:
+    monkeypatch.setattr(resilience, "LLM_HEDGE_MIN_DELAY", 0.02)
+    hedging = caller()
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        hedging._record_latency(0.02)
+    return hedging
+
+
+def test_hedge_wins_and_slow_attempt_is_cancelled(monkeypatch):
+    async def scenario():
+        hedging = warmed_up(monkeypatch)
+        started, cancelled, released, discarded = [], [], [], []
+
+        async def attempt(timeout):
+            started.append(timeout)
+            try:
+                await asyncio.sleep(5 if len(started) == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(len(started))
+                raise
+            return f"attempt {len(started)}"
+
+        async def hedge_slot():
+            return lambda: released.append(True)
+
+        async def discard(result):
+            discarded.append(result)
+
+        result = await hedging.call(attempt, 2.0, hedge=True, discard=discard, hedge_slot=hedge_slot)
+        await asyncio.sleep(0.01)
+        assert result == "attempt 2"
+        assert (hedging.hedges, hedging.hedges_won) == (1, 1)
+        assert cancelled and not discarded
+        assert released == [True]
+
+    asyncio.run(scenario())
+
+
+def test_hedge_skipped_without_free_slot(monkeypatch):
+    async def scenario():
+        hedging = warmed_up(monkeypatch)
+        attempts = []
+
+        async def attempt(timeout):
+            attempts.append(timeout)
+            await asyncio.sleep(0.1)
+            return "slow answer"
+
+        async def no_slot():
+            return None
+
+        assert await hedging.call(attempt, 2.0, hedge=True, hedge_slot=no_slot) == "slow answer"
+        assert len(attempts) == 1
+        assert (hedging.hedges, hedging.hedges_skipped) == (0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_call_is_cut_off_at_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_DEADLINE", 0.05)
+
+    async def scenario():
+        stuck = caller()
+
+        async def ignores_timeout(timeout):
+            await asyncio.sleep(5)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await stuck.call(ignores_timeout, 10.0)
+        except UpstreamUnavailable:
+            pass
+        else:
+            raise AssertionError("a call past the deadline must raise UpstreamUnavailable")
+        assert loop.time() - started < 1
+        assert stuck.exhausted == 1
+        # Cancelling the attempt must not leave a half-open probe taken
+        assert not stuck.breaker._probing
+
+    asyncio.run(scenario())
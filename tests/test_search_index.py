@@ -0,0 +1,62 @@
+from search_index import SearchIndex, get_search_index
+
+
+def doc(doc_id: str, title: str, body: list, keywords: list = (), doc_type: str = "lesson") -> dict:
+    return {
+        "type": doc_type, "id": doc_id, "title": title, "icon": None, "difficulty": None,
+        "link": f"/{doc_id}", "keywords": list(keywords), "body": body
+    }
+
+
+def small_index() -> SearchIndex:
+    return SearchIndex([
+        doc("lesson-1", "संज्ञा", ["संज्ञा किसी व्यक्ति, वस्तु या स्थान का नाम है।"], ["नाम"]),
+        doc("lesson-2", "सर्वनाम", ["सर्वनाम संज्ञा के स्थान पर आता है।"]),
+        doc("question-1", "क्रिया क्या है?", ["क्रिया काम बताती है।"], doc_type="question"),
+    ])
+
+
+def ids(response: dict) -> list:
+    return [result["id"] for result in response["results"]]
+
+
+def test_title_match_outranks_body_match():
+    response = small_index().search("संज्ञा")
+    assert ids(response) == ["lesson-1", "lesson-2"]
+    assert response["results"][0]["score"] > response["results"][1]["score"]
+    assert response["results"][1]["highlights"] == ["संज्ञा"]
+
+
+def test_transliterated_and_misspelt_queries_find_devanagari_terms():
+    index = small_index()
+    assert ids(index.search("sangya")) == ["lesson-1", "lesson-2"]
+    assert ids(index.search("kriya")) == ["question-1"]
+    assert ids(index.search("sarvanam")) == ["lesson-2"]
+    # A missing matra
+    assert ids(index.search("सर्वनम")) == ["lesson-2"]
+    # The word still being typed
+    assert ids(index.search("क्रि")) == ["question-1"]
+
+
+def test_type_filter():
+    assert ids(small_index().search("संज्ञा", doc_type="question")) == []
+    assert ids(small_index().search("क्रिया", doc_type="question")) == ["question-1"]
+
+
+def test_pages_follow_the_ranking():
+    index = get_search_index()
+    everything = index.search("संज्ञा", page_size=12)
+    pages = [index.search("संज्ञा", page=page, page_size=4) for page in (1, 2, 3)]
+    assert [result_id for page in pages for result_id in ids(page)] == ids(everything)
+    assert all(page["total"] == everything["total"] for page in pages)
+    assert ids(index.search("संज्ञा", page=everything["total"] + 1)) == []
+
+
+def test_cached_results_carry_each_callers_query():
+    index = small_index()
+    first = index.search("संज्ञा")
+    again = index.search("  संज्ञा")
+    assert first["query"] == "संज्ञा"
+    assert again["query"] == "  संज्ञा"
+    assert again["results"] == first["results"]
+    assert index._results_cache.stats()["hits"] == 1
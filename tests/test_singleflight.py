@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_do_runs_once_for_concurrent_callers():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        assert results == ["answer"] * 5 and len(calls) == 1
+        assert flight.stats()["upstream_calls_saved"] == 4
+        # Finished calls are forgotten
+        assert await flight.do("k", work) == "answer" and len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_do_survives_a_cancelled_caller():
+    async def scenario():
+        flight, release = SingleFlight(), asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flight.do("k", work))
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+        assert await follower == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_do_shares_errors():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+
+
+class Upstream:
+    """A stream factory that records how far it got and whether it was closed"""
+
+    def __init__(self, events: int = 5, delay: float = 0.01):
+        self.events = events
+        self.delay = delay
+        self.produced = []
+        self.started = 0
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            for index in range(self.events):
+                await asyncio.sleep(self.delay)
+                self.produced.append(index)
+                yield index
+        finally:
+            self.produced.append("closed")
+
+
+def test_stream_fans_out_and_replays_to_late_joiners():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+
+        async def follow(wait: float = 0):
+            await asyncio.sleep(wait)
+            return [event async for event in flight.stream("k", upstream)]
+
+        results = await asyncio.gather(follow(), follow(0.025))
+        assert results == [[0, 1, 2, 3, 4]] * 2
+        assert upstream.started == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_is_cancelled_when_its_only_subscriber_leaves():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream(delay=0.005)
+        events = flight.stream("k", upstream)
+        assert await events.__anext__() == 0
+        await events.aclose()
+        await asyncio.sleep(0.05)
+
+        assert upstream.produced[-1] == "closed"
+        assert len(upstream.produced) < upstream.events + 1
+        assert flight.stats()["streams_abandoned"] == 1
+        assert flight.stats()["in_flight"] == 0
+        # A later caller starts a fresh stream
+        assert [event async for event in flight.stream("k", upstream)] == [0, 1, 2, 3, 4]
+        assert upstream.started == 2
+
+    asyncio.run(scenario())
+
+
+def test_stream_keeps_running_while_a_subscriber_remains():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        leaving = flight.stream("k", upstream)
+        staying = flight.stream("k", upstream)
+        assert await leaving.__anext__() == 0
+        assert await staying.__anext__() == 0
+        await leaving.aclose()
+
+        assert [event async for event in staying] == [1, 2, 3, 4]
+        assert flight.stats()["streams_abandoned"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+async def seed(db, native: int = 5, legacy: int = 5):
+    """Checks a minute apart: the newest `native` as dates, older ones as ISO strings"""
+    docs = []
+    for index in range(native + legacy):
+        timestamp = START - timedelta(minutes=index)
+        docs.append({
+            "id": f"check-{index:02d}",
+            "client_name": "probe",
+            "timestamp": timestamp if index < native else timestamp.isoformat()
+        })
+    await db.status_checks.insert_many(docs)
+    return [doc["id"] for doc in docs]
+
+
+async def page(limit: int, after: str = None, **filters):
+    response = Response()
+    checks = await server.get_status_checks(response, limit=limit, after=after, format="json", **filters)
+    return [check.id for check in checks], response.headers.get("X-Next-Cursor")
+
+
+def test_pages_walk_across_date_and_string_timestamps(db):
+    async def scenario():
+        expected = await seed(db)
+        seen, cursor = [], None
+        while True:
+            ids, cursor = await page(3, cursor)
+            seen.extend(ids)
+            if cursor is None:
+                break
+        assert seen == expected
+
+    asyncio.run(scenario())
+
+
+def test_same_timestamp_breaks_ties_by_id(db):
+    async def scenario():
+        await db.status_checks.insert_many([
+            {"id": f"check-{index}", "client_name": "probe", "timestamp": START} for index in range(4)
+        ])
+        first, cursor = await page(2)
+        second, cursor = await page(2, cursor)
+        assert first + second == ["check-3", "check-2", "check-1", "check-0"]
+
+    asyncio.run(scenario())
+
+
+def test_time_range_matches_both_formats(db):
+    async def scenario():
+        expected = await seed(db)
+        ids, _ = await page(100, since=START - timedelta(minutes=7), until=START - timedelta(minutes=2))
+        assert ids == expected[3:8]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[1, 2]").decode("ascii"),
+    base64.urlsafe_b64encode(b'["d", "yesterday", "check-01"]').decode("ascii"),
+    "न",
+])
+def test_bad_cursor_is_rejected_with_400(db, cursor):
+    async def scenario():
+        with pytest.raises(HTTPException) as raised:
+            await page(3, cursor)
+        assert raised.value.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_ndjson_streams_every_check(db):
+    async def scenario():
+        expected = await seed(db)
+        response = await server.get_status_checks(Response(), limit=2, after=None, since=None, until=None, format="ndjson")
+        lines = [line async for line in response.body_iterator]
+        assert [server.StatusCheck.model_validate_json(line).id for line in lines] == expected
+
+    asyncio.run(scenario())
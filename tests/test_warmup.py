@@ -0,0 +1,57 @@
+import time
+import asyncio
+
+from fastapi import HTTPException
+
+import warmup
+from warmup import Readiness
+
+
+def test_requests_share_the_background_build():
+    builds = []
+
+    def build_index():
+        time.sleep(0.05)
+        builds.append(True)
+
+    async def scenario():
+        readiness = Readiness()
+        readiness.start({"index": lambda: asyncio.to_thread(build_index), "other": lambda: None})
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Requests arriving mid-build wait for it instead of building again
+        await asyncio.gather(*(readiness.wait("index") for _ in range(5)))
+        assert builds == [True]
+        assert loop.time() - started >= 0.04
+        await readiness.wait("index")
+        await readiness.stop()
+
+    asyncio.run(scenario())
+
+
+def test_wait_times_out_with_503(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_WAIT_TIMEOUT", 0.02)
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_BASE_DELAY", 0.01)
+
+    def unreachable():
+        raise ConnectionError("no route to host")
+
+    async def scenario():
+        readiness = Readiness()
+        readiness.start({"mongo": unreachable})
+        try:
+            await readiness.wait("mongo")
+        except HTTPException as e:
+            assert e.status_code == 503 and e.headers["Retry-After"] == "1"
+        else:
+            raise AssertionError("waiting on a failing step must give up with 503")
+        await readiness.stop()
+
+    asyncio.run(scenario())
+
+
+def test_wait_without_warmup_returns_at_once():
+    async def scenario():
+        await Readiness().wait("index")
+
+    asyncio.run(scenario())